@@ -0,0 +1,131 @@
+"""
+.. module: opsim.benchmarks.checks
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Regression checks of the tracer for scenes that triggered bugs before. Each check traces a small scene headless and compares the result with the expected one.
+
+Usage::
+
+    python benchmarks/checks.py
+
+The script exits with status 1 if a check fails.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+from __future__ import print_function
+import os
+import sys
+import argparse
+import traceback
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from core.opsim_scene import DOSSS_Scene
+from core.opsim_objects import getObjectClass
+from core.opsim_sinks import DOSSS_StatisticsSink
+
+def surfacelessStop():
+    """Returns a beam stop without surface description, i.e., one that is traced by its own :py:func:`Intersection` like a custom object.
+    """
+    stopClass = getObjectClass("Beam Stop")
+
+    class SurfacelessStop(stopClass):
+        def GetSurfaces(self):
+            return None
+
+        def Intersection(self, line):
+            stop = stopClass()
+            stop.SetProperties(self.GetProperties())
+            return stop.Intersection(line)
+
+    return SurfacelessStop()
+
+def checkFallbackBeforeIdealLens():
+    """Rays hitting an object without surfaces in front of an ideal lens: the ideal deflection must not be evaluated for them and the result must be the same as for a beam stop with surfaces.
+    """
+    results = []
+    for stop in [surfacelessStop(), getObjectClass("Beam Stop")()]:
+        scene = DOSSS_Scene()
+        scene.Create("Parallel Light", 0, 0, width = 10, noRays = 5)
+        stop.SetProperties(x = 100, y = 0, width = 2, height = 6)
+        stop.ClearDirty()
+        scene.Add(stop)
+        scene.Create("Ideal Lens", 200, 0, aperture = 50, focalLength = 100)
+        rays = scene.Trace()
+        results.append(np.concatenate([rays.p0, rays.p1], axis = 1))
+    return results[0].shape == results[1].shape and np.allclose(results[0], results[1], equal_nan = True)
+
+def prismExit(shape, size):
+    # directions of the rays leaving a polygon preset that is hit by a parallel beam along +x
+    scene = DOSSS_Scene()
+    scene.Create("Parallel Light", 0, 0, width = 10, noRays = 5)
+    scene.Add(getObjectClass("Polygon")(100, 0, shape = shape, size = size))
+    rays = scene.Trace()
+    escaped = np.isnan(rays.p1[:, 0]) & (rays.depth > 0)
+    return rays.u[escaped]
+
+def checkDovePrism():
+    """A ray parallel to the base of the Dove prism leaves it parallel to the base.
+    """
+    u = prismExit("Dove Prism", 20)
+    return len(u) == 5 and np.allclose(u, [1, 0])
+
+def checkPentaprism():
+    """The pentaprism deviates the beam by 90deg.
+    """
+    u = prismExit("Pentaprism", 60)
+    return len(u) == 5 and np.allclose(u, [0, 1])
+
+def checkTruncatedPower():
+    """A ray that is cut off at the maximum number of iterations on its way to a beam stop is counted as truncated, not as escaped.
+    """
+    scene = DOSSS_Scene(maxNumberOfIterations = 3)
+    scene.Create("Parallel Light", 0, 0, noRays = 1)
+    scene.Create("Plano-Convex Lens", 100, 0)
+    scene.Create("Plano-Convex Lens", 200, 0)
+    scene.Create("Beam Stop", 300, 0)
+    stats = DOSSS_StatisticsSink()
+    scene.Trace([stats])
+    return stats.escapedPower == 0 and stats.truncatedPower == 1
+
+CHECKS = [
+    ["fallback object before ideal lens", checkFallbackBeforeIdealLens],
+    ["Dove prism keeps the beam direction", checkDovePrism],
+    ["pentaprism deviates by 90deg", checkPentaprism],
+    ["truncated rays are not escaped", checkTruncatedPower],
+]
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Run the regression checks of the DOSSS tracer.")
+    parser.parse_args(argv)
+
+    failed = 0
+    for name, check in CHECKS:
+        try:
+            status = "ok" if check() else "wrong result"
+        except Exception:
+            status = "error\n" + traceback.format_exc()
+        if status != "ok":
+            failed = 1
+        print("%-40s %s" % (name, status))
+    return failed
+
+if __name__ == '__main__':
+    sys.exit(main())
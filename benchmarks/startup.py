@@ -0,0 +1,104 @@
+"""
+.. module: opsim.benchmarks.startup
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Measures the cold-start time of the headless and the GUI entry points of DOSSS. Each entry point is imported in a fresh interpreter; the wall time of the fastest of several runs is compared with the budget of the entry point and, with Python 3.7 or later, the modules with the largest cumulative import time are listed from the output of ``python -X importtime``.
+
+Usage::
+
+    python benchmarks/startup.py [--repeat N] [--top N]
+
+The script exits with status 1 if an entry point exceeds its budget or if the headless entry point loads wx. Entry points that cannot be imported, e.g., the GUI without wx installed, are reported but do not count as failure.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+from __future__ import print_function
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name, code to execute, budget in s, whether wx may be loaded
+ENTRY_POINTS = [
+    ["headless", "import core.opsim_engine, core.opsim_objects; core.opsim_objects.objectList()", 0.5, 0],
+    ["gui", "import core.opsim_mainframe", 1.5, 1],
+]
+
+def run(code):
+    """Executes code in a fresh interpreter and returns [wall time in s, return code, stderr, whether wx was loaded].
+
+    :param str code: Python code to execute.
+    """
+    code = code + "; import sys; sys.stderr.write('wx loaded: %d\\n' % ('wx' in sys.modules))"
+    cmd = [sys.executable]
+    if sys.version_info >= (3, 7):
+        cmd = cmd + ["-X", "importtime"]
+    t0 = time.time()
+    p = subprocess.Popen(cmd + ["-c", code], cwd = ROOT, stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+    out, err = p.communicate()
+    dt = time.time() - t0
+    err = err.decode("utf-8", "replace")
+    return [dt, p.returncode, err, "wx loaded: 1" in err]
+
+def slowest(err, top):
+    """Returns the imports with the largest cumulative import time as list of [time in s, module]; nested imports are included, so that the module responsible for a slow import can be identified.
+
+    :param str err: stderr of an interpreter started with -X importtime.
+    :param int top: Number of modules to return.
+    """
+    imports = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[1].strip().isdigit():
+            continue
+        imports.append([int(fields[1]) * 1e-6, fields[2].strip()])
+    imports.sort(reverse = True)
+    return imports[:top]
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Measure the cold-start time of the DOSSS entry points.")
+    parser.add_argument("--repeat", type = int, default = 5, help = "number of runs per entry point; the fastest run is reported")
+    parser.add_argument("--top", type = int, default = 10, help = "number of slowest imports to list")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for name, code, budget, allowWx in ENTRY_POINTS:
+        runs = [run(code) for i in range(max(1, args.repeat))]
+        dt, returncode, err, wxLoaded = min(runs, key = lambda r: r[0])
+        if returncode != 0:
+            print("%-10s not available: %s" % (name, err.strip().splitlines()[-1]))
+            continue
+        status = "ok"
+        if dt > budget:
+            status = "over budget"
+            failed = 1
+        if wxLoaded and not allowWx:
+            status = "loads wx"
+            failed = 1
+        print("%-10s %7.3f s  (budget %.3f s)  %s" % (name, dt, budget, status))
+        for t, module in slowest(err, args.top):
+            print("    %7.3f s  %s" % (t, module))
+    return failed
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+.. module: opsim.opsim_batch
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Vectorized intersection kernels used by :py:func:`~core.opsim_objectbase.DOSSSObject.IntersectionBatch`.
+
+All functions work on a bundle of N rays given by the arrays *x*, *y* (base points) and *ux*, *uy* (unit direction vectors) in the coordinate system of the object. Distances along the rays are returned as arrays of length N, where rays without intersection have a distance of *inf*. As in the scalar functions, intersections closer than 1e-7 to the base point of a ray are ignored.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+import numpy as np
+
+MIN_DISTANCE = 1e-7     #: intersections closer than this to the base point of a ray are ignored
+
+def BatchIntersectSegment(x, y, ux, uy, p1, p2):
+    """Intersect a bundle of rays with the line segment between p1 and p2. The end points of the segment are excluded, like in :py:func:`~core.opsim_geo.DOSSSLine.bounded_intersection`.
+
+    :param array x, y, ux, uy: Base points and unit directions of the rays.
+    :param tuple p1: First point of the segment (x, y).
+    :param tuple p2: Second point of the segment (x, y).
+    :returns: Array of distances (inf where the segment is missed).
+    """
+    ex = p2[0] - p1[0]
+    ey = p2[1] - p1[1]
+    dx = p1[0] - x
+    dy = p1[1] - y
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        denom = ux * ey - uy * ex
+        t = (dx * ey - dy * ex) / denom
+        s = (dx * uy - dy * ux) / denom
+    # exclude the end points with some margin, so that rays through a corner are treated the same in every coordinate system
+    hit = (denom != 0) & (s > 1e-9) & (s < 1 - 1e-9) & (t > MIN_DISTANCE)
+    return np.where(hit, t, np.inf)
+
+def BatchIntersectSphere(x, y, ux, uy, x0, R, y0 = 0):
+    """Intersect a bundle of rays with a circle of radius R centered at (x0, y0), see :py:func:`~core.opsim_geo.IntersectionWithSphere`.
+
+    :returns: Two arrays of distances for both solutions (inf where there is no solution).
+    """
+    dx = x - x0
+    dy = y - y0
+    a = ux * ux + uy * uy
+    b = 2 * (dx * ux + dy * uy)
+    c = dx * dx + dy * dy - R * R
+    return _SolveQuadratic(a, b, c)
+
+def BatchIntersectParabola(x, y, ux, uy, f):
+    """Intersect a bundle of rays with the parabola of focal length f, see :py:func:`~core.opsim_geo.IntersectionWithParabola`.
+
+    :returns: Two arrays of distances for both solutions (inf where there is no solution).
+    """
+    a = -ux * ux / (2 * f)
+    b = -(x - f) * ux / f - uy
+    c = -(x - f)**2 / (2 * f) + f / 2.0 - y
+    return _SolveQuadratic(a, b, c)
+
+def BatchIntersectConic(x, y, ux, uy, vx, vy, ax, ay, tx, ty, c, k):
+    """Intersect a bundle of rays with the conic section c (r**2 + (1 + k) z**2) - 2 z = 0, where z is measured from the vertex (vx, vy) along the axis (ax, ay) and r along the transverse direction (tx, ty). Both solutions are returned; the caller has to pick the branch and the section of the conic that form the actual surface.
+
+    :param float c: Curvature at the vertex (1 / radius).
+    :param float k: Conic constant (0 = circle, -1 = parabola, < -1 hyperbola, otherwise ellipse).
+    :returns: Two arrays of distances for both solutions (inf where there is no solution).
+    """
+    dx = x - vx
+    dy = y - vy
+    z0 = dx * ax + dy * ay
+    r0 = dx * tx + dy * ty
+    uz = ux * ax + uy * ay
+    ur = ux * tx + uy * ty
+    a = c * (ur * ur + (1 + k) * uz * uz)
+    b = 2 * c * (r0 * ur + (1 + k) * z0 * uz) - 2 * uz
+    cc = c * (r0 * r0 + (1 + k) * z0 * z0) - 2 * z0
+    return _SolveQuadratic(a, b, cc)
+
+def AsphereSag(r, c, k, coefficients = None):
+    """Sag z(r) = c r**2 / (1 + sqrt(1 - (1 + k) c**2 r**2)) + A4 r**4 + A6 r**6 + ... of an even asphere and its derivative dz/dr. Works for scalars as well as for arrays. Outside the domain of the conic, nan is returned.
+
+    :param float c: Curvature at the vertex (1 / radius).
+    :param float k: Conic constant.
+    :param array coefficients: Polynomial coefficients [A4, A6, ...]; for arrays of surfaces, an array of shape (L, m) whose first dimension matches the last dimension of r.
+    :returns: Arrays (or floats) z and dz/dr.
+    """
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+        q = 1 - (1 + k) * c * c * r * r
+        sq = np.sqrt(np.where(q >= 0, q, np.nan))
+        z = c * r * r / (1 + sq)
+        dz = c * r / sq
+    if coefficients is not None:
+        coefficients = np.asarray(coefficients, dtype = float)
+        for j in range(coefficients.shape[-1]):
+            A = coefficients[..., j]
+            z = z + A * r**(2 * j + 4)
+            dz = dz + (2 * j + 4) * A * r**(2 * j + 3)
+    return z, dz
+
+def BatchIntersectAsphere(x, y, ux, uy, vx, vy, ax, ay, tx, ty, c, k, coefficients, t, iterations = 20):
+    """Intersect a bundle of rays with an even asphere, see :py:func:`AsphereSag`, by Newton's method. All rays are iterated at once until the largest correction is below 1e-10 or the maximum number of iterations is reached. The geometry is given as in :py:func:`BatchIntersectConic`.
+
+    :param array t: Starting distances, e.g., the intersections with the underlying conic. Where t is inf, the iteration starts at the intersection with the tangent plane at the vertex.
+    :param int iterations: Maximum number of Newton iterations (default = 20).
+    :returns: Array of distances (inf where the iteration did not converge to an intersection).
+    """
+    dx = x - vx
+    dy = y - vy
+    z0 = dx * ax + dy * ay
+    r0 = dx * tx + dy * ty
+    uz = ux * ax + uy * ay
+    ur = ux * tx + uy * ty
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        s = np.where(np.isfinite(t), t, -z0 / uz)
+        for i in range(iterations):
+            z, dz = AsphereSag(r0 + s * ur, c, k, coefficients)
+            ds = (z0 + s * uz - z) / (uz - dz * ur)
+            s = s - ds
+            if not np.any(np.abs(ds) > 1e-10):
+                break
+        z, dz = AsphereSag(r0 + s * ur, c, k, coefficients)
+        ok = (np.abs(z0 + s * uz - z) < 1e-7) & (s > MIN_DISTANCE)
+    return np.where(ok, s, np.inf)
+
+def BatchSnell(ux, uy, nx, ny, ior):
+    """Vectorized version of :py:func:`~core.opsim_geo.Snell`.
+
+    :param array ux, uy: Directions of the incident rays.
+    :param array nx, ny: Surface normals.
+    :param array ior: Index of refraction of the refracting object for each ray; zero for reflection.
+    :returns: Arrays ux, uy of the unit directions of the refracted or reflected rays.
+    """
+    l = np.sqrt(ux * ux + uy * uy)
+    ux = ux / l
+    uy = uy / l
+    l = np.sqrt(nx * nx + ny * ny)
+    nx = nx / l
+    ny = ny / l
+    nphi = ux * nx + uy * ny
+
+    # flip surface normal if ray is incident from the air side -> invert also ior
+    flip = nphi < 0
+    nx = np.where(flip, -nx, nx)
+    ny = np.where(flip, -ny, ny)
+    nphi = np.where(flip, -nphi, nphi)
+    with np.errstate(divide = "ignore"):
+        N = np.where(flip & (ior != 0), 1.0 / np.where(ior != 0, ior, 1.0), ior)
+
+    # get unit vector parallel to surface
+    mx = ny
+    my = -nx
+    mphi = ux * mx + uy * my
+    neg = mphi < 0
+    mx = np.where(neg, -mx, mx)
+    my = np.where(neg, -my, my)
+    mphi = np.where(neg, -mphi, mphi)
+
+    nphip = 1.0 - N * N * (1.0 - nphi * nphi)
+    reflect = (ior == 0) | (nphip < 0)  # normal reflection or total internal reflection
+    straight = (mphi == 0)
+    sq = np.sqrt(np.where(nphip > 0, nphip, 0.0))
+    upx = np.where(reflect, -nphi * nx + mphi * mx, np.where(straight, ux, nx * sq + mx * mphi * N))
+    upy = np.where(reflect, -nphi * ny + mphi * my, np.where(straight, uy, ny * sq + my * mphi * N))
+    l = np.sqrt(upx * upx + upy * upy)
+    return upx / l, upy / l
+
+def BatchIdealDeflect(ux, uy, nx, ny, hx, hy, power, reflect):
+    """Deflection of rays by an ideal thin lens or an ideal curved mirror. All rays entering with the same direction are sent through the same point of the focal plane, i.e., the tangent of the ray angle changes by -h / f, where h is the height of the intersection point above the center of the element.
+
+    :param array ux, uy: Directions of the incident rays.
+    :param array nx, ny: Surface normals, i.e., the optical axis of the element.
+    :param array hx, hy: Intersection points relative to the center of the element.
+    :param array power: Optical power 1 / f of the element (positive for converging elements).
+    :param array reflect: True for mirrors, False for lenses.
+    :returns: Arrays ux, uy of the unit directions of the deflected rays.
+    """
+    l = np.sqrt(nx * nx + ny * ny)
+    nx = nx / l
+    ny = ny / l
+    # axis along the direction of propagation and transverse direction
+    ua = ux * nx + uy * ny
+    s = np.where(ua < 0, -1.0, 1.0)
+    ax = s * nx
+    ay = s * ny
+    ua = s * ua
+    tx = -ay
+    ty = ax
+    ut = ux * tx + uy * ty
+    h = hx * tx + hy * ty
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        slope = ut / ua - h * power
+    # rays parallel to the element pass unchanged
+    straight = ~np.isfinite(slope)
+    slope = np.where(straight, 0.0, slope)
+    ax = np.where(reflect, -ax, ax)
+    ay = np.where(reflect, -ay, ay)
+    upx = np.where(straight, ux, ax + slope * tx)
+    upy = np.where(straight, uy, ay + slope * ty)
+    l = np.sqrt(upx * upx + upy * upy)
+    return upx / l, upy / l
+
+def BatchPoints(x, y, ux, uy, t):
+    """Returns the points x + t * ux, y + t * uy on a bundle of rays. Rays with a distance of inf get nan coordinates.
+    """
+    t = np.where(np.isfinite(t), t, np.nan)
+    return x + t * ux, y + t * uy
+
+def _SolveQuadratic(a, b, c):
+    # solve a t**2 + b t + c = 0 for arrays; falls back to the linear solution where a == 0
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        D = b * b - 4 * a * c
+        sD = np.sqrt(np.where(D >= 0, D, np.nan))
+        t1 = (-b + sD) / (2 * a)
+        t2 = (-b - sD) / (2 * a)
+        lin = (a == 0)
+        if np.any(lin):
+            tl = -c / b
+            t1 = np.where(lin, tl, t1)
+            t2 = np.where(lin, np.nan, t2)
+    t1 = np.where(t1 > MIN_DISTANCE, t1, np.inf)
+    t2 = np.where(t2 > MIN_DISTANCE, t2, np.inf)
+    return t1, t2
+
+def BatchNearest(candidates, n):
+    """Pick the closest intersection from a list of candidate surfaces. On ties, the first candidate wins.
+
+    :param list candidates: List of (t, nx, ny) tuples, where t is the array of distances for one surface and nx, ny give the (not necessarily normalized) surface normal as scalars or arrays.
+    :param int n: Number of rays.
+    :returns: - array of distances (inf for no hit)
+              - array of indices into the candidate list (-1 for no hit)
+              - arrays nx, ny of the normalized surface normals (nan for no hit)
+    """
+    d = np.full(n, np.inf)
+    sid = np.full(n, -1, dtype = int)
+    nx = np.full(n, np.nan)
+    ny = np.full(n, np.nan)
+    for i in range(len(candidates)):
+        t, cx, cy = candidates[i]
+        closer = t < d
+        if np.any(closer):
+            d = np.where(closer, t, d)
+            sid[closer] = i
+            nx = np.where(closer, cx, nx)
+            ny = np.where(closer, cy, ny)
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        l = np.sqrt(nx * nx + ny * ny)
+        nx = nx / l
+        ny = ny / l
+    return d, sid, nx, ny
@@ -0,0 +1,165 @@
+"""
+.. module: opsim.opsim_cache
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Content hashes of scenes and an on-disk cache of trace results.
+
+:py:func:`sceneHash` returns the SHA-1 hash of everything that determines the result of a trace: the type and the declared properties of each object in scene order, which include position, rotation and mirroring, and the trace settings. Numbers are hashed as floats, so that integer and float values of a property give the same hash. The hash does not depend on runtime state like the selection, so reopening a file, undoing an edit or tracing the same scene on another machine gives the same hash.
+
+:py:class:`DOSSS_TraceCache` stores the ray segments of finished traces as one *.npz* file per hash in a folder. Reading an entry marks it as recently used; when the cache grows beyond its size limit, the least recently used entries are deleted. The cache counts hits and misses, so that its benefit can be checked with :py:func:`DOSSS_TraceCache.GetStats`.
+
+.. note:: The hash covers the scene but not the code of the objects. After changing an object module, the cache should be emptied with :py:func:`DOSSS_TraceCache.Clear`.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+import os
+import glob
+import json
+import hashlib
+import numpy as np
+from core.opsim_sceneio import objectRecord, plainValue
+from core.opsim_raystore import DOSSS_RayStore, FIELDS
+
+HASH_VERSION = 1    #: changes of the engine that change trace results have to increment this number, which invalidates all cached traces
+CACHE_FOLDER = os.path.join(os.path.expanduser("~"), ".dosss", "tracecache")   #: default folder of the trace cache
+CACHE_SIZE = 256 * 2**20    #: default size limit of the trace cache in bytes
+
+def normalize(value):
+    # numbers are hashed as floats, so that, e.g., a position of 100 and 100.0 give the same hash
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    if isinstance(value, dict):
+        return dict([(k, normalize(v)) for k, v in value.items()])
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+def sceneHash(objects, settings = None):
+    """Returns the SHA-1 hash of a scene as hexadecimal string.
+
+    :param list objects: List of objects.
+    :param dict settings: Trace settings, e.g., *maxNumberOfIterations* and *sequential* (default = none).
+    """
+    if settings is None:
+        settings = {}
+    h = hashlib.sha1()
+    h.update(json.dumps({"version": HASH_VERSION, "settings": normalize(settings)}, sort_keys = True, default = plainValue).encode("utf-8"))
+    for o in objects:
+        h.update(b"\n")
+        h.update(json.dumps(normalize(objectRecord(o)), sort_keys = True, default = plainValue).encode("utf-8"))
+    return h.hexdigest()
+
+class DOSSS_TraceCache:
+    """On-disk cache of trace results keyed by the hash of the scene.
+
+    :param str folder: Folder holding the cache files, which is created if necessary (default = CACHE_FOLDER).
+    :param int maxSize: Size limit of the cache in bytes (default = CACHE_SIZE).
+    """
+    def __init__(self, folder = None, maxSize = CACHE_SIZE):
+        if folder is None:
+            folder = CACHE_FOLDER
+        self.folder = folder
+        self.maxSize = maxSize
+        self.hits = 0           #: number of successful lookups
+        self.misses = 0         #: number of lookups without cached result
+        self.stores = 0         #: number of results written to the cache
+        self.evictions = 0      #: number of entries deleted to stay within the size limit
+
+    def _filename(self, key):
+        return os.path.join(self.folder, key + ".npz")
+
+    def Get(self, key):
+        """Returns the cached ray store for a scene hash or None if there is none.
+        """
+        filename = self._filename(key)
+        try:
+            with np.load(filename) as data:
+                store = DOSSS_RayStore()
+                for f in FIELDS:
+                    setattr(store, f, data[f])
+            # mark as recently used
+            os.utime(filename, None)
+        except (IOError, OSError, KeyError, ValueError):
+            self.misses = self.misses + 1
+            return None
+        store.dtype = store.p0.dtype.type
+        self.hits = self.hits + 1
+        return store
+
+    def Put(self, key, store):
+        """Store the result of a trace and delete the least recently used entries if the cache exceeds its size limit. Errors are ignored, as the cache is only an optimization.
+
+        :param str key: Scene hash as returned by :py:func:`sceneHash`.
+        :param DOSSS_RayStore store: Ray segments of the trace.
+        """
+        try:
+            if not os.path.isdir(self.folder):
+                os.makedirs(self.folder)
+            # write to a temporary file first, so that readers never see a partial entry
+            tmp = self._filename(key) + ".%d.tmp" % os.getpid()
+            with open(tmp, "wb") as fp:
+                np.savez(fp, **dict([(f, np.asarray(getattr(store, f))) for f in FIELDS]))
+            if os.path.exists(self._filename(key)):
+                os.remove(self._filename(key))
+            os.rename(tmp, self._filename(key))
+        except (IOError, OSError):
+            return
+        self.stores = self.stores + 1
+        self.Evict()
+
+    def Evict(self):
+        """Delete the least recently used entries until the cache is within its size limit.
+        """
+        entries = []
+        for filename in glob.glob(os.path.join(self.folder, "*.npz")):
+            try:
+                entries.append([os.path.getmtime(filename), os.path.getsize(filename), filename])
+            except OSError:
+                pass
+        entries.sort()
+        size = sum([e[1] for e in entries])
+        for mtime, n, filename in entries:
+            if size <= self.maxSize:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                continue
+            size = size - n
+            self.evictions = self.evictions + 1
+
+    def Clear(self):
+        """Delete all entries of the cache.
+        """
+        for filename in glob.glob(os.path.join(self.folder, "*.npz")):
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+    def GetStats(self):
+        """Returns a dictionary with the counters, the hit rate and the number and total size of the entries.
+        """
+        files = glob.glob(os.path.join(self.folder, "*.npz"))
+        lookups = self.hits + self.misses
+        rate = 0.0
+        if lookups > 0:
+            rate = self.hits / float(lookups)
+        return {"hits": self.hits, "misses": self.misses, "hitRate": rate, "stores": self.stores, "evictions": self.evictions, "entries": len(files), "size": sum([os.path.getsize(f) for f in files])}
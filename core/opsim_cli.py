@@ -0,0 +1,178 @@
+"""
+.. module: opsim.opsim_cli
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Command line interface for tracing scenes without a display, e.g., in batch jobs::
+
+    python opsim.py trace scene.dos --rays 1000 --out result.npz --svg result.svg --png result.png
+    python opsim.py trace "scenes/*.dos" --out "{name}.npz" --jobs 8
+
+Each scene is loaded, traced with the headless engine and the requested outputs are written:
+
+    * *--out*: all ray segments as compressed NumPy archive with the arrays of :py:class:`~core.opsim_raystore.DOSSS_RayStore`,
+    * *--svg*: vector graphics of objects and rays,
+    * *--png*: raster image of objects and rays, see :py:mod:`core.opsim_png`.
+
+Scene arguments can be glob patterns. If more than one scene is traced, the output names have to contain the placeholder *{name}*, which is replaced by the file name of the scene without extension. With *--jobs*, the scenes are traced in parallel processes. With *--cache*, scenes that were traced before are loaded from the trace cache, see :py:mod:`core.opsim_cache`. The time needed for each phase is printed for every scene. The exit code is 0 if all scenes were traced successfully, 1 if at least one scene failed and 2 for invalid arguments.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+from __future__ import print_function
+import os
+import sys
+import glob
+import time
+import argparse
+import traceback
+import multiprocessing
+import numpy as np
+from core.opsim_scene import loadScene
+from core.opsim_raystore import FIELDS
+from core.opsim_png import rasterize, writePNG
+from core.opsim_cache import DOSSS_TraceCache
+
+def parser():
+    """Returns the argument parser of the *trace* command.
+    """
+    p = argparse.ArgumentParser(prog = "opsim.py trace", description = "Trace DOSSS scenes without a display.")
+    p.add_argument("scenes", nargs = "+", help = "scene files (*.dos) or glob patterns")
+    p.add_argument("--rays", type = int, default = None, help = "number of rays of each light source (default: as stored in the scene)")
+    p.add_argument("--out", default = None, help = "write the ray segments to this NumPy archive (*.npz)")
+    p.add_argument("--svg", default = None, help = "write objects and rays to this SVG file")
+    p.add_argument("--png", default = None, help = "write objects and rays to this PNG file")
+    p.add_argument("--png-width", type = int, default = 1000, help = "width of the PNG image in pixels (default: 1000)")
+    p.add_argument("--max-iterations", type = int, default = None, help = "maximum number of segments of a ray (default: as stored in the scene or 20)")
+    p.add_argument("--sequential", action = "store_true", help = "trace the objects in the order of the scene file (default: as stored in the scene)")
+    p.add_argument("--jobs", type = int, default = 1, help = "number of scenes traced in parallel (default: 1)")
+    p.add_argument("--cache", action = "store_true", help = "load the results of scenes that were traced before from the trace cache")
+    p.add_argument("--cache-dir", default = None, help = "folder of the trace cache (default: ~/.dosss/tracecache)")
+    return p
+
+def outputName(pattern, scene):
+    """Returns the name of an output file for a scene, replacing *{name}* in pattern.
+    """
+    if pattern is None:
+        return None
+    return pattern.replace("{name}", os.path.splitext(os.path.basename(scene))[0])
+
+def traceScene(task):
+    """Trace a single scene and write its outputs. This is executed in the worker processes.
+
+    :param list task: [scene file name, parsed arguments].
+    :returns: [scene file name, list of [phase, time in s], number of segments, error message or None]; the trace phase is called *cached* if the result was loaded from the trace cache.
+    """
+    filename, args = task
+    timing = []
+    segments = 0
+    cache = None
+    if args.cache:
+        cache = DOSSS_TraceCache(args.cache_dir)
+    try:
+        t0 = time.time()
+        scene = loadScene(filename, args.max_iterations)
+        if args.sequential:
+            scene.sequential = 1
+        if args.rays is not None:
+            for o in scene.objects:
+                if o.lightsource and "noRays" in o.GetProperties():
+                    o.SetProperties(noRays = args.rays)
+        timing.append(["load", time.time() - t0])
+
+        t0 = time.time()
+        rays = scene.Trace(cache = cache)
+        segments = len(rays)
+        if cache is not None and cache.hits > 0:
+            timing.append(["cached", time.time() - t0])
+        else:
+            timing.append(["trace", time.time() - t0])
+
+        out = outputName(args.out, filename)
+        if out is not None:
+            t0 = time.time()
+            np.savez_compressed(out, **dict([(f, getattr(rays, f)) for f in FIELDS]))
+            timing.append(["npz", time.time() - t0])
+        svg = outputName(args.svg, filename)
+        if svg is not None:
+            t0 = time.time()
+            scene.SaveSVG(svg, rays)
+            timing.append(["svg", time.time() - t0])
+        png = outputName(args.png, filename)
+        if png is not None:
+            t0 = time.time()
+            writePNG(png, rasterize(scene.objects, rays, args.png_width).img)
+            timing.append(["png", time.time() - t0])
+    except Exception as e:
+        return [filename, timing, segments, "%s\n%s" % (e, traceback.format_exc())]
+    return [filename, timing, segments, None]
+
+def main(argv = None):
+    """Entry point of the *trace* command.
+
+    :param list argv: Command line arguments after *trace* (default = sys.argv[2:]).
+    :returns: Exit code.
+    """
+    if argv is None:
+        argv = sys.argv[2:]
+    p = parser()
+    args = p.parse_args(argv)
+
+    # expand glob patterns; patterns without match are reported as failed scenes
+    scenes = []
+    missing = []
+    for pattern in args.scenes:
+        files = sorted(glob.glob(pattern))
+        if len(files) == 0:
+            missing.append(pattern)
+        scenes = scenes + files
+    if len(scenes) + len(missing) > 1:
+        for name in (args.out, args.svg, args.png):
+            if name is not None and "{name}" not in name:
+                p.error("output names need the placeholder {name} when tracing several scenes")
+
+    t0 = time.time()
+    tasks = [[s, args] for s in scenes]
+    if args.jobs > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(min(args.jobs, len(tasks)))
+        results = pool.imap(traceScene, tasks)
+    else:
+        pool = None
+        results = map(traceScene, tasks)
+
+    failed = 0
+    cached = 0
+    for pattern in missing:
+        print("%s: no such scene" % pattern, file = sys.stderr)
+        failed = failed + 1
+    for filename, timing, segments, error in results:
+        phases = ", ".join(["%s %.3f s" % (phase, t) for phase, t in timing])
+        if error is not None:
+            print("%s: failed after %s\n%s" % (filename, phases or "0 s", error), file = sys.stderr)
+            failed = failed + 1
+        else:
+            print("%s: %d segments, %s" % (filename, segments, phases))
+            cached = cached + int(timing[1][0] == "cached")
+    if pool is not None:
+        pool.close()
+        pool.join()
+    print("%d of %d scenes traced in %.3f s" % (len(scenes) + len(missing) - failed, len(scenes) + len(missing), time.time() - t0))
+    if args.cache:
+        print("trace cache: %d hits, %d misses" % (cached, len(scenes) - failed - cached))
+
+    if failed:
+        return 1
+    return 0
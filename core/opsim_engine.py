@@ -0,0 +1,476 @@
+"""
+.. module: opsim.opsim_engine
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+The raytracing engine of DOSSS.
+
+The light rays are propagated through the scene round by round: in each round, every unprocessed ray is intersected with all objects and the emerging rays of the closest intersection are queued for the next round. For this, the surfaces of all objects are compiled into arrays in laboratory frame (see :py:mod:`core.opsim_primitives`), so that all rays of a round are intersected with the whole scene at once. Objects that do not describe themselves by surfaces are tested with :py:func:`~core.opsim_objectbase.DOSSSObject.IntersectionBatch` and, if hit, with their scalar :py:func:`~core.opsim_objectbase.DOSSSObject.Intersection`. The rounds are exposed as a generator, so that the caller can display or process the finished segments while the rest of the scene is still being traced.
+
+The traced rays form a tree: each ray knows its parent, its children and the object it ended on. When a single object is changed, :py:func:`~core.opsim_engine.DOSSS_Tracer.Invalidate` cuts off only those subtrees whose segments cross the old or new bounding box of the object, so that a subsequent call to :py:func:`~core.opsim_engine.DOSSS_Tracer.Rounds` re-traces only the affected part of the scene.
+
+Consumers that do not need the whole ray tree can use :py:func:`~core.opsim_engine.DOSSS_Tracer.Stream` instead, which traces depth-first and yields every segment as soon as it is finished without keeping references to it.
+
+For very large numbers of rays, :py:func:`~core.opsim_engine.DOSSS_Tracer.TraceChunked` emits the light in chunks of source rays, traces each chunk completely and hands the segments to a list of sinks (see :py:mod:`core.opsim_sinks`) before the chunk is released. The peak memory is therefore given by the chunk size, not by the total number of rays.
+
+For interactive previews, the re-trace can be limited to a time budget and to a fraction of the rays. Rays that are left out are marked as *deferred*; they are neither traced nor displayed until :py:func:`~core.opsim_engine.DOSSS_Tracer.Resume` is called.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+import time
+from copy import deepcopy
+from collections import namedtuple
+import numpy as np
+from core.opsim_lightray import *
+from core.opsim_primitives import DOSSS_CompiledScene, ABSORB
+
+#: A finished ray segment as produced by :py:func:`DOSSS_Tracer.Stream`. *origin*, *end* and *direction* are (x, y) tuples in laboratory frame, *end* is None for rays running off to infinity. *parent* is the id of the segment from which this one emerged (-1 for rays emitted by a light source) and *hit* is the index of the object at which the segment ends (-1 if none). *truncated* is True for segments that were not traced because the ray reached the maximum number of iterations; their *end* is None as well.
+DOSSS_Segment = namedtuple("DOSSS_Segment", ["id", "parent", "origin", "end", "direction", "power", "depth", "hit", "truncated"])
+
+BATCH_SIZE = 64         #: number of rays intersected at once when tracing with a deadline
+SEGMENT_BYTES = 512     #: estimated memory footprint of a single DOSSS_Segment in bytes, used for the memory budget of chunked tracing
+
+class DOSSS_Tracer:
+    """Raytracer working on a list of DOSSS objects.
+
+    :param list objects: List of DOSSSObjects that make up the scene.
+    :param int maxNumberOfIterations: Maximum number of ray segments created during rendering (default = 20).
+    """
+    def __init__(self, objects, maxNumberOfIterations = 20):
+        self.objects = objects
+        self.maxNumberOfIterations = maxNumberOfIterations
+        self.rays = []      #: list of all DOSSS_LightRay segments traced so far
+        self.batch = 1      #: use the vectorized intersection test for each round (set to 0 to intersect every ray with every object one by one)
+        self.compiled = None    #: surfaces of the scene in laboratory frame as DOSSS_CompiledScene, see Compile
+        self.sequence = None    #: list of object indices in the order in which they are traversed for sequential tracing, None for non-sequential tracing
+        self.compiledSteps = {} #: compiled candidate objects for each step of a sequential trace
+
+    def EmitLight(self):
+        """Collect the initial light rays from all light sources in the scene. This resets any previous trace.
+
+        :returns: List of initial DOSSS_LightRay objects (empty if there is no light source).
+        """
+        self.rays = []
+        for op in self.objects:
+            if op.lightsource:
+                self.rays = self.rays + self.GetLightFrom(op)
+        return self.rays
+
+    def GetLightFrom(self, op):
+        """Returns the initial light rays of a single light source, tagged with their source.
+        """
+        rays = op.GetLight()
+        for r in rays:
+            r.source = op
+        return rays
+
+    def IterLight(self):
+        """Generator over the initial light rays of all light sources. In contrast to :py:func:`EmitLight`, the rays are not stored in the tracer.
+        """
+        for op in self.objects:
+            if op.lightsource:
+                for r in op.IterLight():
+                    r.source = op
+                    yield r
+
+    def Intersect(self, r, indices = None):
+        """Find the closest intersection of a single ray with any object of the scene. The end point of the ray is set to the intersection point and the ray is marked as processed.
+
+        :param DOSSS_LightRay r: The light ray.
+        :param list indices: Optional list of indices of the objects to test (default = all objects).
+        :returns: - index of the object that was hit (-1 if none)
+                  - list of emerging rays (list of DOSSS_LightRay) with depth, source and power set, but not linked to r
+        """
+        l = r.getCurLine()
+        r.processed = 1
+        if l is None:
+            return [-1, []]
+
+        # calculate intersection with each object and take the closest intersection point
+        if indices is None:
+            if self.sequence is not None:
+                indices = self.Candidates(r.element)
+            else:
+                indices = range(len(self.objects))
+        objId = -1
+        d0 = 0
+        nr0 = []
+        for i in indices:
+            p, d, nr = self.objects[i].Intersection(l)
+            # the minimal distance has to be larger than 0 due to numerical errors!
+            if p != None and d > 1e-7 and l.isLambdaPositiveForPoint(p):
+                if(objId == -1 or d0 > d):
+                    objId = i
+                    r.p1 = deepcopy(p)
+                    nr0 = nr
+                    d0 = d
+
+        return [objId, self._Children(r, [fromLine(nr) for nr in nr0], objId)]
+
+    def _Children(self, r, children, objId):
+        # set depth, source, power and position in the sequence of the rays emerging from r; the power is shared equally between them
+        element = r.element
+        if self.sequence is not None and element < len(self.sequence):
+            if objId == self.sequence[element]:
+                element = element + 1
+            elif objId == -1:
+                # missed the next element
+                r.vignetted = 1
+        for c in children:
+            c.depth = r.depth + 1
+            c.source = r.source
+            c.power = r.power / len(children)
+            c.element = element
+        return children
+
+    def GetSequence(self):
+        """Returns the default sequence for sequential tracing, i.e., the indices of all objects that interact with light in the order of the object list. Light sources and objects without surfaces, like labels, are skipped.
+        """
+        sequence = []
+        for i in range(len(self.objects)):
+            o = self.objects[i]
+            if not o.lightsource and o.GetSurfaces() != []:
+                sequence.append(i)
+        return sequence
+
+    def Candidates(self, element):
+        """Returns the indices of the objects a ray can hit in a sequential trace: the element the ray is currently in or has just left, and the next element in the sequence.
+
+        :param int element: Position of the next element in the sequence.
+        """
+        indices = []
+        if element > 0:
+            indices.append(self.sequence[element - 1])
+        if element < len(self.sequence):
+            indices.append(self.sequence[element])
+        return indices
+
+    def IntersectBatch(self, rays):
+        """Batch version of :py:func:`Intersect` for a list of rays. The rays are intersected with the surfaces of all objects of the compiled scene (see :py:func:`Compile`) at once and the emerging rays are calculated directly from the surface that was hit. Objects without surface description are tested with :py:func:`~core.opsim_objectbase.DOSSSObject.IntersectionBatch`; if such an object is the closest one, the emerging rays are calculated with its scalar intersection test.
+
+        In sequential mode (see :py:attr:`sequence`), the rays are grouped by their position in the sequence and each group is intersected only with its candidate objects (see :py:func:`Candidates`).
+
+        :param list rays: List of DOSSS_LightRay objects.
+        :returns: List of [objId, children] pairs as returned by :py:func:`Intersect`, one for each ray.
+        """
+        n = len(rays)
+        if n == 0 or not self.batch:
+            return [self.Intersect(r) for r in rays]
+        if self.sequence is None:
+            scene = self.compiled
+            if scene is None:
+                scene = DOSSS_CompiledScene(self.objects)
+            return self._IntersectScene(rays, scene, range(len(self.objects)))
+
+        # sequential mode
+        steps = {}
+        for i in range(n):
+            steps.setdefault(rays[i].element, []).append(i)
+        result = [None] * n
+        for element in steps:
+            indices = self.Candidates(element)
+            if element not in self.compiledSteps:
+                self.compiledSteps[element] = DOSSS_CompiledScene([self.objects[i] for i in indices])
+            group = steps[element]
+            for i, res in zip(group, self._IntersectScene([rays[i] for i in group], self.compiledSteps[element], indices)):
+                result[i] = res
+        return result
+
+    def _IntersectScene(self, rays, scene, indices):
+        # intersect the rays with a compiled scene, whose objects have the given indices in the object list
+        n = len(rays)
+
+        # collect base points and directions
+        lines = [r.getCurLine() for r in rays]
+        bundle = np.zeros((n, 4))
+        for i in range(n):
+            if lines[i] is not None:
+                bundle[i] = [lines[i].a.x(), lines[i].a.y(), lines[i].u.x(), lines[i].u.y()]
+
+        # closest surface for each ray
+        d0, hit, surface, normals, kind, ior = scene.Intersect(bundle)
+        primitive = (hit != -1)
+        # objects without surface description
+        for i in scene.fallback:
+            d = self.objects[indices[i]].IntersectionBatch(bundle)[0]
+            closer = d < d0
+            d0 = np.where(closer, d, d0)
+            hit[closer] = i
+            primitive[closer] = False
+            # the emerging rays are calculated by the object itself; skip the primitive's deflection
+            kind[closer] = ABSORB
+        emerging = scene.Emerge(bundle, d0, normals, kind, ior, hit, surface)
+
+        result = []
+        for i in range(n):
+            if lines[i] is None or hit[i] == -1:
+                rays[i].processed = 1
+                result.append([-1, self._Children(rays[i], [], -1)])
+                continue
+            objId = indices[int(hit[i])]
+            if primitive[i]:
+                r = rays[i]
+                r.processed = 1
+                r.p1 = DOSSSVector(bundle[i, 0] + d0[i] * bundle[i, 2], bundle[i, 1] + d0[i] * bundle[i, 3])
+                children = [DOSSS_LightRay(x, y, ux, uy) for x, y, ux, uy in emerging[i]]
+                result.append([objId, self._Children(r, children, objId)])
+                continue
+            objId, children = self.Intersect(rays[i], [objId])
+            if objId == -1:
+                # the scalar test disagrees, e.g., for a ray grazing a corner: fall back to testing all objects
+                rays[i].vignetted = 0
+                objId, children = self.Intersect(rays[i])
+            result.append([objId, children])
+        return result
+
+    def Propagate(self, r, intersection = None):
+        """Propagate a single ray to its closest intersection with any object of the scene and link the emerging rays into the ray tree.
+
+        :param DOSSS_LightRay r: The light ray.
+        :param list intersection: Result of :py:func:`Intersect` or :py:func:`IntersectBatch` for this ray, if already known.
+        :returns: List of emerging rays (list of DOSSS_LightRay, empty if there was no intersection).
+        """
+        if intersection is None:
+            intersection = self.Intersect(r)
+        objId, children = intersection
+        if objId != -1:
+            r.hitObject = self.objects[objId]
+        for c in children:
+            c.parent = r
+        r.children = children
+        return children
+
+    def Stream(self, roots = None, firstId = 0):
+        """Generator that traces the scene depth-first and yields each segment as a :py:class:`DOSSS_Segment` as soon as it is finished. Parents are always yielded before their children.
+
+        Each ray is intersected with the compiled scene (see :py:func:`Compile`), which is built when the generator starts; the objects must not be changed while streaming. The tracer does not keep any reference to the finished segments. Internally, only the rays that are still waiting to be traced are buffered, which are at most one branch per level of the ray tree that is currently being traced, i.e., the buffer is bounded by the maximum number of iterations times the number of rays emerging from a single intersection.
+
+        :param iterable roots: Initial DOSSS_LightRay objects. If None, the light is taken from the light sources in the scene (see :py:func:`IterLight`).
+        :param int firstId: Id of the first segment (default = 0).
+        """
+        if roots is None:
+            roots = self.IterLight()
+        self.Compile()
+        nextId = firstId
+        for root in roots:
+            stack = [(root, -1)]
+            while len(stack) > 0:
+                r, parentId = stack.pop()
+                if r.depth < self.maxNumberOfIterations:
+                    objId, children = self.IntersectBatch([r])[0]
+                else:
+                    objId, children = -1, []
+                yield self._Segment(r, nextId, parentId, objId)
+                # push in reverse order to trace the first child first
+                for i in range(len(children) - 1, -1, -1):
+                    stack.append((children[i], nextId))
+                nextId = nextId + 1
+
+    def Compile(self):
+        """Collect the surfaces of all objects in laboratory frame for the batch intersection test (see :py:class:`~core.opsim_primitives.DOSSS_CompiledScene`). This is done automatically at the beginning of :py:func:`Rounds` and for each chunk in :py:func:`TraceChunked`; call it again whenever an object was changed before calling :py:func:`IntersectBatch` directly.
+        """
+        self.compiled = DOSSS_CompiledScene(self.objects)
+        self.compiledSteps = {}
+        return self.compiled
+
+    def Rounds(self, deadline = None):
+        """Generator that traces the scene round by round. Call :py:func:`EmitLight` first.
+
+        After each round, the list of rays that were processed in this round is yielded. The segments of these rays are final, i.e., they can be drawn right away. Rays that are still unprocessed after the maximum number of rounds are yielded last; they are displayed as running off to infinity.
+
+        :param float deadline: Optional time (as returned by time.time()) at which tracing stops. All rays that were not traced until then are deferred.
+        """
+        self.Compile()
+        pending = [r for r in self.rays if not r.processed and not r.deferred and r.depth < self.maxNumberOfIterations]
+        stopped = []
+        while(len(pending) > 0):
+            newRays = []
+            i = 0
+            while i < len(pending):
+                if deadline is not None and time.time() > deadline:
+                    # out of time: postpone the rest
+                    for r in pending[i:] + newRays:
+                        r.deferred = 1
+                    self.rays.extend(newRays)
+                    yield pending[:i]
+                    return
+                # with a deadline, intersect in small batches to be able to stop in time
+                if deadline is None:
+                    batch = pending[i:]
+                else:
+                    batch = pending[i:i + BATCH_SIZE]
+                for r, intersection in zip(batch, self.IntersectBatch(batch)):
+                    newRays.extend(self.Propagate(r, intersection))
+                i = i + len(batch)
+            self.rays.extend(newRays)
+            yield pending
+            pending = []
+            for r in newRays:
+                if r.depth < self.maxNumberOfIterations:
+                    pending.append(r)
+                else:
+                    stopped.append(r)
+
+        # remaining rays are not continued
+        if len(stopped) > 0:
+            yield stopped
+
+    def Invalidate(self, obj, oldBounds = None):
+        """Prepare an incremental re-trace after a single object was moved, changed, added or removed.
+
+        All rays whose segments cross the old or the new bounding box of the object, or which ended on the object, are cut back to their base point and marked as unprocessed; their subtrees are removed. If the object is a light source, all of its rays are emitted anew. Rays that do not come close to the object are kept as they are. Call :py:func:`Rounds` afterwards to trace the invalidated rays.
+
+        :param DOSSSObject obj: The object that was changed.
+        :param list oldBounds: Bounding box of the object before the change as returned by :py:func:`~core.opsim_objectbase.DOSSSObject.GetBounds`, None for new objects.
+        """
+        exists = obj in self.objects
+        boxes = []
+        if oldBounds is not None:
+            boxes.append(oldBounds)
+        if exists:
+            boxes.append(obj.GetBounds())
+
+        # find the rays that have to be re-traced
+        removed = set()
+        dirty = []
+        for r in self.rays:
+            if r.source is obj:
+                removed.add(id(r))
+            elif r.processed:
+                if r.hitObject is obj:
+                    dirty.append(r)
+                else:
+                    for b in boxes:
+                        if r.crossesBox(b):
+                            dirty.append(r)
+                            break
+
+        # cut off their subtrees
+        for r in dirty:
+            stack = list(r.children)
+            while len(stack) > 0:
+                c = stack.pop()
+                removed.add(id(c))
+                stack.extend(c.children)
+        for r in dirty:
+            r.p1 = None
+            r.processed = 0
+            r.hitObject = None
+            r.children = []
+        self.rays = [r for r in self.rays if id(r) not in removed]
+
+        # re-emit the light of a changed light source
+        if exists and obj.lightsource:
+            self.rays = self.rays + self.GetLightFrom(obj)
+
+    def Decimate(self, stride):
+        """Reduce the number of rays to be traced by deferring all but every stride-th unprocessed ray. Previously deferred rays are included in the selection.
+
+        :param int stride: Keep every stride-th ray (1 = keep all).
+        """
+        i = 0
+        for r in self.rays:
+            if not r.processed and r.depth < self.maxNumberOfIterations:
+                if i % stride == 0:
+                    r.deferred = 0
+                else:
+                    r.deferred = 1
+                i = i + 1
+
+    def Resume(self):
+        """Clear the deferred flag of all rays, so that the next call to :py:func:`Rounds` traces them at full quality.
+        """
+        for r in self.rays:
+            r.deferred = 0
+
+    def Trace(self):
+        """Trace the whole scene at once.
+
+        :returns: List of all DOSSS_LightRay segments.
+        """
+        self.EmitLight()
+        for finished in self.Rounds():
+            pass
+        return self.rays
+
+    def TraceChunked(self, sinks, chunkSize = 10000, memoryBudget = None):
+        """Trace the scene in chunks of source rays with bounded memory. Each chunk is traced to completion round by round with batched intersection tests (see :py:func:`IntersectBatch`), its segments are passed to all sinks and the chunk is released before the next one is emitted.
+
+        A sink is any object providing the methods *AddSegments(segments)*, which receives a list of :py:class:`DOSSS_Segment`, and *Finish()*, which is called once after the last chunk.
+
+        :param list sinks: List of sink objects.
+        :param int chunkSize: Number of source rays per chunk (default = 10000).
+        :param int memoryBudget: Optional limit for the memory used by the segments of one chunk in bytes. If given, the first chunk is sized assuming that each source ray creates one segment per iteration, i.e., maxNumberOfIterations + 1 segments; after each chunk, the chunk size is adapted to the measured number of segments per source ray. The limit is approximate, as segments are estimated with SEGMENT_BYTES and beam splitters can create more segments per ray than the first estimate.
+        :returns: Total number of segments.
+        """
+        nextId = 0
+        nroots = 0
+        chunk = []
+        if memoryBudget is not None:
+            firstSize = int(memoryBudget / (SEGMENT_BYTES * (self.maxNumberOfIterations + 1)))
+            if firstSize < chunkSize:
+                chunkSize = firstSize
+            if chunkSize < 1:
+                chunkSize = 1
+        for r in self.IterLight():
+            chunk.append(r)
+            if len(chunk) >= chunkSize:
+                nextId = self._TraceChunk(chunk, sinks, nextId)
+                nroots = nroots + len(chunk)
+                chunk = []
+                # adapt chunk size to the memory budget
+                if memoryBudget is not None:
+                    segmentsPerRay = float(nextId) / nroots
+                    chunkSize = int(memoryBudget / (SEGMENT_BYTES * segmentsPerRay))
+                    if chunkSize < 1:
+                        chunkSize = 1
+        if len(chunk) > 0:
+            nextId = self._TraceChunk(chunk, sinks, nextId)
+        for s in sinks:
+            s.Finish()
+        return nextId
+
+    def _TraceChunk(self, chunk, sinks, nextId):
+        # trace a single chunk round by round and pass its segments to the sinks; returns the next free segment id
+        self.Compile()
+        segments = []
+        level = [(r, -1) for r in chunk]
+        while len(level) > 0:
+            active = [r for r, parentId in level if r.depth < self.maxNumberOfIterations]
+            results = iter(self.IntersectBatch(active))
+            nextLevel = []
+            for r, parentId in level:
+                if r.depth < self.maxNumberOfIterations:
+                    objId, children = next(results)
+                else:
+                    objId, children = -1, []
+                segments.append(self._Segment(r, nextId, parentId, objId))
+                for c in children:
+                    nextLevel.append((c, nextId))
+                nextId = nextId + 1
+            level = nextLevel
+        for s in sinks:
+            s.AddSegments(segments)
+        return nextId
+
+    def _Segment(self, r, segId, parentId, objId):
+        # convert a processed ray into a DOSSS_Segment
+        if r.p1 != None:
+            end = (float(r.p1.x()), float(r.p1.y()))
+        else:
+            end = None
+        return DOSSS_Segment(segId, parentId, (float(r.p0.x()), float(r.p0.y())), end, (float(r.u.x()), float(r.u.y())), r.power, r.depth, objId, r.depth >= self.maxNumberOfIterations)
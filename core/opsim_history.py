@@ -0,0 +1,174 @@
+"""
+.. module: opsim.opsim_history
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Undo / redo history of a scene.
+
+Instead of copying the whole object list after each edit, the history keeps an immutable record of each object, i.e., a tuple of its name and the values of its declared properties (see :py:class:`~core.opsim_objectbase.DOSSS_Property`). A step of the history only contains the records before and after the edit of the objects that were actually changed; all other records are shared between the steps and the current state. Steps that add, remove or reorder objects additionally store the object order as tuple of references.
+
+The objects themselves stay the same instances: undoing an edit sets the recorded properties of the changed objects and restores the object order, so that, e.g., the incremental update of the rays keeps working::
+
+    history = DOSSS_History(objects)
+    lens.SetProperties(x = 120)
+    history.Commit(objects, [lens])
+    objects = history.Undo()        # lens is back at its old position
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+
+def freeze(value):
+    # immutable copy of a property value; lists become tuples
+    if isinstance(value, (list, tuple)):
+        return tuple([freeze(v) for v in value])
+    return value
+
+def thaw(value):
+    # inverse of freeze
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+def objectSnapshot(obj):
+    """Returns the immutable record of an object: a tuple of its name and the sorted (name, value) pairs of its properties.
+    """
+    return (obj.get_name(), tuple(sorted([(k, freeze(v)) for k, v in obj.GetProperties().items()])))
+
+def restoreSnapshot(obj, record):
+    """Sets the properties of an object to the values of a record.
+    """
+    obj.SetProperties(dict([(k, thaw(v)) for k, v in record[1]]))
+    obj.ClearDirty()
+
+class DOSSS_History:
+    """Undo / redo history of a list of objects.
+
+    :param list objects: Initial list of objects (default = empty scene).
+    :param int maxSteps: Maximum number of steps that can be undone (default = 1000).
+    """
+    def __init__(self, objects = None, maxSteps = 1000):
+        self.maxSteps = maxSteps
+        self.Reset(objects)
+
+    def Reset(self, objects = None):
+        """Forget all steps and use objects as the initial state, e.g., after opening a scene.
+        """
+        if objects is None:
+            objects = []
+        self.order = tuple(objects)     #: objects of the current state
+        self.records = dict([(id(o), objectSnapshot(o)) for o in objects])    #: records of the current state, keyed by the id of the objects
+        self.undoSteps = []     #: list of steps [label, changes, order before, order after]; changes is a list of [object, record before, record after], where None denotes an object that is not part of the scene
+        self.redoSteps = []
+
+    def Commit(self, objects, changed = None, label = ""):
+        """Add a step for the changes since the last call. Only the objects in changed are compared with their records, which avoids creating records of all objects of a large scene; added and removed objects are detected in any case.
+
+        :param list objects: Current list of objects.
+        :param list changed: Objects that may have been changed (default = None, i.e., all objects are compared).
+        :param str label: Description of the step, e.g., for a menu entry.
+        :returns: True if a step was added, False if nothing changed.
+        """
+        order = tuple(objects)
+        reordered = order != self.order
+        if changed is None:
+            changed = order
+        current = set([id(o) for o in order])
+        if reordered:
+            changed = list(changed) + [o for o in order if id(o) not in self.records]
+        else:
+            # objects that are not part of the scene, e.g., removed by an undo step, are unchanged
+            changed = [o for o in changed if id(o) in current]
+
+        changes = []
+        done = set()
+        for o in changed:
+            if id(o) in done:
+                continue
+            done.add(id(o))
+            before = self.records.get(id(o))
+            if id(o) not in current:
+                after = None
+            else:
+                after = objectSnapshot(o)
+            if after != before:
+                changes.append([o, before, after])
+        if reordered:
+            for o in self.order:
+                if id(o) not in current and id(o) not in done:
+                    changes.append([o, self.records[id(o)], None])
+        if len(changes) == 0 and not reordered:
+            return False
+
+        for o, before, after in changes:
+            self._SetRecord(o, after)
+        if reordered:
+            self.undoSteps.append([label, changes, self.order, order])
+        else:
+            self.undoSteps.append([label, changes, None, None])
+        self.order = order
+        self.redoSteps = []
+        if len(self.undoSteps) > self.maxSteps:
+            del self.undoSteps[0]
+        return True
+
+    def _SetRecord(self, obj, record):
+        if record is None:
+            self.records.pop(id(obj), None)
+        else:
+            self.records[id(obj)] = record
+
+    def _Apply(self, step, redo):
+        # set the objects of a step to their records before (undo) or after (redo) the step
+        label, changes, before, after = step
+        for change in changes:
+            record = change[1 + int(redo)]
+            if record is not None:
+                restoreSnapshot(change[0], record)
+            self._SetRecord(change[0], record)
+        if redo and after is not None:
+            self.order = after
+        elif not redo and before is not None:
+            self.order = before
+        return list(self.order)
+
+    def CanUndo(self):
+        return len(self.undoSteps) > 0
+
+    def CanRedo(self):
+        return len(self.redoSteps) > 0
+
+    def GetObjects(self, redo = False):
+        """Returns the objects changed by the next undo (or redo) step, e.g., to get their bounding boxes before the step is applied, or None if there is no such step. The list is empty for steps that only reorder objects.
+        """
+        steps = self.redoSteps if redo else self.undoSteps
+        if len(steps) == 0:
+            return None
+        return [c[0] for c in steps[-1][1]]
+
+    def Undo(self):
+        """Undo the last step and return the resulting list of objects.
+        """
+        step = self.undoSteps.pop()
+        self.redoSteps.append(step)
+        return self._Apply(step, False)
+
+    def Redo(self):
+        """Redo the last undone step and return the resulting list of objects.
+        """
+        step = self.redoSteps.pop()
+        self.undoSteps.append(step)
+        return self._Apply(step, True)
@@ -0,0 +1,45 @@
+"""
+.. module: opsim.opsim_lazy
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Deferred import of heavy modules. The geometry, the objects and the tracer refer to wx only for drawing and for the property dialogs, so wx is imported when one of these functions is called for the first time. This way, scenes can be loaded and traced from scripts or batch jobs without loading the GUI toolkit, or even without wx being installed.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+import importlib
+
+class DOSSS_LazyModule:
+    """Placeholder for a module that is imported on first access of one of its attributes.
+
+    :param str name: Name of the module.
+    """
+    def __init__(self, name):
+        self.__dict__["name"] = name
+        self.__dict__["module"] = None
+
+    def load(self):
+        """Imports the module if this has not yet been done and returns it.
+        """
+        if self.__dict__["module"] is None:
+            self.__dict__["module"] = importlib.import_module(self.__dict__["name"])
+        return self.__dict__["module"]
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+wx = DOSSS_LazyModule("wx")     #: wxPython, imported on first use
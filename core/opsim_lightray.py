@@ -21,7 +21,7 @@ Definitions / declarations for light rays for use in DOSSS.
 
    Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.   
 """ 
-import wx
+from core.opsim_lazy import wx
 from core.opsim_geo import *
 
 class DOSSS_LightRay:
@@ -38,6 +38,48 @@ class DOSSS_LightRay:
         self.p1 = None
         self.processed = 0
         self.u = DOSSSVector(ux, uy)              
+        # ray tree
+        self.parent = None      # ray from which this ray emerged, None for rays emitted by a light source
+        self.children = []      # rays emerging from the end point of this ray
+        self.depth = 0          # number of preceding segments
+        self.source = None      # light source object that emitted the root of this ray
+        self.hitObject = None   # object at which this ray ends, None if no object was hit
+        self.deferred = 0       # set if tracing of this ray was postponed, e.g., during a live preview
+        self.power = 1.0        # relative power carried by the ray
+        self.element = 0        # position of the next element in the sequence of a sequential trace
+        self.vignetted = 0      # set if the ray missed the next element of a sequential trace
+
+    def crossesBox(self, bbox):
+        """Returns True if the current segment of the ray crosses or touches the given box. Rays without end point are treated as running off to infinity.
+
+        :param list bbox: Box [minx, miny, maxx, maxy] in laboratory frame.
+        """
+        if self.u.isNull():
+            return False
+        tmin = 0.0
+        if self.p1 != None:
+            tmax = (self.p1 - self.p0) * self.u
+        else:
+            tmax = 1e30
+        # slab test for x and y
+        for i in range(2):
+            a = self.p0.data[i]
+            u = self.u.data[i]
+            if u == 0:
+                if a < bbox[i] or a > bbox[i + 2]:
+                    return False
+            else:
+                t1 = (bbox[i] - a) / u
+                t2 = (bbox[i + 2] - a) / u
+                if t1 > t2:
+                    t1, t2 = t2, t1
+                if t1 > tmin:
+                    tmin = t1
+                if t2 < tmax:
+                    tmax = t2
+                if tmin > tmax:
+                    return False
+        return True
     
     def ContinueRay(self, dc, px, py, ux, uy):    # in client system       
         """Calculate the continuation of the light ray beyond the last intersecting object for proper display on screen.
@@ -91,8 +133,11 @@ class DOSSS_LightRay:
         # get size of client area
         ux, uy = dc.GetSize()   
         
-        # set pen
-        dc.SetPen(wx.Pen("Red", 1))
+        # set pen; vignetted rays are drawn in grey
+        if self.vignetted:
+            dc.SetPen(wx.Pen("Grey", 1))
+        else:
+            dc.SetPen(wx.Pen("Red", 1))
         
         # create list of points
         p = []
@@ -109,11 +154,15 @@ class DOSSS_LightRay:
     def svgstr(self):		# returns a string in SVG format for exporting to vector format
         """Returns a string in SVG format for exporting to vector format.
         """
-        if(self.p1 == None):
-            self.p1 = self.p0 + self.u * 500.0 	# make a 50cm long ray
+        p1 = self.p1
+        if(p1 == None):
+            p1 = self.p0 + self.u * 500.0 	# make a 50cm long ray
         
-        svg = "<g style=\"stroke-width:0.1mm; stroke:red;\">\n";
-        svg += " <line x1=\"%f\" y1=\"%f\" x2=\"%f\" y2=\"%f\" />\n" % (self.p0.x(),self.p0.y(), self.p1.x(), self.p1.y())
+        color = "red"
+        if self.vignetted:
+            color = "grey"
+        svg = "<g style=\"stroke-width:0.1mm; stroke:%s;\">\n" % color
+        svg += " <line x1=\"%f\" y1=\"%f\" x2=\"%f\" y2=\"%f\" />\n" % (self.p0.x(),self.p0.y(), p1.x(), p1.y())
         svg += "</g>\n"
         
         return svg
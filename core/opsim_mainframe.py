@@ -23,10 +23,19 @@ Main window of DOSSS.
 """
 import wx
 import os
+import time
 from copy import deepcopy
 from core.opsim_objects import *
 from core.opsim_lightray import *
-import pickle       # save and load files
+from core.opsim_engine import *
+from core.opsim_paraxial import DOSSS_ParaxialSystem
+from core.opsim_scene import svgDocument
+from core.opsim_sceneio import readScene, saveObjects
+from core.opsim_cache import DOSSS_TraceCache, sceneHash
+from core.opsim_raystore import fromRays
+from core.opsim_history import DOSSS_History
+
+SCENE_WILDCARD = "DOSSS Files (*.dos)|*.dos|Compressed DOSSS Files (*.dosz)|*.dosz"   # file types for saving scenes
 
 # that is the main frame class
 class MainFrame(wx.Frame):
@@ -59,7 +68,20 @@ class MainFrame(wx.Frame):
         
         # light rays
         self.rays = []
+        self.beams = []         # Gaussian beams of the light sources, drawn together with the rays
         self.display_rays = 0
+        self.rendering = 0      # set while the rays are traced and drawn round by round
+        self.tracer = None      # tracer holding the ray tree of the last rendering, used for incremental updates
+        self.dragBounds = None  # bounding box of the active object at the beginning of a drag
+        self.dragMoved = 0      # set once the active object has been moved by dragging
+        self.livePreview = 1    # re-trace the rays while an object is dragged
+        self.previewBudget = 0.04   # time budget in s for tracing one frame of the live preview
+        self.previewStride = 1  # only every n-th ray is traced during the live preview
+        self.cancelRender = 0   # set by ESC to stop the current rendering
+        self.sequential = 0     # trace the objects in the order of the object list (see Move forward / backward)
+        self.traceCache = DOSSS_TraceCache()    # results of previous renderings, keyed by the hash of the scene
+        self.cachedRays = 0     # set if the rays were loaded from the trace cache, i.e., there is no ray tree to update
+        self.history = DOSSS_History()  # undo / redo history of the object list
 
         # create canvas for drawing
         self.SetBackgroundColour("White")
@@ -67,6 +89,7 @@ class MainFrame(wx.Frame):
         
         # create menu bar
         self.createMenu()
+        self.enableMenu(1)
                
         # create status bar and set status text
         self.createStatusBar() 
@@ -110,7 +133,7 @@ class MainFrame(wx.Frame):
         self.statusbar.SetStatusText("Pos: (%s, %s)" % (str(nposx), str(nposy)), 2)
         self.statusbar.SetStatusText("Origin: (%s, %s)" % (str(self.origin_x), str(self.origin_y)), 1)
         # right mouse button moves the scene
-        if event.Dragging():
+        if event.Dragging() and not self.rendering:
             dc = wx.BufferedDC(wx.ClientDC(self), self.buffer)     
             if event.RightIsDown(): # move scene                               
                 self.origin_x = self.old_origin[0] - (pos[0] - self.mouse_pos[0]) / self.zoom
@@ -124,14 +147,18 @@ class MainFrame(wx.Frame):
                     ny = round((ny) / step) * step
                     
                 self.objects[self.active_object].set_position(nx, ny)
-                self.display_rays = 0
+                self.dragMoved = 1
                 self.canClose = 0
+                if self.livePreview:
+                    self.PreviewRays(self.objects[self.active_object])
                 
             self.DrawScene(dc)
         
         event.Skip()            
     
     def OnRightDown(self, event):                                
+        if self.rendering:
+            return
         self.setHint("Scroll Mode")
         self.mouse_pos = event.GetPositionTuple()
         self.old_origin = (self.origin_x, self.origin_y)
@@ -143,6 +170,8 @@ class MainFrame(wx.Frame):
             self.clearHint()        
         
     def OnLeftDown(self, event):
+        if self.rendering:
+            return
         # select objects with mouse click
         pos = event.GetPositionTuple()
         onr = self.getObjectUnderMouse(pos)
@@ -157,6 +186,9 @@ class MainFrame(wx.Frame):
             self.CaptureMouse()
             self.mouse_pos = pos            
             self.old_origin = self.objects[self.active_object].get_position()
+            self.dragBounds = self.objects[self.active_object].GetBounds()
+            self.dragMoved = 0
+            self.previewStride = 1
             self.setHint("Move Object...")            
         elif(self.active_object != -1):
             self.objects[self.active_object].active = 0
@@ -169,16 +201,21 @@ class MainFrame(wx.Frame):
         if self.HasCapture():                       
             self.ReleaseMouse()
             self.clearHint()
+        if self.dragMoved:
+            self.dragMoved = 0
+            self.UpdateRays(self.objects[self.active_object], self.dragBounds)
         event.Skip()
     
     def OnLeftDClick(self, event):
+        if self.rendering:
+            return
         pos = event.GetPositionTuple()
         onr = self.getObjectUnderMouse(pos)
         if(onr != -1):
+            oldBounds = self.objects[onr].GetBounds()
+            self.objects[onr].ClearDirty()
             self.objects[onr].ShowPropertyDialog()
-            self.display_rays = 0
-            self.canClose = 0
-            self.InitBuffer()
+            self.UpdateRays(self.objects[onr], oldBounds)
         event.Skip()
     
     def getObjectUnderMouse(self, mousepos):
@@ -235,21 +272,40 @@ class MainFrame(wx.Frame):
         # object id's start with 1000
         menuObject = wx.Menu()
         menuNewObject = wx.Menu()
-        i = 1000
-        for ob in objectList():
-            menuNewObject.Append(i, ob)
-            self.Bind(wx.EVT_MENU, self.OnNewObject, id = i)
-            i = i + 1
+        # light sources are listed first; the id is the position of the object in objectList
+        names = objectList()
+        sources = lightSourceList()
+        others = [ob for ob in names if ob not in sources]
+        for group in [sources, others]:
+            if group is others and len(sources) > 0 and len(others) > 0:
+                menuNewObject.AppendSeparator()
+            for ob in group:
+                i = 1000 + names.index(ob)
+                menuNewObject.Append(i, ob)
+                self.Bind(wx.EVT_MENU, self.OnNewObject, id = i)
         menuObject.AppendMenu(9, "New...", menuNewObject)
         menuObject.Append(11, "Clone (STRG + c)")
         menuObject.Append(10, "Delete (DEL)")
         menuObject.AppendSeparator()
         menuObject.Append(22, "Move forward (IMG UP)")
         menuObject.Append(23, "Move backward (IMG DOWN)")
+        menuObject.AppendSeparator()
+        menuObject.Append(28, "Undo (STRG + z)")
+        menuObject.Append(29, "Redo (STRG + y)")
         
         # rendering menu
         menuRender = wx.Menu()
         menuRender.Append(12, "Render (F5)")
+        menuRender.Append(24, "Cancel Rendering (ESC)")
+        menuRender.AppendSeparator()
+        menuRender.AppendCheckItem(25, "Live Preview While Dragging")
+        if (self.livePreview):
+            menuRender.Check(25, 1)
+        menuRender.AppendCheckItem(27, "Sequential Mode (Object Order)")
+        if (self.sequential):
+            menuRender.Check(27, 1)
+        menuRender.AppendSeparator()
+        menuRender.Append(26, "Paraxial Analysis..")
         
         # put the menus together
         menuBar = wx.MenuBar()
@@ -274,7 +330,13 @@ class MainFrame(wx.Frame):
         self.Bind(wx.EVT_MENU, self.OnObjectClone, id = 11)
         self.Bind(wx.EVT_MENU, self.OnObjectUp, id = 22)
         self.Bind(wx.EVT_MENU, self.OnObjectDown, id = 23)
+        self.Bind(wx.EVT_MENU, self.OnUndo, id = 28)
+        self.Bind(wx.EVT_MENU, self.OnRedo, id = 29)
         self.Bind(wx.EVT_MENU, self.OnRender, id = 12)
+        self.Bind(wx.EVT_MENU, self.OnCancelRender, id = 24)
+        self.Bind(wx.EVT_MENU, self.OnLivePreview, id = 25)
+        self.Bind(wx.EVT_MENU, self.OnParaxial, id = 26)
+        self.Bind(wx.EVT_MENU, self.OnSequential, id = 27)
         self.Bind(wx.EVT_MENU, self.OnFileNew, id = 13)
         self.Bind(wx.EVT_MENU, self.OnFileOpen, id = 14)
         self.Bind(wx.EVT_MENU, self.OnFileSave, id = 15)
@@ -283,8 +345,21 @@ class MainFrame(wx.Frame):
         self.Bind(wx.EVT_MENU, self.OnRedraw, id = 18)
         self.Bind(wx.EVT_MENU, self.OnCenter, id = 19)
     
+    def enableMenu(self, enable):
+        # all menu items except for 'Cancel Rendering' are disabled during rendering
+        menuBar = self.GetMenuBar()
+        for i in range(menuBar.GetMenuCount() - 1):
+            menuBar.EnableTop(i, enable)
+        menuBar.Enable(12, enable)
+        menuBar.Enable(24, not enable)
+
     def onChar(self, event):
         key = event.GetKeyCode()
+        # while rendering, only ESC for cancelling is accepted
+        if self.rendering:
+            if(key == wx.WXK_ESCAPE):
+                self.cancelRender = 1
+            return
         if(key == wx.WXK_F5):
             self.OnRender(event)
         if(key == wx.WXK_DELETE):
@@ -293,6 +368,10 @@ class MainFrame(wx.Frame):
             self.OnObjectClone(event)
         if(key == 19 and event.GetModifiers() == wx.MOD_CONTROL):
             self.OnFileSave(event)
+        if(key == 26 and event.GetModifiers() == wx.MOD_CONTROL):
+            self.OnUndo(event)
+        if(key == 25 and event.GetModifiers() == wx.MOD_CONTROL):
+            self.OnRedo(event)
         if(key == wx.WXK_PAGEUP):
             self.OnObjectUp(event)
         if(key == wx.WXK_PAGEDOWN):
@@ -331,26 +410,14 @@ class MainFrame(wx.Frame):
                 img.SaveFile(filename, wx.BITMAP_TYPE_PNG)
             else:						# save as vector graphic
                 fp = open(filename, "w")
-                # write header
-                fp.write("<?xml version=\"1.0\"?>\n")
-                #fp.write("<svg height=\"%d\" width=\"%d\">\n" % (self.height,self.width))
-                #fp.write("<svg height=\"1000mm\" width=\"1000mm\">\n")
-                fp.write("<svg>\n")
-                fp.write("<g>\n")
-                # write all objects
-                for o in self.objects:
-                    fp.write(o.svgstr())
-                # write all rays
-                for r in self.rays:
-                    fp.write(r.svgstr())
-                # write footer
-                fp.write("</g></svg>")
+                # write all objects, rays and beams
+                fp.write(svgDocument(self.objects + self.rays + self.beams))
                 fp.close()
         dialog.Destroy()         
     
     def OnFileSaveAs(self, event):
         # display choose file dialog and override self.sceneFileName
-        dialog = wx.FileDialog(self, "Choose a filename", os.getcwd(), "", "DOSSS Files (*.dos)|*.dos")
+        dialog = wx.FileDialog(self, "Choose a filename", os.getcwd(), "", SCENE_WILDCARD)
         if dialog.ShowModal() == wx.ID_OK:
             self.sceneFileName = dialog.GetPath()
             self.OnFileSave()            
@@ -358,15 +425,13 @@ class MainFrame(wx.Frame):
    
     def OnFileSave(self, event = None):
         if self.sceneFileName == "":
-            dialog = wx.FileDialog(self, "Choose a filename for saving", os.getcwd(), "", "DOSSS Files (*.dos)|*.dos")
+            dialog = wx.FileDialog(self, "Choose a filename for saving", os.getcwd(), "", SCENE_WILDCARD)
             if dialog.ShowModal() == wx.ID_OK:
                 self.sceneFileName = dialog.GetPath()
             dialog.Destroy()
         if self.sceneFileName != "":
-            # now save the objects list
-            fp = open(self.sceneFileName, 'wb')
-            pickle.dump(self.objects, fp)
-            fp.close()
+            # now save the objects list and trace settings; *.dosz files are compressed
+            saveObjects(self.objects, self.sceneFileName, {"maxNumberOfIterations": self.maxNumberOfIterations, "sequential": self.sequential})
             self.canClose = 1
     
     def OnFileOpen(self, event):
@@ -376,21 +441,29 @@ class MainFrame(wx.Frame):
                 return
             elif retval == wx.YES:
                 self.OnFileSave()
-        dialog = wx.FileDialog(self, "Choose a filename for opening", os.getcwd(), "", "DOSSS Files (*.dos)|*.dos")
+        dialog = wx.FileDialog(self, "Choose a filename for opening", os.getcwd(), "", "DOSSS Files (*.dos;*.dosz)|*.dos;*.dosz")
         if dialog.ShowModal() == wx.ID_OK:
             self.sceneFileName = dialog.GetPath()
             self.rays = []
+            self.beams = []
             self.objects = []
             self.zoom = 1
             self.origin_x = 0
             self.origin_y = 0
             self.canClose = 1          
             self.display_rays = 0
+            self.tracer = None
             self.active_object = -1
-            # open dump file
-            fp = open(self.sceneFileName, 'rb')
-            self.objects = pickle.load(fp)
-            fp.close            
+            # open scene file; pickled scenes of older versions are converted
+            try:
+                self.objects, settings = readScene(self.sceneFileName)
+            except ValueError as e:
+                wx.MessageBox(str(e), "Open...", style = wx.OK | wx.ICON_ERROR)
+                self.objects = []
+                settings = {}
+            self.sequential = settings.get("sequential", self.sequential)
+            self.GetMenuBar().Check(27, self.sequential)
+            self.history.Reset(self.objects)
             self.InitBuffer()
         dialog.Destroy()
         
@@ -401,6 +474,7 @@ class MainFrame(wx.Frame):
                 if retval == wx.YES:
                     self.OnFileSave()
                 self.rays = []
+                self.beams = []
                 self.objects = []
                 self.zoom = 1
                 self.origin_x = 0
@@ -408,10 +482,13 @@ class MainFrame(wx.Frame):
                 self.canClose = 1          
                 self.sceneFileName = ""
                 self.display_rays = 0
+                self.tracer = None
                 self.active_object = -1     
+                self.history.Reset()
                 self.InitBuffer() 
         else:
             self.rays = []
+            self.beams = []
             self.objects = []
             self.zoom = 1
             self.origin_x = 0
@@ -419,7 +496,9 @@ class MainFrame(wx.Frame):
             self.canClose = 1
             self.sceneFileName = ""
             self.display_rays = 0
+            self.tracer = None
             self.active_object = -1
+            self.history.Reset()
             self.InitBuffer()
         
     def OnQuit(self, event):
@@ -503,9 +582,7 @@ class MainFrame(wx.Frame):
             self.objects.append(obj)
             
             # redraw the scene
-            self.display_rays = 0
-            self.canClose = 0
-            self.InitBuffer()
+            self.UpdateRays(obj, None)
         except:
             pass
             
@@ -513,13 +590,13 @@ class MainFrame(wx.Frame):
         # if an object is active
         if(self.active_object != -1):
             # slice the object out of the objects list
+            obj = self.objects[self.active_object]
+            oldBounds = obj.GetBounds()
             self.objects = self.objects[0:self.active_object] + self.objects[self.active_object + 1:]
             self.active_object = -1
             
             # redraw scene
-            self.display_rays = 0
-            self.canClose = 0
-            self.InitBuffer()            
+            self.UpdateRays(obj, oldBounds)
 
     def OnObjectMoveLeft(self):
             # if an object is active
@@ -527,11 +604,10 @@ class MainFrame(wx.Frame):
             dx = -1
             if(self.snapToGrid == 1):
                 dx = -self.gridStepSize
+            oldBounds = self.objects[self.active_object].GetBounds()
             self.objects[self.active_object].position[0] += dx
             
-            self.display_rays = 0
-            self.canClose = 0
-            self.InitBuffer()
+            self.UpdateRays(self.objects[self.active_object], oldBounds)
 
     def OnObjectMoveRight(self):
             # if an object is active
@@ -539,11 +615,10 @@ class MainFrame(wx.Frame):
             dx = 1
             if(self.snapToGrid == 1):
                 dx = self.gridStepSize
+            oldBounds = self.objects[self.active_object].GetBounds()
             self.objects[self.active_object].position[0] += dx
             
-            self.display_rays = 0
-            self.canClose = 0
-            self.InitBuffer()
+            self.UpdateRays(self.objects[self.active_object], oldBounds)
 
     def OnObjectMoveUp(self):
             # if an object is active
@@ -551,11 +626,10 @@ class MainFrame(wx.Frame):
             dy = -1
             if(self.snapToGrid == 1):
                 dy = -self.gridStepSize
+            oldBounds = self.objects[self.active_object].GetBounds()
             self.objects[self.active_object].position[1] += dy
             
-            self.display_rays = 0
-            self.canClose = 0
-            self.InitBuffer()
+            self.UpdateRays(self.objects[self.active_object], oldBounds)
     
     def OnObjectMoveDown(self):
             # if an object is active
@@ -563,11 +637,10 @@ class MainFrame(wx.Frame):
             dy = 1
             if(self.snapToGrid == 1):
                 dy = self.gridStepSize
+            oldBounds = self.objects[self.active_object].GetBounds()
             self.objects[self.active_object].position[1] += dy
             
-            self.display_rays = 0
-            self.canClose = 0
-            self.InitBuffer()
+            self.UpdateRays(self.objects[self.active_object], oldBounds)
 
     def OnObjectUp(self, event):
         # if an object is active
@@ -578,8 +651,12 @@ class MainFrame(wx.Frame):
             self.objects[self.active_object + 1] = dummy
             self.active_object = self.active_object + 1
 
-            # redraw
+            # redraw; in sequential mode, the order of the objects changes the result of the trace
             self.canClose = 0
+            self.history.Commit(self.objects, [])
+            if self.sequential:
+                self.display_rays = 0
+                self.tracer = None
             self.InitBuffer()
 
     def OnObjectDown(self, event):
@@ -591,8 +668,12 @@ class MainFrame(wx.Frame):
             self.objects[self.active_object - 1] = dummy
             self.active_object = self.active_object - 1
 
-            # redraw
+            # redraw; in sequential mode, the order of the objects changes the result of the trace
             self.canClose = 0
+            self.history.Commit(self.objects, [])
+            if self.sequential:
+                self.display_rays = 0
+                self.tracer = None
             self.InitBuffer()
 
     def OnObjectClone(self, event):        
@@ -603,10 +684,43 @@ class MainFrame(wx.Frame):
             obj.set_position(ox + 10, oy + 10)
             self.objects.append(obj)
             
-            self.display_rays = 0
-            self.canClose = 0
-            self.InitBuffer()  
+            self.UpdateRays(obj, None)
         
+    def OnUndo(self, event = None):
+        self.RestoreHistory(0)
+
+    def OnRedo(self, event = None):
+        self.RestoreHistory(1)
+
+    def RestoreHistory(self, redo):
+        # undo or redo the last edit; the rays of the restored scene are loaded from the trace cache if possible
+        changed = self.history.GetObjects(redo)
+        if self.rendering or changed is None:
+            return
+        bounds = [o.GetBounds() for o in changed]
+        if self.active_object != -1:
+            self.objects[self.active_object].active = 0
+            self.active_object = -1
+        if redo:
+            self.objects = self.history.Redo()
+        else:
+            self.objects = self.history.Undo()
+        self.canClose = 0
+
+        if not self.display_rays:
+            self.InitBuffer()
+        elif self.LoadCachedRays():
+            self.UpdateBeams()
+            self.InitBuffer()
+        elif len(changed) == 0 and not self.sequential:
+            # only the order of the objects changed
+            self.InitBuffer()
+        elif len(changed) == 1 and self.tracer is not None:
+            self.UpdateRays(changed[0], bounds[0], commit = 0)
+        else:
+            self.tracer = None
+            self.OnRender(useCache = 0)
+
     # canvas functions
     def OnSize(self, event):
         self.reInitBuffer = True
@@ -638,7 +752,8 @@ class MainFrame(wx.Frame):
         if(self.drawGrid and self.zoom >= 1):
             self.DrawGrid(dc)
         self.DrawObjects(dc)  
-        if(self.display_rays):
+        # without live preview, rays are hidden while an object is dragged
+        if(self.display_rays and (self.livePreview or not self.dragMoved)):
             self.DrawRays(dc)
         
     def DrawGrid(self, dc):
@@ -673,60 +788,216 @@ class MainFrame(wx.Frame):
             
     def DrawRays(self, dc):
         for r in self.rays:
-            r.Draw(dc, self.zoom, self.origin_x, self.origin_y)
+            if not r.deferred:
+                r.Draw(dc, self.zoom, self.origin_x, self.origin_y)
+        for b in self.beams:
+            b.Draw(dc, self.zoom, self.origin_x, self.origin_y)
+
+    def UpdateBeams(self):
+        # propagate the Gaussian beams of all light sources along their optical axis
+        self.beams = []
+        for op in self.objects:
+            if op.lightsource:
+                try:
+                    b = op.GetBeam(self.objects, self.maxNumberOfIterations)
+                except ValueError as e:
+                    print("no Gaussian beam for", op.name, ":", e)
+                    continue
+                if b is not None:
+                    self.beams.append(b)
             
     # rendering functions
-    def OnRender(self, event = None):
+    def OnRender(self, event = None, useCache = 1):
         if(event != None):
             event.Skip()
+        if self.rendering:
+            return
+        # a scene that was rendered before is loaded from the trace cache
+        if useCache and self.LoadCachedRays():
+            self.display_rays = 1
+            self.UpdateBeams()
+            self.InitBuffer()
+            return
+
         # check for light source and get list of initial rays
-        self.rays = []
-        for op in self.objects:
-            if op.lightsource:
-                print("found lightsource...")
-                self.rays = self.rays + op.GetLight()
+        tracer = DOSSS_Tracer(self.objects, self.maxNumberOfIterations)
+        if self.sequential:
+            tracer.sequence = tracer.GetSequence()
+        self.rays = tracer.EmitLight()
 
         if len(self.rays) == 0:
             wx.MessageBox("No light source provided! There has to be at least one!", "Rendering...", wx.OK)
             return
         else:
             print("start with", len(self.rays), "light rays")
-        
-        count = 0
-        # start rendering
-        thingsToDo = 1                       
-        while(thingsToDo and count < self.maxNumberOfIterations):
-            count = count + 1
-            print("Round:", count)
-            print("Process", len(self.rays), "rays...")
-            thingsToDo = 0                        
-            newRays = []
-            d0 = 0         
-            # for each ray propagate through the scene
-            for r in self.rays:
-                objId = -1                
-                if not r.processed:
-                    l = r.getCurLine()                           
-                    r.processed = 1                    
-                    if(l != None):                        
-                        # now calculate intersection with each object and take the closest intersection point
-                        for i in range(len(self.objects)):                        
-                            p, d, nr = self.objects[i].Intersection(l)                   
-                            # the minimal distance has to be larger than 0 due to numerical errors!     
-                            if p != None and d > 1e-7 and l.isLambdaPositiveForPoint(p):                                      
-                                if(objId == -1 or d0 > d):
-                                    objId = i
-                                    r.p1 = deepcopy(p)
-                                    nr0 = deepcopy(nr)
-                                    d0 = d
-                                    
-                        if(objId != -1):    # i found an intersection
-                            thingsToDo = 1                            
-                            # add new rays to newRays                    
-                            for nr in nr0:
-                                print("add:", nr)
-                                newRays.append(fromLine(nr))
-            self.rays = self.rays + newRays
 
+        # clear the old rays from the screen
+        self.display_rays = 0
+        self.InitBuffer()
         self.display_rays = 1
-        self.InitBuffer()
\ No newline at end of file
+
+        self.UpdateBeams()
+
+        # start rendering; each finished round is drawn on top of the existing buffer
+        self.rendering = 1
+        self.cancelRender = 0
+        self.setHint("Rendering... (ESC to cancel)")
+        self.enableMenu(0)
+        try:
+            count = 0
+            for finished in tracer.Rounds():
+                count = count + 1
+                print("Round:", count)
+                dc = wx.BufferedDC(wx.ClientDC(self), self.buffer)
+                for r in finished:
+                    r.Draw(dc, self.zoom, self.origin_x, self.origin_y)
+                del dc
+                # process pending events to update the screen and to catch ESC
+                wx.SafeYield(self, True)
+                if self.cancelRender:
+                    break
+        finally:
+            self.rendering = 0
+            self.enableMenu(1)
+            self.clearHint()
+        dc = wx.BufferedDC(wx.ClientDC(self), self.buffer)
+        for b in self.beams:
+            b.Draw(dc, self.zoom, self.origin_x, self.origin_y)
+        del dc
+
+        # keep only the segments that made it to the screen
+        if self.cancelRender:
+            self.rays = [r for r in tracer.rays if r.processed]
+            self.tracer = None
+            self.cachedRays = 0
+        else:
+            self.tracer = tracer
+            self.StoreRays()
+
+    def GetSceneHash(self):
+        # content hash of the objects and trace settings, see core.opsim_cache
+        return sceneHash(self.objects, {"maxNumberOfIterations": self.maxNumberOfIterations, "sequential": self.sequential})
+
+    def LoadCachedRays(self):
+        # replace the rays by the cached result for the current scene; returns 1 on success
+        store = self.traceCache.Get(self.GetSceneHash())
+        if store is None:
+            return 0
+        self.rays = list(store)
+        self.tracer = None
+        self.cachedRays = 1
+        stats = self.traceCache.GetStats()
+        print("loaded", len(self.rays), "ray segments from the trace cache (%d hits, %d misses)" % (stats["hits"], stats["misses"]))
+        return 1
+
+    def StoreRays(self):
+        # put the rays of a completed rendering into the trace cache
+        self.cachedRays = 0
+        self.traceCache.Put(self.GetSceneHash(), fromRays(self.rays, self.objects))
+
+    def UpdateRays(self, obj, oldBounds, commit = 1):
+        # an object was changed: re-trace only the part of the scene that is affected by obj
+        # commit = 0 when the change is an undo / redo step, which must not add a new step to the history
+        self.canClose = 0
+        if commit:
+            self.history.Commit(self.objects, [obj])
+        # changes that do not come from SetProperties, e.g., dragging, leave dirty empty and always need a new trace
+        raysChanged = len(obj.dirty) == 0 or obj.RaysChanged()
+        obj.ClearDirty()
+        if not raysChanged:
+            # only the appearance changed, e.g., the text of a label
+            self.InitBuffer()
+            return
+        if self.tracer is not None and self.tracer.sequence is not None:
+            # objects were added or removed: the sequence is no longer valid
+            self.tracer.objects = self.objects
+            if self.tracer.sequence != self.tracer.GetSequence():
+                self.tracer = None
+        if self.display_rays and self.tracer is None and self.cachedRays:
+            # rays loaded from the trace cache have no ray tree that could be updated
+            self.OnRender()
+            return
+        if self.display_rays and self.tracer is not None:
+            self.tracer.objects = self.objects
+            self.tracer.Invalidate(obj, oldBounds)
+            self.tracer.Resume()
+            for finished in self.tracer.Rounds():
+                pass
+            self.rays = self.tracer.rays
+            self.StoreRays()
+            self.UpdateBeams()
+        else:
+            self.display_rays = 0
+        self.InitBuffer()
+
+    def PreviewRays(self, obj):
+        # the active object is being dragged: re-trace the affected rays within the time budget of one frame
+        # the full quality trace follows in UpdateRays when the mouse button is released
+        if not self.display_rays or self.tracer is None:
+            return
+        t0 = time.time()
+        self.tracer.objects = self.objects
+        self.tracer.Invalidate(obj, self.dragBounds)
+        self.dragBounds = obj.GetBounds()
+        self.tracer.Decimate(self.previewStride)
+        for finished in self.tracer.Rounds(t0 + self.previewBudget):
+            pass
+        self.rays = self.tracer.rays
+        self.UpdateBeams()
+
+        # adapt the number of rays to the time budget
+        dt = time.time() - t0
+        if dt > self.previewBudget:
+            self.previewStride = self.previewStride * 2
+        elif dt < self.previewBudget / 4 and self.previewStride > 1:
+            self.previewStride = self.previewStride // 2
+
+    def OnCancelRender(self, event):
+        self.cancelRender = 1
+
+    def OnLivePreview(self, event):
+        self.livePreview = not self.livePreview
+
+    def OnSequential(self, event):
+        # rays are intersected only with the next object in the object list; rays missing it are vignetted
+        self.sequential = not self.sequential
+        if self.display_rays:
+            self.OnRender()
+
+    def OnParaxial(self, event):
+        # paraxial analysis along the axis of the active light source or, if none is selected, of the first light source
+        sources = [op for op in self.objects if op.lightsource]
+        if self.active_object != -1 and self.objects[self.active_object].lightsource:
+            sources = [self.objects[self.active_object]]
+        if len(sources) == 0:
+            wx.MessageBox("No light source provided! The optical axis starts at a light source.", "Paraxial Analysis...", wx.OK)
+            return
+        origin, direction = sources[0].GetOpticalAxis()
+        try:
+            system = DOSSS_ParaxialSystem(self.objects, origin, direction, self.maxNumberOfIterations)
+        except ValueError as e:
+            wx.MessageBox(str(e), "Paraxial Analysis...", wx.OK)
+            return
+        if len(system.elements) == 0:
+            wx.MessageBox("The optical axis does not hit any object.", "Paraxial Analysis...", wx.OK)
+            return
+
+        A, B = system.matrix[0]
+        C, D = system.matrix[1]
+        text = "Elements: %s\n\n" % ", ".join([self.objects[e[0]].name for e in system.elements])
+        text += "System matrix:\n  %g  %g\n  %g  %g\n\n" % (A, B, C, D)
+        efl, F, F2, H, H2 = system.GetCardinalPoints()
+        if F is None:
+            text += "The system is afocal.\n"
+        else:
+            text += "Effective focal length: %g\n" % efl
+            text += "Front focal point: (%g, %g)\n" % tuple(system.PointAt(F))
+            text += "Back focal point: (%g, %g)\n" % tuple(system.PointAt(F2))
+            text += "Front principal plane: (%g, %g)\n" % tuple(system.PointAt(H))
+            text += "Back principal plane: (%g, %g)\n" % tuple(system.PointAt(H2))
+        s, m = system.GetImage()
+        if s is None:
+            text += "\nThe image of the light source lies at infinity.\n"
+        else:
+            text += "\nImage of the light source: (%g, %g), magnification %g\n" % (system.PointAt(s)[0], system.PointAt(s)[1], m)
+        wx.MessageBox(text, "Paraxial Analysis...", wx.OK)
@@ -5,21 +5,27 @@
 
 This is the base class of all DOSSS objects.
 
-In order to extend DOSSS by adding new objects, create a new class derived from :py:class:`DOSSSObject` and overwrite the following four interface functions:
+In order to extend DOSSS by adding new objects, create a new class derived from :py:class:`DOSSSObject` and overwrite the following four interface functions and attributes:
 
     * :py:func:`~core.opsim_objectbase.DOSSSObject.GetDisplayPoints`: 
         Returns a list of points for drawing the object into the ClientDC.
 
-    * :py:func:`~core.opsim_objectbase.DOSSSObject.Intersection`: 
-        Returns some information about the intersection with a light ray: intersection point, distance of travel, emerging rays.
+    * :py:func:`~core.opsim_objectbase.DOSSSObject.GetSurfaces`: 
+        Returns a list of primitive surfaces (see :py:mod:`core.opsim_primitives`) describing the boundary of the object. The intersection tests are then provided by the base class.
 
-    * :py:func:`~core.opsim_objectbase.DOSSSObject.ShowPropertyDialog`:
-        Show the property dialog box for the object.
+      Alternatively, objects whose boundary can not be described by primitive surfaces overwrite :py:func:`~core.opsim_objectbase.DOSSSObject.Intersection`, which returns some information about the intersection with a light ray: intersection point, distance of travel, emerging rays.
+
+    * :py:attr:`~core.opsim_objectbase.DOSSSObject.properties`:
+        Declares the parameters of the object as list of :py:class:`DOSSS_Property`. The property dialog is generated from this list and the parameters can be changed from scripts with :py:func:`~core.opsim_objectbase.DOSSSObject.SetProperties`. Objects that need a special dialog can still overwrite :py:func:`~core.opsim_objectbase.DOSSSObject.ShowPropertyDialog`.
         
     * :py:func:`~core.opsim_objectbase.DOSSSObject.GetLight`:
         Returns a list of light rays if the object is a light source.
 
 In addition, you have to provide a unique name / identifier for the object in the :py:attr:`~core.opsim_objectbase.DOSSSObject.name` class attribute, which will then be used in the objects menu.
+
+For fast rendering of many rays, objects with a custom :py:func:`~core.opsim_objectbase.DOSSSObject.Intersection` may also overwrite :py:func:`~core.opsim_objectbase.DOSSSObject.IntersectionBatch`, which tests a whole bundle of rays at once using the numpy kernels from :py:mod:`core.opsim_batch`. The default implementation simply calls :py:func:`~core.opsim_objectbase.DOSSSObject.Intersection` for every ray.
+
+Optical elements can take part in the paraxial analysis (see :py:mod:`core.opsim_paraxial`) by overwriting :py:func:`~core.opsim_objectbase.DOSSSObject.GetRayTransferMatrix`.
         
 ..
    This program is free software: you can redistribute it and/or modify 
@@ -37,11 +43,114 @@ In addition, you have to provide a unique name / identifier for the object in th
 
    Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.   
 """
-import wx
+from core.opsim_lazy import wx
 from copy import deepcopy
 from core.opsim_geo import *
-from core.opsim_property_dialog import *
 from core.opsim_lightray import *
+from core.opsim_batch import *
+from core.opsim_primitives import *
+from core.opsim_paraxial import *
+
+try:
+    basestring
+except NameError:
+    basestring = str
+
+def DOSSS_PropertyDialog(options = [], parent = None):
+    """Creates a :py:class:`core.opsim_property_dialog.DOSSS_PropertyDialog`. The dialog module, and with it wx, is only imported when the first dialog is shown.
+    """
+    from core.opsim_property_dialog import DOSSS_PropertyDialog as dialog
+    return dialog(options, parent)
+
+class DOSSS_Property:
+    """Declaration of a property of an object, see :py:attr:`DOSSSObject.properties`. The property dialog is generated from these declarations and :py:func:`DOSSSObject.SetProperties` uses them to validate new values.
+
+    :param str name: Name of the property, which is also the name of the attribute holding the value unless *attr* is given.
+    :param str label: Label in the property dialog.
+    :param type kind: Type of the value, e.g., float, int or str (default = float).
+    :param float minimum: Lower bound of numerical values (default = None, i.e., no bound).
+    :param float maximum: Upper bound of numerical values (default = None, i.e., no bound).
+    :param str units: Units shown in the property dialog (default = "").
+    :param int optical: Set if changing the value can change the traced rays, i.e., the surfaces of the object, their materials or the rays emitted by a light source; properties that only change the appearance, e.g., the text of a label, should reset this flag, so that the rays are not traced again (default = 1).
+    :param str attr: Name of the attribute holding the value (default = *name*).
+    :param int index: Index of the value if the attribute is a list, e.g., for the position (default = None).
+    :param function parse: Converts text from the property dialog or a value set from a script into a value and raises ValueError for invalid input (default = None, i.e., *kind* is used).
+    :param function format: Converts the value into text for the property dialog (default = None, i.e., str is used).
+    """
+    def __init__(self, name, label, kind = float, minimum = None, maximum = None, units = "", optical = 1, attr = None, index = None, parse = None, format = None):
+        self.name = name
+        self.label = label
+        self.kind = kind
+        self.minimum = minimum
+        self.maximum = maximum
+        self.units = units
+        self.optical = optical
+        self.attr = attr
+        if attr is None:
+            self.attr = name
+        self.index = index
+        self.parse = parse
+        self.format = format
+
+    def Get(self, obj):
+        """Returns the value of the property of an object.
+        """
+        value = getattr(obj, self.attr)
+        if self.index is not None:
+            value = value[self.index]
+        return value
+
+    def Set(self, obj, value):
+        """Sets the value of the property of an object without validation.
+        """
+        if self.index is not None:
+            getattr(obj, self.attr)[self.index] = value
+        else:
+            setattr(obj, self.attr, value)
+
+    def Validate(self, value, clip = False):
+        """Converts a value to the type of the property and checks its bounds. Values are converted using *parse* if given.
+
+        :param bool clip: If True, values out of bounds are set to the bound instead of raising ValueError (default = False).
+        :returns: The converted value.
+        :raises ValueError: If the value cannot be converted or is out of bounds.
+        """
+        if self.parse is not None:
+            value = self.parse(value)
+        elif self.kind in (int, float):
+            value = self.kind(float(value))
+        elif self.kind is str:
+            value = str(value)
+        if clip and self.minimum is not None and value < self.minimum:
+            value = self.kind(self.minimum)
+        if clip and self.maximum is not None and value > self.maximum:
+            value = self.kind(self.maximum)
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError("%s has to be at least %g." % (self.label, self.minimum))
+        if self.maximum is not None and value > self.maximum:
+            raise ValueError("%s has to be at most %g." % (self.label, self.maximum))
+        return value
+
+    def GetOption(self, obj):
+        """Returns the entry for the options list of :py:class:`~core.opsim_property_dialog.DOSSS_PropertyDialog`.
+        """
+        label = self.label
+        if self.units != "":
+            label = "%s (%s)" % (label, self.units)
+        value = self.Get(obj)
+        if self.format is not None:
+            return [label, self.format(value), "str"]
+        if self.kind not in (int, float):
+            return [label, value, "str"]
+        option = [label, value]
+        if self.minimum is not None or self.maximum is not None:
+            if self.minimum is None:
+                option.append(-np.inf)
+            else:
+                option.append(self.minimum)
+        if self.maximum is not None:
+            option.append(self.maximum)
+        return option
 
 class DOSSSObject:
     """DOSSS object base class. All objects have to be derived from this class.
@@ -49,6 +158,14 @@ class DOSSSObject:
     :param float xpos: x-coordinate of object center in laboratory frame.
     :param float ypos: y-coordinate of object center in laboratory frame.
     """
+    #: list of :py:class:`DOSSS_Property` describing the properties of the object; derived classes add their own properties to this list
+    properties = [DOSSS_Property("x", "Position X", units = "mm", attr = "position", index = 0),
+                  DOSSS_Property("y", "Position Y", units = "mm", attr = "position", index = 1),
+                  DOSSS_Property("alpha", "Rotate", units = "deg"),
+                  DOSSS_Property("flip_h", "FlipH", int, 0, 1),
+                  DOSSS_Property("flip_v", "FlipV", int, 0, 1)]
+    dirty = ()  #: names of the properties changed by SetProperties since the last call to ClearDirty
+
     def __init__(self, xpos = 0, ypos = 0):
         self.position = [xpos, ypos]    # translation
         self.alpha = 0                  # rotation
@@ -77,6 +194,64 @@ class DOSSSObject:
         """Returns current position (x,y).
         """
         return self.position
+
+    # ##########
+    # properties
+    def GetProperties(self):
+        """Returns a dictionary mapping the names of all properties in :py:attr:`properties` to their values.
+        """
+        return dict([(p.name, p.Get(self)) for p in self.properties])
+
+    def SetProperties(self, values = None, **kwargs):
+        """Set several properties at once, e.g., for parameter sweeps. All values are validated, including :py:func:`CheckValues`, before any of them is set, so that the object is left unchanged if one of them is invalid. Afterwards, :py:func:`CheckParameters` is called and the names of the properties whose value changed are added to :py:attr:`dirty`.
+
+        :param dict values: Dictionary mapping names of properties to their new values; values can also be given as keyword arguments.
+        :returns: List of the names of the properties whose value changed.
+        :raises ValueError: If a property does not exist or a value is invalid.
+        """
+        if values is None:
+            values = {}
+        values = dict(values, **kwargs)
+        props = dict([(p.name, p) for p in self.properties])
+        for name in values:
+            if name not in props:
+                raise ValueError("%s has no property %s." % (self.name, name))
+            values[name] = props[name].Validate(values[name])
+        new = self.GetProperties()
+        new.update(values)
+        self.CheckValues(new)
+
+        changed = []
+        for p in self.properties:
+            if p.name in values and p.Get(self) != values[p.name]:
+                p.Set(self, values[p.name])
+                changed.append(p.name)
+        self.CheckParameters()
+        self.dirty = tuple(self.dirty) + tuple([n for n in changed if n not in self.dirty])
+        return changed
+
+    def RaysChanged(self):
+        """Returns True if one of the changed properties in :py:attr:`dirty` can change the traced rays, see :py:class:`DOSSS_Property`.
+        """
+        for p in self.properties:
+            if p.name in self.dirty and p.optical:
+                return True
+        return False
+
+    def ClearDirty(self):
+        """Resets the list of changed properties.
+        """
+        self.dirty = ()
+
+    def CheckValues(self, values):
+        """Called by :py:func:`SetProperties` with the values of all properties after the change, before any of them is set, to check values that depend on each other. Raise ValueError to reject the change. The default does nothing.
+        """
+        pass
+
+    def CheckParameters(self):
+        """Called after the properties were changed to ensure a consistent set of parameters, e.g., a minimal thickness of a lens. The default does nothing.
+        """
+        pass
     
     # ##########
     # display functions
@@ -104,6 +279,48 @@ class DOSSSObject:
         """
         return self.bbox
     
+    def TransformPoints(self, points):
+        """Apply mirror, rotation and translation operations to a set of points in the object's coordinate system.
+
+        :param list points: List of points [x, y].
+        :returns: List of points [x, y] in laboratory frame.
+        """
+        a = self.alpha * pi / 180.0
+        ca = cos(a)
+        sa = sin(a)
+        newp = []
+        for p in points:
+            x = p[0]
+            y = p[1]
+            # 1. mirror
+            if self.flip_h:
+                x = -x
+            if self.flip_v:
+                y = -y
+            # 2. rotate and 3. translate
+            newp.append([ca * x - sa * y + self.position[0], sa * x + ca * y + self.position[1]])
+        return newp
+
+    def TransformDirections(self, vectors):
+        """Apply mirror and rotation operations to a set of direction vectors in the object's coordinate system.
+
+        :param list vectors: List of vectors [x, y].
+        :returns: List of vectors [x, y] in laboratory frame.
+        """
+        a = self.alpha * pi / 180.0
+        ca = cos(a)
+        sa = sin(a)
+        newv = []
+        for v in vectors:
+            x = v[0]
+            y = v[1]
+            if self.flip_h:
+                x = -x
+            if self.flip_v:
+                y = -y
+            newv.append([ca * x - sa * y, sa * x + ca * y])
+        return newv
+
     def ProjectDisplayPoints(self, points, ox, oy, zoom):
         """Apply rotation, mirror and translation operations to set of points and return coordinates in client system.
         
@@ -114,29 +331,34 @@ class DOSSSObject:
         :returns: List of points in client system.
         """
         newp = []
-        for p in points:
-            # 1. mirror
-            if self.flip_h:
-                p[0] = -p[0]
-            if self.flip_v:
-                p[1] = -p[1]
-            # 2. rotate
-            a = self.alpha * pi / 180.0
-            x = cos(a) * p[0]  - sin(a) * p[1]
-            y = sin(a) * p[0]  + cos(a) * p[1]
-            p[0] = x
-            p[1] = y
-            # 3. translate
-            p[0] = p[0] + self.position[0]
-            p[1] = p[1] + self.position[1]
+        for p in self.TransformPoints(points):
             # add screen origin and scale according to zoom level
-            p[0] = (p[0] - ox) * zoom
-            p[1] = (p[1] - oy) * zoom
-            # append
-            newp.append(wx.Point(p[0], p[1]))
+            newp.append(wx.Point((p[0] - ox) * zoom, (p[1] - oy) * zoom))
         
         return newp
         
+    def GetBounds(self):
+        """Returns the bounding box of the object in laboratory frame. In contrast to :py:func:`get_bbox`, this does not depend on the current view. The box is calculated from the display points and enlarged by a safety margin, as the display points only sample curved surfaces.
+
+        :returns: Bounding box [minx, miny, maxx, maxy] in laboratory frame.
+        """
+        p = self.TransformPoints(self.GetDisplayPoints())
+        if len(p) == 0:
+            return [self.position[0], self.position[1], self.position[0], self.position[1]]
+        minx = maxx = p[0][0]
+        miny = maxy = p[0][1]
+        for q in p:
+            if(minx > q[0]):
+                minx = q[0]
+            if(miny > q[1]):
+                miny = q[1]
+            if(maxx < q[0]):
+                maxx = q[0]
+            if(maxy < q[1]):
+                maxy = q[1]
+        margin = 0.1 * ((maxx - minx) + (maxy - miny)) + 1.0
+        return [minx - margin, miny - margin, maxx + margin, maxy + margin]
+
     def Draw(self, dc, zoom, x0, y0):
         """Draw the object to the client DC.
         
@@ -169,9 +391,8 @@ class DOSSSObject:
         """
         svg = "<g style=\"stroke-width:0.3mm; stroke:black; fill:white; fill-opacity:1.0;\">\n";
       
-        # get points
-        p = self.GetDisplayPoints()
-        p = self.ProjectDisplayPoints(p, 0, 0, 1)
+        # get points in laboratory frame; no projection to the screen is needed, which also keeps wx out of the export
+        p = self.TransformPoints(self.GetDisplayPoints())
         
         svg += " <polygon points=\""
         for point in p:
@@ -240,6 +461,53 @@ class DOSSSObject:
             
         return l
 
+    def ProjectRaysIntoObjectCosy(self, rays):
+        """Vectorized version of :py:func:`ProjectIntoObjectCosy` for a bundle of rays.
+
+        :param array rays: Array of shape (N, 4) holding the base point and direction [x, y, ux, uy] of each ray in laboratory frame.
+        :returns: Arrays x, y, ux, uy in the object's coordinate system.
+        """
+        a = -self.alpha * pi / 180.0
+        ca = cos(a)
+        sa = sin(a)
+        # 1. translate
+        x = rays[:, 0] - self.position[0]
+        y = rays[:, 1] - self.position[1]
+        # 2. rotate by -alpha
+        x, y = ca * x - sa * y, sa * x + ca * y
+        ux = ca * rays[:, 2] - sa * rays[:, 3]
+        uy = sa * rays[:, 2] + ca * rays[:, 3]
+        # 3. flip over
+        if self.flip_h:
+            x = -x
+            ux = -ux
+        if self.flip_v:
+            y = -y
+            uy = -uy
+        return x, y, ux, uy
+
+    def BatchResult(self, candidates, n):
+        """Convenience function for :py:func:`IntersectionBatch`: picks the closest of a list of candidate intersections calculated in the object's coordinate system (see :py:func:`~core.opsim_batch.BatchNearest`) and projects the surface normals back into the laboratory frame.
+
+        :param list candidates: List of (t, nx, ny) tuples, one for each surface.
+        :param int n: Number of rays.
+        :returns: [distances, surface indices, normals] as expected from :py:func:`IntersectionBatch`.
+        """
+        d, sid, nx, ny = BatchNearest(candidates, n)
+        # 1. flip over
+        if self.flip_h:
+            nx = -nx
+        if self.flip_v:
+            ny = -ny
+        # 2. rotate by alpha
+        a = self.alpha * pi / 180.0
+        ca = cos(a)
+        sa = sin(a)
+        normals = np.empty((n, 2))
+        normals[:, 0] = ca * nx - sa * ny
+        normals[:, 1] = sa * nx + ca * ny
+        return [d, sid, normals]
+
     ##############################
     ## these functions have to be overwritten by any new object
     
@@ -250,38 +518,96 @@ class DOSSSObject:
         """
         return []
     
+    def GetSurfaces(self):
+        """Returns a list of primitive surfaces (:py:class:`~core.opsim_primitives.DOSSS_LineSurface`, :py:class:`~core.opsim_primitives.DOSSS_ArcSurface` or :py:class:`~core.opsim_primitives.DOSSS_ConicSurface`) in the object's coordinate system, which describe the boundary of the object together with its optical properties. Return an empty list if the object does not interact with light.
+
+        If this function is overwritten, :py:func:`Intersection` and :py:func:`IntersectionBatch` need not be implemented. The default returns None, which tells the engine to use :py:func:`Intersection` instead.
+        """
+        return None
+
+    def GetRayTransferMatrix(self, direction, length):
+        """Returns the 2x2 ray transfer matrix of the object for the paraxial analysis (see :py:mod:`core.opsim_paraxial`), which maps height and angle of a paraxial ray from the first to the last intersection of the optical axis with the object. Mirrors return the matrix of the equivalent lens. The default returns None, i.e., the object has no paraxial model.
+
+        :param tuple direction: Unit direction (x, y) of the optical axis in the object's coordinate system when entering the object.
+        :param float length: Path length of the optical axis inside the object, i.e., between the first and the last intersection.
+        """
+        return None
+
     def Intersection(self, line):
         """Test for intersection between a line and the current object. If there are several intersections, return the one closest to the light rays origin, i.e., with the smallest lambda value.
-        
-        .. important:: This function needs to be overwritten by your object class.
-        
+
+        The default implementation uses the surfaces returned by :py:func:`GetSurfaces`.
+
+        .. important:: This function needs to be overwritten by your object class if it does not provide :py:func:`GetSurfaces`.
+
         :param DOSSSLine line: The light ray.
         :returns: - point of intersection, if any (DOSSSVector or None)
                   - distance from base to intersection (float)
                   - list of emerging rays, e.g., transmitted and/or reflected (list of DOSSSLine)
         """
-        # transform ray into object coordinate system
-        l = self.ProjectIntoObjectCosy(line)        
-        # now test for intersection...
-        # this is done by checking every segment of the object for intersection
-        # if a point is found, it is stored together with the distance to the rays origin
-        # and a list of emerging rays (transmitted or reflected)
-        # at the end, the point with the shortest distance is picked and returned
-        
-        # l = self.ProjectIntoObjectCosy(line, 1)
-        # return values are: [intersection point, distance of travel, [emerging rays]]
-        return [None, 0, []]
+        scene = DOSSS_CompiledScene([self])
+        if len(scene.fallback) > 0:
+            # no surfaces; return values are: [intersection point, distance of travel, [emerging rays]]
+            return [None, 0, []]
+        rays = np.array([[line.a.x(), line.a.y(), line.u.x(), line.u.y()]], dtype = float)
+        d, obj, surface, normals, kind, ior = scene.Intersect(rays)
+        if obj[0] == -1:
+            return [None, 0, []]
+        p = line.get_point(d[0])
+        er = []
+        for x, y, ux, uy in scene.Emerge(rays, d, normals, kind, ior, obj, surface)[0]:
+            er.append(DOSSSLine(DOSSSVector(x, y), DOSSSVector(ux, uy)))
+        return [p, d[0], er]
+
+    def IntersectionBatch(self, rays):
+        """Test a whole bundle of rays for intersection with the object. This is used by the engine to find the closest object for all rays of a round at once; the emerging rays are then calculated with :py:func:`Intersection` for the closest object only.
+
+        The default implementation uses the surfaces returned by :py:func:`GetSurfaces` or, if there are none, calls :py:func:`Intersection` for each ray. Objects with a custom :py:func:`Intersection` should overwrite this function with a vectorized version using the kernels in :py:mod:`core.opsim_batch` for speed.
+
+        :param array rays: Array of shape (N, 4) holding the base point and unit direction [x, y, ux, uy] of each ray in laboratory frame.
+        :returns: - array of distances from base to intersection (inf if the ray misses the object)
+                  - array of indices of the surfaces that were hit (-1 if the ray misses the object)
+                  - array of shape (N, 2) with the unit surface normals at the intersection points in laboratory frame (nan if not known)
+        """
+        n = len(rays)
+        scene = DOSSS_CompiledScene([self])
+        if len(scene.fallback) == 0:
+            d, obj, surface, normals, kind, ior = scene.Intersect(rays)
+            return [d, surface, normals]
+        d = np.full(n, np.inf)
+        sid = np.full(n, -1, dtype = int)
+        normals = np.full((n, 2), np.nan)
+        for i in range(n):
+            l = DOSSSLine(DOSSSVector(rays[i, 0], rays[i, 1]), DOSSSVector(rays[i, 2], rays[i, 3]))
+            p, di, nr = self.Intersection(l)
+            if p != None and di > MIN_DISTANCE and l.isLambdaPositiveForPoint(p):
+                d[i] = di
+                sid[i] = 0
+        return [d, sid, normals]
     
     # property dialog
     def ShowPropertyDialog(self):
-        """Show the property dialog box for the object, which allows the user to change the objects parameters.
-        
-        .. important:: This function needs to be overwritten by your object class.        
+        """Show the property dialog box for the object, which allows the user to change the objects parameters. The dialog is generated from :py:attr:`properties`; values out of bounds are clipped, invalid values keep their old value and are reported in a message box.
         """
-        options = [["This object has no properties!"]]
+        options = [p.GetOption(self) for p in self.properties]
         dlg = DOSSS_PropertyDialog(options)
         if (dlg.ShowModal() == wx.ID_OK):
-            options = dlg.getOptions()            
+            # read out new values
+            values = {}
+            errors = []
+            for p, value in zip(self.properties, dlg.getOptions()):
+                try:
+                    values[p.name] = p.Validate(value, clip = True)
+                except ValueError as e:
+                    errors.append("%s: %s" % (p.label, e))     # keep the old value
+            try:
+                self.SetProperties(values)
+            except ValueError as e:
+                # values that do not fit together, see CheckValues
+                errors.append(str(e))
+            if len(errors) > 0:
+                wx.MessageBox("Invalid values were not applied:\n\n" + "\n".join(errors), "Properties...", wx.OK | wx.ICON_ERROR)
+        # destroy dialog object
         dlg.Destroy()
         
     def GetLight(self):
@@ -289,4 +615,28 @@ class DOSSSObject:
         
         .. important:: This function needs to be overwritten by your object class if it is a light source.
         """
-        return []
\ No newline at end of file
+        return []
+
+    def GetOpticalAxis(self):
+        """Returns the central ray of a light source, which is used as optical axis for the paraxial analysis (see :py:mod:`core.opsim_paraxial`). The default is the x-axis of the object.
+
+        :returns: - start point [x, y] in laboratory frame
+                  - unit direction [x, y] in laboratory frame
+        """
+        return [self.TransformPoints([[0, 0]])[0], self.TransformDirections([[1, 0]])[0]]
+
+    def GetBeam(self, objects, maxNumberOfIterations = 20):
+        """Returns a :py:class:`~core.opsim_paraxial.DOSSS_GaussianBeam` if the light source emits a Gaussian beam, which is then drawn in addition to the rays. The default returns None.
+
+        :param list objects: List of all objects of the scene.
+        :param int maxNumberOfIterations: Maximum number of intersections of the optical axis.
+        """
+        return None
+
+    def IterLight(self):
+        """Generator version of :py:func:`GetLight`, which allows the engine to emit the rays of light sources with a very large number of rays in chunks. The default implementation iterates over the list returned by :py:func:`GetLight`.
+
+        Overwrite this function if your light source can create its rays one at a time.
+        """
+        for r in self.GetLight():
+            yield r
\ No newline at end of file
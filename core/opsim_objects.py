@@ -7,6 +7,11 @@ Manages object import into DOSSS. All objects that were placed in the *objects*
 
 .. important:: Each object class has to be placed in its own module and the module file needs to have the same name as the class.
 
+The names and capabilities of the objects are kept in an index file, so that a module is only imported when the object is used for the first time or when the file was modified.
+Installed packages can provide additional objects through entry points in the group *dosss.objects*, where the name of the entry point is the name of the object and the entry point refers to its class, e.g.::
+
+    entry_points = {"dosss.objects": ["Fancy Lens = fancyoptics.lens:FancyLens"]}
+
 ..
    This program is free software: you can redistribute it and/or modify 
    it under the terms of the GNU General Public License as published by
@@ -25,19 +30,34 @@ Manages object import into DOSSS. All objects that were placed in the *objects*
 """
 import glob
 import os
+import sys
 import imp
+import json
 
 _dict_of_objects = {}     #: a dictionary mapping object names to modules
+_dict_of_classes = {}     #: a dictionary mapping module paths to [modification time, class]
+_dict_of_entry_points = {}    #: a dictionary mapping object names to entry points of installed packages
+_dict_of_lightsources = {}    #: a dictionary mapping object names to the lightsource flag stored in the index
+
+OBJECT_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "objects")   #: folder with the object modules
+INDEX_FILE = os.path.join(os.path.expanduser("~"), ".dosss", "objects.json")  #: index file with the names and capabilities of the object modules
+ENTRY_POINT_GROUP = "dosss.objects"     #: entry point group for objects provided by installed packages
+
+def load_class(filepath):
+    """Dynamically load a python module and return the class with the same name as the file.
+
+    Each module is executed only once and its class is cached; the module is loaded again only if the file was modified in the meantime. The module is registered under its file name, so that objects of older, pickled scene files refer to the same class as newly created ones.
 
-def load_from_file(filepath):
-    """Dynamically load a python module and return an instance of the class with the same name as the file.
-    
     :param str filepath: Name and path of the module to load.
-    :returns: Instance of class with same name as module.
+    :returns: Class with same name as module.
     """
     if not os.path.isfile(filepath):
         raise ValueError("Module does not exist!")
-    
+
+    mtime = os.path.getmtime(filepath)
+    if filepath in _dict_of_classes and _dict_of_classes[filepath][0] == mtime:
+        return _dict_of_classes[filepath][1]
+
     mod_name, file_ext = os.path.splitext(os.path.split(filepath)[-1])
 
     if file_ext.lower() == '.pyc':
@@ -45,24 +65,110 @@ def load_from_file(filepath):
     elif file_ext.lower() == '.py':
         py_mod = imp.load_source(mod_name, filepath)
 
-    class_inst = getattr(py_mod, mod_name)()
+    cls = getattr(py_mod, mod_name)
+    _dict_of_classes[filepath] = [mtime, cls]
+
+    return cls
+
+def load_from_file(filepath):
+    """Dynamically load a python module and return an instance of the class with the same name as the file.
+    
+    :param str filepath: Name and path of the module to load.
+    :returns: Instance of class with same name as module.
+    """
+    return load_class(filepath)()
+
+def load_index(filename = None):
+    """Returns the index of the object modules as dictionary mapping module paths to dictionaries with the entries *name*, *mtime* and *lightsource*. An empty dictionary is returned if the index file does not exist or cannot be read.
+
+    :param str filename: Name and path of the index file (default = INDEX_FILE).
+    """
+    if filename is None:
+        filename = INDEX_FILE
+    try:
+        with open(filename, "r") as f:
+            index = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    if not isinstance(index, dict) or index.get("version") != 1:
+        return {}
+    return index["objects"]
+
+def save_index(index, filename = None):
+    """Writes the index of the object modules. Errors are ignored, as the index is only a cache.
+
+    :param dict index: Index as returned by :py:func:`load_index`.
+    :param str filename: Name and path of the index file (default = INDEX_FILE).
+    """
+    if filename is None:
+        filename = INDEX_FILE
+    try:
+        folder = os.path.dirname(filename)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        with open(filename, "w") as f:
+            json.dump({"version": 1, "objects": index}, f, indent = 1, sort_keys = True)
+    except (IOError, OSError):
+        pass
+
+def index_entry(filepath):
+    """Import an object module and return its entry for the index.
+
+    :param str filepath: Name and path of the module.
+    """
+    cl = load_from_file(filepath)
+    return {"name": cl.get_name(), "mtime": os.path.getmtime(filepath), "lightsource": int(cl.lightsource)}
 
-    return class_inst
+def entry_points():
+    """Returns a list of the entry points in the group *dosss.objects* of all installed packages.
+    """
+    try:
+        from importlib.metadata import entry_points as eps
+    except ImportError:
+        try:
+            import pkg_resources
+        except ImportError:
+            return []
+        return list(pkg_resources.iter_entry_points(ENTRY_POINT_GROUP))
+    eps = eps()
+    if hasattr(eps, "select"):
+        return list(eps.select(group = ENTRY_POINT_GROUP))
+    return list(eps.get(ENTRY_POINT_GROUP, []))
 
 def parse_objects():
     """Create a dictionary mapping all existing objects to their modules. This function is called once at the beginning.
+
+    Modules are only imported if they are not yet in the index or if they were modified since the index was written. Objects provided by installed packages are added without importing them.
     """
-    # load modules
-    files = sorted(glob.glob("objects\\*.py"))
-    
+    index = load_index()
+    changed = 0
+    files = sorted(glob.glob(os.path.join(OBJECT_FOLDER, "*.py")))
+
     for d in files:
-        if os.path.split(d)[-1] != "__init__.py":
-            try:
-                cl = load_from_file(d)
-                _dict_of_objects[cl.get_name()] = d
-            except:
-                raise
-    
+        if os.path.split(d)[-1] == "__init__.py":
+            continue
+        entry = index.get(d)
+        if entry is None or entry["mtime"] != os.path.getmtime(d) or "lightsource" not in entry:
+            entry = index_entry(d)
+            index[d] = entry
+            changed = 1
+        _dict_of_objects[entry["name"]] = d
+        _dict_of_lightsources[entry["name"]] = entry["lightsource"]
+
+    # remove deleted modules from the index
+    for d in list(index.keys()):
+        if d not in files:
+            del index[d]
+            changed = 1
+    if changed:
+        save_index(index)
+
+    # objects of installed packages
+    for ep in entry_points():
+        if ep.name not in _dict_of_objects:
+            _dict_of_entry_points[ep.name] = ep
+            _dict_of_objects[ep.name] = ep.name
+
 def objectList():
     """Returns a list with object names that can be used to create the menu items, for example.
     """
@@ -70,8 +176,25 @@ def objectList():
     if not _dict_of_objects:
         parse_objects()
     
-    # return list of keys
-    return _dict_of_objects.keys()
+    # return sorted list of keys
+    return sorted(_dict_of_objects.keys())
+
+def lightSourceList():
+    """Returns a sorted list with the names of the light sources, e.g., to list them separately in the object menu. The list is taken from the index, so that no module has to be imported; objects of installed packages are not included, as they are only imported when used.
+    """
+    return [name for name in objectList() if _dict_of_lightsources.get(name)]
+
+def getObjectClass(identifier):
+    """Returns the class of an object, e.g., for creating many instances from a script.
+
+    :param str identifier: Name of the object as it appears in objectList.
+    :returns: Class of the object or None if object not found.
+    """
+    if identifier not in objectList():
+        return None
+    if identifier in _dict_of_entry_points:
+        return _dict_of_entry_points[identifier].load()
+    return load_class(_dict_of_objects[identifier])
 
 def getNewObject(identifier, posx, posy):
     """Create a new object.
@@ -83,14 +206,14 @@ def getNewObject(identifier, posx, posy):
     """
     
     # this also creates the dictionary if it does not yet exist
-    if identifier not in objectList():
+    cls = getObjectClass(identifier)
+    if cls is None:
         return None
     
     # get class instance
-    cl = load_from_file(_dict_of_objects[identifier])
+    cl = cls()
     
     # set position
     cl.set_position(posx, posy)
     
     return cl
-    
\ No newline at end of file
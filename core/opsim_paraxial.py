@@ -0,0 +1,296 @@
+"""
+.. module: opsim.opsim_paraxial
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Paraxial analysis of sequential systems with 2x2 ray transfer (ABCD) matrices.
+
+A paraxial ray is described by its height y above the optical axis and its angle theta with the axis. Each element maps (y, theta) at its entrance vertex to (y, theta) at its exit vertex by a ray transfer matrix, which objects provide through :py:func:`~core.opsim_objectbase.DOSSSObject.GetRayTransferMatrix`. Reflections are unfolded, i.e., a mirror is treated like a lens with the same focal length and the axis continues in the direction of the reflected light. As all rays lie in the plane of the scene, tilted elements are described by their tangential focal length. Outside of the elements, the refractive index is assumed to be 1.
+
+:py:class:`DOSSS_ParaxialSystem` finds the sequence of elements by tracing a single exact ray along the optical axis, multiplies their matrices and derives the cardinal points and the image of an object plane. This is much faster than a full raytrace and gives a sanity check on the tracer.
+
+:py:class:`DOSSS_GaussianBeam` uses the same matrices to propagate the complex beam parameter q of a Gaussian beam along the axis, which gives beam radius, waists and Rayleigh ranges without tracing any additional rays.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+from core.opsim_lazy import wx
+from math import *
+import numpy as np
+from core.opsim_primitives import *
+
+# ###########
+# ray transfer matrices
+def RTMTranslation(d):
+    """Free propagation over a distance d.
+    """
+    return np.array([[1.0, float(d)], [0.0, 1.0]])
+
+def RTMRefraction(n1, n2, R = np.inf):
+    """Refraction at a spherical interface from refractive index n1 to n2. The radius of curvature R is positive if the center of curvature lies behind the interface, i.e., in the direction of propagation, and infinite for a flat interface.
+    """
+    return np.array([[1.0, 0.0], [(n1 - n2) / (R * n2), float(n1) / n2]])
+
+def RTMThinLens(f):
+    """Thin lens or curved mirror with focal length f (positive for converging elements).
+    """
+    return np.array([[1.0, 0.0], [-1.0 / f, 1.0]])
+
+def RTMProduct(matrices):
+    """Returns the matrix of a sequence of elements, given in the order in which they are traversed.
+    """
+    M = np.identity(2)
+    for m in matrices:
+        M = np.dot(m, M)
+    return M
+
+def RTMReverse(M):
+    """Returns the matrix of an element traversed in opposite direction, assuming the same refractive index on both sides.
+    """
+    return np.array([[M[1, 1], M[0, 1]], [M[1, 0], M[0, 0]]])
+
+# ###########
+# sequential system
+class DOSSS_ParaxialSystem:
+    """Sequential system along an optical axis.
+
+    The axis starts at origin and is followed through the scene as an exact ray, taking the transmitted branch at beam splitters, until it leaves the scene or is absorbed. The elements are the objects hit by the axis; consecutive intersections with the same object form one element. Positions along the (unfolded) axis are given as path length s from the origin, see :py:func:`PointAt` for the conversion to laboratory coordinates.
+
+    Objects without surface description (see :py:func:`~core.opsim_objectbase.DOSSSObject.GetSurfaces`) are not seen by the axis.
+
+    :param list objects: List of DOSSSObjects.
+    :param tuple origin: Start point of the optical axis (x, y) in laboratory frame.
+    :param tuple direction: Direction of the optical axis (x, y) in laboratory frame.
+    :param int maxNumberOfIterations: Maximum number of intersections of the axis (default = 20).
+    :raises ValueError: If an element hit by the axis does not provide a ray transfer matrix.
+    """
+    def __init__(self, objects, origin, direction, maxNumberOfIterations = 20):
+        self.objects = objects
+        self.path = []          #: vertices of the axis as (s, x, y, ux, uy)
+        self.elements = []      #: elements along the axis as [object index, s at entrance, s at exit, matrix]
+        self.matrix = np.identity(2)    #: system matrix from the entrance of the first to the exit of the last element
+
+        l = sqrt(direction[0]**2 + direction[1]**2)
+        ray = np.array([[origin[0], origin[1], direction[0] / l, direction[1] / l]], dtype = float)
+        self.path.append((0.0, ray[0, 0], ray[0, 1], ray[0, 2], ray[0, 3]))
+
+        # follow the axis through the scene and group the intersections by object
+        scene = DOSSS_CompiledScene(objects)
+        s = 0.0
+        groups = []
+        for i in range(maxNumberOfIterations):
+            d, obj, surface, normals, kind, ior = scene.Intersect(ray)
+            if obj[0] == -1:
+                break
+            emerging = scene.Emerge(ray, d, normals, kind, ior, obj, surface)[0]
+            if len(emerging) == 0:
+                break
+            s = s + d[0]
+            x, y, ux, uy = emerging[0]
+            if len(groups) > 0 and groups[-1][0] == obj[0]:
+                groups[-1][2] = s
+            else:
+                groups.append([int(obj[0]), s, s, ray[0, 2:4].copy()])
+            self.path.append((s, x, y, ux, uy))
+            ray = np.array([[x, y, ux, uy]])
+
+        # multiply the matrices of the elements and the free space in between
+        matrices = []
+        for objId, s0, s1, u in groups:
+            o = objects[objId]
+            x, y, ux, uy = o.ProjectRaysIntoObjectCosy(np.array([[0.0, 0.0, u[0], u[1]]]))
+            M = o.GetRayTransferMatrix((ux[0], uy[0]), s1 - s0)
+            if M is None:
+                raise ValueError("%s has no paraxial model." % o.name)
+            M = np.array(M, dtype = float)
+            if len(self.elements) > 0:
+                matrices.append(RTMTranslation(s0 - self.elements[-1][2]))
+            matrices.append(M)
+            self.elements.append([objId, s0, s1, M])
+        self.matrix = RTMProduct(matrices)
+
+    def GetEntrance(self):
+        """Returns the path length s of the entrance vertex of the first element (0 if there are no elements).
+        """
+        if len(self.elements) == 0:
+            return 0.0
+        return self.elements[0][1]
+
+    def GetExit(self):
+        """Returns the path length s of the exit vertex of the last element (0 if there are no elements).
+        """
+        if len(self.elements) == 0:
+            return 0.0
+        return self.elements[-1][2]
+
+    def _Vertex(self, s):
+        # last vertex of the axis before s
+        v = self.path[0]
+        for p in self.path[1:]:
+            if p[0] > s:
+                break
+            v = p
+        return v
+
+    def PointAt(self, s):
+        """Convert a path length along the axis into laboratory coordinates. Points before the origin or behind the last intersection are extrapolated along the first or last section of the axis.
+
+        :param float s: Path length along the axis.
+        :returns: Point [x, y] in laboratory frame.
+        """
+        s0, x, y, ux, uy = self._Vertex(s)
+        return [x + (s - s0) * ux, y + (s - s0) * uy]
+
+    def DirectionAt(self, s):
+        """Returns the unit direction [x, y] of the axis at the path length s in laboratory frame.
+        """
+        s0, x, y, ux, uy = self._Vertex(s)
+        return [ux, uy]
+
+    def GetCardinalPoints(self):
+        """Calculate the effective focal length and the positions of the focal points and principal planes.
+
+        :returns: - effective focal length (inf for afocal systems)
+                  - path length s of the front focal point (None for afocal systems)
+                  - path length s of the back focal point (None for afocal systems)
+                  - path length s of the front principal plane (None for afocal systems)
+                  - path length s of the back principal plane (None for afocal systems)
+        """
+        A, B = self.matrix[0]
+        C, D = self.matrix[1]
+        if abs(C) < 1e-12:
+            return [np.inf, None, None, None, None]
+        s0 = self.GetEntrance()
+        s1 = self.GetExit()
+        return [-1.0 / C, s0 + D / C, s1 - A / C, s0 + (D - 1.0) / C, s1 + (1.0 - A) / C]
+
+    def GetImage(self, s = 0.0):
+        """Calculate the image of an object plane.
+
+        :param float s: Path length of the object plane (default = 0, i.e., the origin of the axis); has to lie in front of the first element.
+        :returns: - path length s of the image plane (None if the image lies at infinity); images in front of the exit of the last element are virtual
+                  - lateral magnification (None if the image lies at infinity)
+        """
+        M = np.dot(self.matrix, RTMTranslation(self.GetEntrance() - s))
+        A, B = M[0]
+        C, D = M[1]
+        if abs(D) < 1e-12:
+            return [None, None]
+        q = -B / D
+        return [self.GetExit() + q, A + q * C]
+
+# ###########
+# Gaussian beams
+class DOSSS_GaussianBeam:
+    """Gaussian beam propagating along the optical axis of a paraxial system.
+
+    The beam is described by its complex beam parameter q = z + i zR, where z is the distance from the waist and zR the Rayleigh range. In free space, q grows linearly with the distance; an element with the ray transfer matrix [[A, B], [C, D]] transforms q into (A q + B) / (C q + D). Inside of the elements, the beam is not defined.
+
+    :param DOSSS_ParaxialSystem system: The system with the optical axis of the beam.
+    :param float wavelength: Wavelength in units of the scene.
+    :param float waist: 1/e**2 radius of the beam at its waist.
+    :param float waistPosition: Path length of the waist along the axis (default = 0, i.e., at the origin of the axis).
+    :param float length: Length of the beam behind the last element (default = 500).
+    """
+    def __init__(self, system, wavelength, waist, waistPosition = 0, length = 500):
+        self.system = system
+        self.wavelength = wavelength
+        self.sections = []      #: free space sections of the beam as (s at start, s at end, q at start)
+
+        q = -waistPosition + 1j * pi * waist**2 / wavelength
+        s = 0.0
+        for objId, s0, s1, M in system.elements:
+            self.sections.append((s, s0, q))
+            q = q + (s0 - s)
+            q = (M[0, 0] * q + M[0, 1]) / (M[1, 0] * q + M[1, 1])
+            s = s1
+        self.sections.append((s, s + length, q))
+
+    def GetQ(self, s):
+        """Returns the complex beam parameter at the path length s along the axis (None inside of an element).
+        """
+        for s0, s1, q in self.sections:
+            if s0 <= s <= s1:
+                return q + (s - s0)
+        return None
+
+    def GetRadius(self, s):
+        """Returns the 1/e**2 radius of the beam at the path length s along the axis (None inside of an element).
+        """
+        q = self.GetQ(s)
+        if q is None:
+            return None
+        return sqrt(-self.wavelength / (pi * (1.0 / q).imag))
+
+    def GetWaists(self):
+        """Returns a list of the waists of the beam as [path length, radius, Rayleigh range]. Virtual waists, i.e., those lying outside of their free space section, are not included.
+        """
+        waists = []
+        for s0, s1, q in self.sections:
+            s = s0 - q.real
+            if s0 <= s <= s1:
+                waists.append([s, sqrt(self.wavelength * q.imag / pi), q.imag])
+        return waists
+
+    def GetEnvelope(self, steps = 50):
+        """Calculate the 1/e**2 envelope of the beam.
+
+        :param int steps: Number of steps per free space section.
+        :returns: List with two polylines (lists of points [x, y] in laboratory frame) for each free space section, one for each side of the beam.
+        """
+        envelope = []
+        for s0, s1, q in self.sections:
+            s = [s0 + (s1 - s0) * i / float(steps) for i in range(steps + 1)]
+            # make sure that waists are drawn at their true size
+            for sw, w0, zR in self.GetWaists():
+                if s0 < sw < s1:
+                    s.append(sw)
+            s.sort()
+            left = []
+            right = []
+            for si in s:
+                x, y = self.system.PointAt(si)
+                ux, uy = self.system.DirectionAt(si)
+                w = sqrt(-self.wavelength / (pi * (1.0 / (q + si - s0)).imag))
+                left.append([x - w * uy, y + w * ux])
+                right.append([x + w * uy, y - w * ux])
+            envelope.append(left)
+            envelope.append(right)
+        return envelope
+
+    def Draw(self, dc, zoom, ox, oy):
+        """Draw the envelope of the beam to the DC client.
+
+        :param wx.DC dc: Paint DC.
+        :param float zoom: Zoom level, where 1 is no zoom.
+        :param float ox: x-coordinate of origin of current view in laboratory frame.
+        :param float oy: y-coordinate of origin of current view in laboratory frame.
+        """
+        dc.SetPen(wx.Pen("Red", 1))
+        for line in self.GetEnvelope():
+            dc.DrawLines([wx.Point((x - ox) * zoom, (y - oy) * zoom) for x, y in line])
+
+    def svgstr(self):
+        """Returns a string in SVG format for exporting to vector format.
+        """
+        svg = "<g style=\"stroke-width:0.1mm; stroke:red; fill:none;\">\n"
+        for line in self.GetEnvelope():
+            svg += " <polyline points=\""
+            for x, y in line:
+                svg += "%f,%f " % (x, y)
+            svg += "\" />\n"
+        svg += "</g>\n"
+        return svg
@@ -0,0 +1,127 @@
+"""
+.. module: opsim.opsim_png
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Raster export without a display. The GUI saves PNG images from its screen buffer, which is not available when tracing from the command line. This module draws the object outlines and the ray segments into a NumPy image and writes it as PNG file using only zlib and struct.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+import zlib
+import struct
+import numpy as np
+
+BLACK = (0, 0, 0)
+RED = (255, 0, 0)
+RAY_LENGTH = 500.0  #: length of rays running off to infinity, as in the SVG export
+
+def writePNG(filename, img):
+    """Write an RGB image as PNG file.
+
+    :param array img: Image as array of shape (height, width, 3) and type uint8.
+    """
+    h, w = img.shape[:2]
+    # each row starts with filter type 0 (none)
+    raw = np.zeros((h, w * 3 + 1), dtype = np.uint8)
+    raw[:, 1:] = img.reshape(h, w * 3)
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+    with open(filename, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
+
+class DOSSS_Raster:
+    """RGB image showing a region of the laboratory frame.
+
+    :param list bounds: Region [minx, miny, maxx, maxy] in laboratory frame.
+    :param int width: Width of the image in pixels; the height follows from the aspect ratio of the region.
+    """
+    def __init__(self, bounds, width = 1000):
+        minx, miny, maxx, maxy = bounds
+        self.zoom = (width - 1) / float(max(maxx - minx, 1e-9))
+        height = int((maxy - miny) * self.zoom) + 1
+        self.origin = (minx, miny)
+        self.img = np.full((height, width, 3), 255, dtype = np.uint8)
+
+    def DrawLines(self, p0, p1, color):
+        """Draw line segments given in laboratory frame.
+
+        :param array p0: Start points, shape (N, 2).
+        :param array p1: End points, shape (N, 2).
+        :param tuple color: RGB color.
+        """
+        p0 = (np.asarray(p0, dtype = float) - self.origin) * self.zoom
+        p1 = (np.asarray(p1, dtype = float) - self.origin) * self.zoom
+        if len(p0) == 0:
+            return
+        # one sample per pixel along each segment
+        n = (np.ceil(np.abs(p1 - p0).max(axis = 1)) + 1).astype(int)
+        seg = np.repeat(np.arange(len(n)), n)
+        t = np.arange(len(seg)) - np.repeat(np.cumsum(n) - n, n)
+        t = t / np.maximum(n[seg] - 1, 1).astype(float)
+        p = p0[seg] + (p1 - p0)[seg] * t[:, None]
+        x = np.rint(p[:, 0]).astype(int)
+        y = np.rint(p[:, 1]).astype(int)
+        h, w = self.img.shape[:2]
+        inside = (x >= 0) & (x < w) & (y >= 0) & (y < h)
+        self.img[y[inside], x[inside]] = color
+
+    def DrawPolygon(self, points, color):
+        """Draw the closed outline of a polygon given in laboratory frame.
+        """
+        if len(points) < 2:
+            return
+        p = np.asarray(points, dtype = float)
+        self.DrawLines(p, np.roll(p, -1, axis = 0), color)
+
+def rayEnds(rays):
+    """Returns the end points of all segments of a :py:class:`~core.opsim_raystore.DOSSS_RayStore`, where rays running off to infinity are cut at a length of RAY_LENGTH.
+    """
+    p1 = np.array(rays.p1, dtype = float)
+    infinite = np.isnan(p1[:, 0])
+    p1[infinite] = rays.p0[infinite] + rays.u[infinite] * RAY_LENGTH
+    return p1
+
+def rasterize(objects, rays = None, width = 1000, margin = 10):
+    """Draw a scene into a :py:class:`DOSSS_Raster` that shows all objects and rays.
+
+    :param list objects: List of objects.
+    :param DOSSS_RayStore rays: Ray segments or None.
+    :param int width: Width of the image in pixels.
+    :param float margin: Margin around the scene in laboratory units.
+    :returns: DOSSS_Raster.
+    """
+    outlines = [o.TransformPoints(o.GetDisplayPoints()) for o in objects]
+    points = [p for outline in outlines for p in outline]
+    if rays is not None and len(rays) > 0:
+        p1 = rayEnds(rays)
+        points = points + list(np.asarray(rays.p0, dtype = float)) + list(p1)
+    if len(points) == 0:
+        points = [[0, 0]]
+    points = np.asarray(points, dtype = float)
+    bounds = list(points.min(axis = 0) - margin) + list(points.max(axis = 0) + margin)
+
+    raster = DOSSS_Raster(bounds, width)
+    if rays is not None and len(rays) > 0:
+        raster.DrawLines(rays.p0, p1, RED)
+    for outline in outlines:
+        raster.DrawPolygon(outline, BLACK)
+    return raster
@@ -0,0 +1,367 @@
+"""
+.. module: opsim.opsim_primitives
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Surface primitives for describing the geometry of DOSSS objects.
+
+Instead of hand-coding the intersection test, an object can describe its boundary as a list of primitive surfaces by overwriting :py:func:`~core.opsim_objectbase.DOSSSObject.GetSurfaces`. Each surface is given in the object's coordinate system and carries a :py:class:`DOSSS_Material`, which determines what happens to a ray hitting it. There are three types of surfaces:
+
+    * :py:class:`DOSSS_LineSurface`: a straight line segment.
+    * :py:class:`DOSSS_ArcSurface`: a circular arc, e.g., for spherical lenses.
+    * :py:class:`DOSSS_ConicSurface`: a section of a conic (parabola, ellipse, hyperbola) or of an even asphere.
+
+Ideal thin lenses and ideal curved mirrors are straight line segments with an IDEAL_LENS or IDEAL_MIRROR material. Instead of applying Snell's law, rays hitting them are deflected analytically according to the optical power of the material, measured from the center of the segment (see :py:func:`~core.opsim_batch.BatchIdealDeflect`).
+
+The surface normal of all primitives points to the outside of the object. When the outline of an object is traversed clockwise on screen (remember that y counts downwards), the outside lies to the left of the direction of travel.
+
+For raytracing, :py:class:`DOSSS_CompiledScene` collects the surfaces of all objects of a scene, transforms them once into the laboratory frame and stores them in numpy arrays. A bundle of rays can then be intersected with all surfaces of the scene at once without projecting the rays into the coordinate system of each object.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+from math import *
+from copy import copy
+import numpy as np
+from core.opsim_batch import *
+
+# material kinds
+ABSORB = 0      #: rays are stopped at the surface
+REFRACT = 1     #: rays are refracted (or totally reflected) according to Snell's law
+MIRROR = 2      #: rays are reflected
+SPLIT = 3       #: beam splitter: rays are refracted and reflected, the power is shared equally
+IDEAL_LENS = 4      #: ideal thin lens: rays are deflected analytically according to the optical power of the material
+IDEAL_MIRROR = 5    #: ideal curved mirror: like IDEAL_LENS, but the rays are reflected
+
+BLOCK_SIZE = 4096   #: number of rays intersected with all surfaces of a scene at once
+
+class DOSSS_Material:
+    """Optical properties of a surface.
+
+    :param int kind: One of ABSORB (default), REFRACT, MIRROR, SPLIT, IDEAL_LENS or IDEAL_MIRROR.
+    :param float nIn: Refractive index on the inner side of the surface, i.e., opposite to the surface normal (default = 1).
+    :param float nOut: Refractive index on the outer side of the surface (default = 1).
+    :param float power: Optical power 1 / f of ideal elements (default = 0).
+    """
+    def __init__(self, kind = ABSORB, nIn = 1.0, nOut = 1.0, power = 0.0):
+        self.kind = kind
+        self.nIn = nIn
+        self.nOut = nOut
+        self.power = power
+
+    def GetIOR(self):
+        """Returns the relative index of refraction nIn / nOut as used by :py:func:`~core.opsim_geo.Snell`.
+        """
+        return float(self.nIn) / self.nOut
+
+class DOSSS_Surface:
+    """Base class of all surface primitives.
+
+    :param DOSSS_Material material: Material of the surface.
+    """
+    def __init__(self, material):
+        self.material = material
+
+    def Transformed(self, obj):
+        """Returns a copy of the surface transformed from the coordinate system of obj into the laboratory frame.
+
+        :param DOSSSObject obj: The object the surface belongs to.
+        """
+        return copy(self)
+
+class DOSSS_LineSurface(DOSSS_Surface):
+    """Straight line segment from p1 to p2. The end points themselves do not belong to the segment. The normal points to the left of the direction from p1 to p2.
+
+    :param tuple p1: Start point (x, y).
+    :param tuple p2: End point (x, y).
+    :param DOSSS_Material material: Material of the surface.
+    """
+    def __init__(self, p1, p2, material):
+        DOSSS_Surface.__init__(self, material)
+        self.p1 = (p1[0], p1[1])
+        self.p2 = (p2[0], p2[1])
+        self.normal = (p2[1] - p1[1], p1[0] - p2[0])
+
+    def Transformed(self, obj):
+        s = copy(self)
+        s.p1, s.p2 = [tuple(p) for p in obj.TransformPoints([self.p1, self.p2])]
+        s.normal = tuple(obj.TransformDirections([self.normal])[0])
+        return s
+
+class DOSSS_ArcSurface(DOSSS_Surface):
+    """Circular arc between the points p1 and p2 on a circle. The arc lies on the left side of the chord from p1 to p2 for convex surfaces, i.e., it bulges to the outside, and on the right side for concave surfaces. If p1 and p2 are identical, the surface is the full circle.
+
+    :param tuple center: Center of the circle (x, y).
+    :param float radius: Radius of the circle.
+    :param tuple p1: Start point of the arc (x, y).
+    :param tuple p2: End point of the arc (x, y).
+    :param DOSSS_Material material: Material of the surface.
+    :param bool convex: If True (default), the object lies inside the circle and the normal points away from the center, otherwise the object lies outside the circle.
+    """
+    def __init__(self, center, radius, p1, p2, material, convex = 1):
+        DOSSS_Surface.__init__(self, material)
+        self.center = (center[0], center[1])
+        self.radius = radius
+        self.p1 = (p1[0], p1[1])
+        if convex:
+            self.sign = 1
+        else:
+            self.sign = -1
+        # normal of the chord pointing towards the arc
+        self.clip = (self.sign * (p2[1] - p1[1]), self.sign * (p1[0] - p2[0]))
+
+    def Transformed(self, obj):
+        s = copy(self)
+        s.center, s.p1 = [tuple(p) for p in obj.TransformPoints([self.center, self.p1])]
+        s.clip = tuple(obj.TransformDirections([self.clip])[0])
+        return s
+
+class DOSSS_ConicSurface(DOSSS_Surface):
+    """Section of a conic given by c (r**2 + (1 + k) z**2) = 2 z, where z is measured from the vertex along the axis and r perpendicular to it. Only the branch through the vertex and only the part with rmin <= r <= rmax belongs to the surface. The transverse direction r is obtained by rotating the axis by 90deg clockwise on screen. The object lies on the side the axis is pointing to at the vertex.
+
+    If polynomial coefficients are given, the surface is an even asphere with the sag z(r) = c r**2 / (1 + sqrt(1 - (1 + k) c**2 r**2)) + A4 r**4 + A6 r**6 + ... (see :py:func:`~core.opsim_batch.AsphereSag`). Pure conics are intersected in closed form, aspheres by a vectorized Newton iteration starting from the intersections with the underlying conic.
+
+    :param tuple vertex: Vertex (x, y).
+    :param tuple axis: Direction of the axis (x, y).
+    :param float c: Curvature at the vertex (1 / radius of curvature).
+    :param float k: Conic constant (0 = circle, -1 = parabola, < -1 = hyperbola, otherwise ellipse).
+    :param float rmin: Lower limit of the transverse coordinate.
+    :param float rmax: Upper limit of the transverse coordinate.
+    :param DOSSS_Material material: Material of the surface.
+    :param list coefficients: Optional polynomial coefficients [A4, A6, ...] of an even asphere.
+    """
+    def __init__(self, vertex, axis, c, k, rmin, rmax, material, coefficients = None):
+        DOSSS_Surface.__init__(self, material)
+        l = sqrt(axis[0]**2 + axis[1]**2)
+        self.vertex = (vertex[0], vertex[1])
+        self.axis = (axis[0] / l, axis[1] / l)
+        self.transverse = (-self.axis[1], self.axis[0])
+        self.c = c
+        self.k = k
+        self.rmin = rmin
+        self.rmax = rmax
+        if coefficients is None:
+            coefficients = []
+        self.coefficients = list(coefficients)
+
+    def Sag(self, r):
+        """Returns the sag z of the surface at the transverse coordinate r.
+        """
+        return AsphereSag(r, self.c, self.k, self.coefficients)[0]
+
+    def Transformed(self, obj):
+        s = copy(self)
+        s.vertex = tuple(obj.TransformPoints([self.vertex])[0])
+        s.axis, s.transverse = [tuple(p) for p in obj.TransformDirections([self.axis, self.transverse])]
+        return s
+
+class DOSSS_CompiledScene:
+    """The surfaces of all objects of a scene, transformed into the laboratory frame and baked into numpy arrays. Objects that do not provide a surface description (:py:func:`~core.opsim_objectbase.DOSSSObject.GetSurfaces` returns None) are listed in :py:attr:`fallback` and have to be intersected by the caller.
+
+    The scene has to be compiled anew whenever an object is changed.
+
+    :param list objects: List of DOSSSObjects.
+    """
+    def __init__(self, objects):
+        self.fallback = []      #: indices of objects without surface description
+        self.ideal = {}         #: (power, center x, center y) of ideal elements by (object index, surface index)
+        lines = []
+        arcs = []
+        conics = []
+        for i in range(len(objects)):
+            surfaces = objects[i].GetSurfaces()
+            if surfaces is None:
+                self.fallback.append(i)
+                continue
+            for j in range(len(surfaces)):
+                s = surfaces[j].Transformed(objects[i])
+                if isinstance(s, DOSSS_LineSurface):
+                    lines.append((i, j, s))
+                    if s.material.kind in (IDEAL_LENS, IDEAL_MIRROR):
+                        self.ideal[(i, j)] = (s.material.power, (s.p1[0] + s.p2[0]) / 2.0, (s.p1[1] + s.p2[1]) / 2.0)
+                elif isinstance(s, DOSSS_ArcSurface):
+                    arcs.append((i, j, s))
+                elif isinstance(s, DOSSS_ConicSurface):
+                    conics.append((i, j, s))
+        self.lines = self._Bake(lines, ["p1", "p2", "normal"])
+        self.arcs = self._Bake(arcs, ["center", "radius", "p1", "clip", "sign"])
+        self.conics = self._Bake(conics, ["vertex", "axis", "transverse", "c", "k", "rmin", "rmax"])
+        # polynomial coefficients of aspheres, padded with zeros
+        m = 0
+        for i, j, s in conics:
+            if len(s.coefficients) > m:
+                m = len(s.coefficients)
+        self.conics["coefficients"] = np.zeros((len(conics), m))
+        for l in range(len(conics)):
+            s = conics[l][2]
+            self.conics["coefficients"][l, :len(s.coefficients)] = s.coefficients
+        self.conics["asphere"] = np.any(self.conics["coefficients"] != 0, axis = 1)
+
+    def _Bake(self, surfaces, fields):
+        # convert a list of (object index, surface index, surface) tuples into a dictionary of arrays, one per field
+        a = {}
+        a["obj"] = np.array([i for i, j, s in surfaces], dtype = int)
+        a["surface"] = np.array([j for i, j, s in surfaces], dtype = int)
+        a["kind"] = np.array([s.material.kind for i, j, s in surfaces], dtype = int)
+        a["ior"] = np.array([s.material.GetIOR() for i, j, s in surfaces], dtype = float)
+        for f in fields:
+            a[f] = np.array([getattr(s, f) for i, j, s in surfaces], dtype = float)
+        return a
+
+    def Intersect(self, rays):
+        """Find the closest surface for a bundle of rays.
+
+        :param array rays: Array of shape (N, 4) holding the base point and unit direction [x, y, ux, uy] of each ray in laboratory frame.
+        :returns: - array of distances (inf if no surface is hit)
+                  - array of the indices of the objects that were hit (-1 if none)
+                  - array of the indices of the surfaces that were hit in the surface list of each object (-1 if none)
+                  - array of shape (N, 2) of the outward unit surface normals (nan if no surface is hit)
+                  - array of the material kinds at the intersection points
+                  - array of the relative indices of refraction at the intersection points
+        """
+        n = len(rays)
+        d = np.full(n, np.inf)
+        obj = np.full(n, -1, dtype = int)
+        surface = np.full(n, -1, dtype = int)
+        normals = np.full((n, 2), np.nan)
+        kind = np.full(n, ABSORB, dtype = int)
+        ior = np.ones(n)
+        for i0 in range(0, n, BLOCK_SIZE):
+            i1 = i0 + BLOCK_SIZE
+            x = rays[i0:i1, 0:1]
+            y = rays[i0:i1, 1:2]
+            ux = rays[i0:i1, 2:3]
+            uy = rays[i0:i1, 3:4]
+            for t, nx, ny, a in (self._Lines(x, y, ux, uy) + self._Arcs(x, y, ux, uy) + self._Conics(x, y, ux, uy)):
+                # closest surface of this type for each ray
+                j = np.argmin(t, axis = 1)
+                rows = np.arange(len(t))
+                tj = t[rows, j]
+                closer = tj < d[i0:i1]
+                if not np.any(closer):
+                    continue
+                sel = np.nonzero(closer)[0]
+                d[i0 + sel] = tj[sel]
+                obj[i0 + sel] = a["obj"][j[sel]]
+                surface[i0 + sel] = a["surface"][j[sel]]
+                kind[i0 + sel] = a["kind"][j[sel]]
+                ior[i0 + sel] = a["ior"][j[sel]]
+                normals[i0 + sel, 0] = np.broadcast_to(nx, t.shape)[sel, j[sel]]
+                normals[i0 + sel, 1] = np.broadcast_to(ny, t.shape)[sel, j[sel]]
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            normals = normals / np.sqrt((normals**2).sum(axis = 1))[:, np.newaxis]
+        return [d, obj, surface, normals, kind, ior]
+
+    def _Lines(self, x, y, ux, uy):
+        a = self.lines
+        if len(a["obj"]) == 0:
+            return []
+        t = BatchIntersectSegment(x, y, ux, uy, (a["p1"][:, 0], a["p1"][:, 1]), (a["p2"][:, 0], a["p2"][:, 1]))
+        return [(t, a["normal"][:, 0], a["normal"][:, 1], a)]
+
+    def _Arcs(self, x, y, ux, uy):
+        a = self.arcs
+        if len(a["obj"]) == 0:
+            return []
+        cx = a["center"][:, 0]
+        cy = a["center"][:, 1]
+        result = []
+        for t in BatchIntersectSphere(x, y, ux, uy, cx, a["radius"], cy):
+            px, py = BatchPoints(x, y, ux, uy, t)
+            # keep the part of the circle on the arc side of the chord
+            inside = (px - a["p1"][:, 0]) * a["clip"][:, 0] + (py - a["p1"][:, 1]) * a["clip"][:, 1] >= 0
+            t = np.where(inside, t, np.inf)
+            result.append((t, a["sign"] * (px - cx), a["sign"] * (py - cy), a))
+        return result
+
+    def _Conics(self, x, y, ux, uy):
+        a = self.conics
+        if len(a["obj"]) == 0:
+            return []
+        vx = a["vertex"][:, 0]
+        vy = a["vertex"][:, 1]
+        ax = a["axis"][:, 0]
+        ay = a["axis"][:, 1]
+        tx = a["transverse"][:, 0]
+        ty = a["transverse"][:, 1]
+        c = a["c"]
+        k = a["k"]
+        asphere = a["asphere"]
+        result = []
+        for t in BatchIntersectConic(x, y, ux, uy, vx, vy, ax, ay, tx, ty, c, k):
+            px, py = BatchPoints(x, y, ux, uy, t)
+            z = (px - vx) * ax + (py - vy) * ay
+            r = (px - vx) * tx + (py - vy) * ty
+            # keep the branch through the vertex
+            cz = c * z
+            t = np.where((cz >= -1e-9) & ((1 + k) * cz <= 1 + 1e-9), t, np.inf)
+            # the gradient of c (r**2 + (1 + k) z**2) - 2 z points to the outside
+            gr = 2 * c * r
+            gz = 2 * c * (1 + k) * z - 2
+            nx = gr * tx + gz * ax
+            ny = gr * ty + gz * ay
+            if np.any(asphere):
+                # refine the intersections with the conic by Newton's method
+                ta = BatchIntersectAsphere(x, y, ux, uy, vx, vy, ax, ay, tx, ty, c, k, a["coefficients"], t)
+                t = np.where(asphere, ta, t)
+                px, py = BatchPoints(x, y, ux, uy, t)
+                r = (px - vx) * tx + (py - vy) * ty
+                # the gradient of z(r) - z points to the outside
+                dz = AsphereSag(r, c, k, a["coefficients"])[1]
+                nx = np.where(asphere, dz * tx - ax, nx)
+                ny = np.where(asphere, dz * ty - ay, ny)
+            # keep the given section
+            t = np.where((r >= a["rmin"]) & (r <= a["rmax"]), t, np.inf)
+            result.append((t, nx, ny, a))
+        return result
+
+    def Emerge(self, rays, d, normals, kind, ior, obj = None, surface = None):
+        """Calculate the rays emerging from the intersection points found by :py:func:`Intersect`.
+
+        :param array rays: Array of shape (N, 4) of the incident rays.
+        :param array obj: Object indices returned by :py:func:`Intersect`; only required if the scene contains ideal elements.
+        :param array surface: Surface indices returned by :py:func:`Intersect`; only required if the scene contains ideal elements.
+        :returns: List with one entry for each incident ray, containing a list of the emerging rays as (x, y, ux, uy) tuples.
+        """
+        ux = rays[:, 2]
+        uy = rays[:, 3]
+        with np.errstate(invalid = "ignore"):
+            px, py = BatchPoints(rays[:, 0], rays[:, 1], ux, uy, d)
+            tx, ty = BatchSnell(ux, uy, normals[:, 0], normals[:, 1], ior)
+            rx, ry = BatchSnell(ux, uy, normals[:, 0], normals[:, 1], np.zeros(len(rays)))
+        ideal = (kind == IDEAL_LENS) | (kind == IDEAL_MIRROR)
+        if np.any(ideal):
+            # ideal elements deflect the rays according to their power and the height above their center
+            power = np.zeros(len(rays))
+            cx = np.zeros(len(rays))
+            cy = np.zeros(len(rays))
+            for i in np.nonzero(ideal)[0]:
+                power[i], cx[i], cy[i] = self.ideal[(obj[i], surface[i])]
+            with np.errstate(invalid = "ignore"):
+                ix, iy = BatchIdealDeflect(ux, uy, normals[:, 0], normals[:, 1], px - cx, py - cy, power, kind == IDEAL_MIRROR)
+        result = []
+        for i in range(len(rays)):
+            if kind[i] == REFRACT:
+                result.append([(px[i], py[i], tx[i], ty[i])])
+            elif kind[i] == MIRROR:
+                result.append([(px[i], py[i], rx[i], ry[i])])
+            elif kind[i] == SPLIT:
+                result.append([(px[i], py[i], tx[i], ty[i]), (px[i], py[i], rx[i], ry[i])])
+            elif kind[i] in (IDEAL_LENS, IDEAL_MIRROR):
+                result.append([(px[i], py[i], ix[i], iy[i])])
+            else:
+                result.append([])
+        return result
@@ -0,0 +1,396 @@
+"""
+.. module: opsim.opsim_raystore
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Compact storage of a finished trace.
+
+Instead of one DOSSS_LightRay object per segment, :py:class:`DOSSS_RayStore` keeps all segments in a few contiguous NumPy arrays:
+
+    * *p0*, *p1*, *u*: start point, end point and direction, shape (N, 2); *p1* is nan for rays running off to infinity,
+    * *power*: relative power, *depth*: number of preceding segments,
+    * *parent*: index of the parent segment (-1 for rays emitted by a light source),
+    * *hit*: index of the object the segment ends on (-1 if none),
+    * *childOffset*, *childIndex*: the children of segment i are *childIndex[childOffset[i]:childOffset[i+1]]* (compressed sparse row layout).
+
+The store is a sink for :py:func:`~core.opsim_engine.DOSSS_Tracer.TraceChunked`, so it can be filled chunk by chunk. Indexing or iterating over the store returns lightweight :py:class:`DOSSS_RayView` objects, which behave like DOSSS_LightRay for drawing and exporting.
+
+For traces that do not fit into memory, :py:class:`DOSSS_DiskRayStore` appends each chunk directly to one *.npy* file per array in a directory on disk. After the trace, the arrays are opened as numpy.memmap, so only the parts that are actually accessed are loaded. Any store can be written to such a directory with :py:func:`~DOSSS_RayStore.Save` and be opened again with :py:func:`loadRayStore`.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+import os
+import struct
+import numpy as np
+from core.opsim_lightray import *
+from core.opsim_sinks import DOSSS_Sink
+
+FIELDS = ["p0", "p1", "u", "power", "depth", "parent", "hit", "childOffset", "childIndex"]    #: names of the arrays of a store, also used as file names
+
+class DOSSS_RayStore(DOSSS_Sink):
+    """Array based store for ray segments and their tree structure.
+
+    :param bool float32: If True, coordinates, directions and power are stored in single precision, which halves the memory for these arrays (default = False).
+    """
+    def __init__(self, float32 = False):
+        if float32:
+            self.dtype = np.float32
+        else:
+            self.dtype = np.float64
+        self._chunks = []
+        self._clear()
+
+    def _clear(self):
+        # empty arrays
+        self.p0 = np.zeros((0, 2), dtype = self.dtype)
+        self.p1 = np.zeros((0, 2), dtype = self.dtype)
+        self.u = np.zeros((0, 2), dtype = self.dtype)
+        self.power = np.zeros(0, dtype = self.dtype)
+        self.depth = np.zeros(0, dtype = np.int16)
+        self.parent = np.zeros(0, dtype = np.int32)
+        self.hit = np.zeros(0, dtype = np.int32)
+        self.childOffset = np.zeros(1, dtype = np.int64)
+        self.childIndex = np.zeros(0, dtype = np.int32)
+
+    # ###########
+    # filling the store
+    def AddSegments(self, segments):
+        """Append a list of DOSSS_Segment. The ids of the segments have to be consecutive and continue the ids of the previous chunk, as is the case for :py:func:`~core.opsim_engine.DOSSS_Tracer.Stream`. Call :py:func:`Finish` after the last chunk.
+        """
+        n = len(segments)
+        if n == 0:
+            return
+        p0 = np.empty((n, 2), dtype = self.dtype)
+        p1 = np.empty((n, 2), dtype = self.dtype)
+        u = np.empty((n, 2), dtype = self.dtype)
+        power = np.empty(n, dtype = self.dtype)
+        depth = np.empty(n, dtype = np.int16)
+        parent = np.empty(n, dtype = np.int32)
+        hit = np.empty(n, dtype = np.int32)
+        for i in range(n):
+            s = segments[i]
+            p0[i] = s.origin
+            if s.end is None:
+                p1[i] = np.nan
+            else:
+                p1[i] = s.end
+            u[i] = s.direction
+            power[i] = s.power
+            depth[i] = s.depth
+            parent[i] = s.parent
+            hit[i] = s.hit
+        self._AddArrays(p0, p1, u, power, depth, parent, hit)
+
+    def _AddArrays(self, p0, p1, u, power, depth, parent, hit):
+        # append one chunk of arrays
+        self._chunks.append((p0, p1, u, power, depth, parent, hit))
+
+    def Finish(self):
+        """Concatenate all chunks and build the child index arrays.
+        """
+        if len(self._chunks) > 0:
+            fields = list(zip(*self._chunks))
+            self.p0, self.p1, self.u, self.power, self.depth, self.parent, self.hit = [np.concatenate(f) for f in fields]
+            self._chunks = []
+        self._BuildChildren()
+
+    def _BuildChildren(self):
+        # compressed sparse row layout of the children: sort all non-root segments by parent
+        n = len(self.parent)
+        counts = np.bincount(self.parent[self.parent >= 0], minlength = n)
+        self.childOffset = np.zeros(n + 1, dtype = np.int64)
+        np.cumsum(counts, out = self.childOffset[1:])
+        order = np.argsort(self.parent, kind = "stable")
+        self.childIndex = order[n - self.childOffset[-1]:].astype(np.int32)
+
+    # ###########
+    # access
+    def __len__(self):
+        return len(self.parent)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i = i + len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError("segment index out of range")
+        return DOSSS_RayView(self, i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield DOSSS_RayView(self, i)
+
+    def GetChildren(self, i):
+        """Returns the indices of all segments emerging from the end point of segment i.
+        """
+        return self.childIndex[self.childOffset[i]:self.childOffset[i + 1]]
+
+    def GetLineage(self, i):
+        """Returns the indices of all segments from the light source up to and including segment i.
+        """
+        path = [i]
+        while self.parent[path[-1]] != -1:
+            path.append(int(self.parent[path[-1]]))
+        path.reverse()
+        return path
+
+    def Save(self, path):
+        """Write all arrays as *.npy* files into a directory, which is created if necessary. The store can be opened again with :py:func:`loadRayStore`.
+
+        :param str path: Name of the directory.
+        """
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        for f in FIELDS:
+            np.save(os.path.join(path, f + ".npy"), getattr(self, f))
+
+    def nbytes(self):
+        """Returns the memory used by the arrays in bytes.
+        """
+        return sum([a.nbytes for a in (self.p0, self.p1, self.u, self.power, self.depth, self.parent, self.hit, self.childOffset, self.childIndex)])
+
+    def Draw(self, dc, zoom, ox, oy):
+        """Draw all segments to the DC client, see :py:func:`~core.opsim_lightray.DOSSS_LightRay.Draw`.
+        """
+        for r in self:
+            r.Draw(dc, zoom, ox, oy)
+
+    def svgstr(self):
+        """Returns a string in SVG format containing all segments.
+        """
+        return "".join([r.svgstr() for r in self])
+
+class _NpyAppender:
+    # writes an .npy file of unknown length chunk by chunk: a header of fixed size is reserved
+    # at the beginning and rewritten with the final shape on close
+    HEADER_SIZE = 128
+
+    def __init__(self, filename, dtype, rowshape):
+        self.fp = open(filename, "wb")
+        self.dtype = np.dtype(dtype)
+        self.rowshape = rowshape
+        self.rows = 0
+        self._WriteHeader()
+
+    def _WriteHeader(self):
+        header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (np.lib.format.dtype_to_descr(self.dtype), (self.rows,) + self.rowshape)
+        header = header.ljust(self.HEADER_SIZE - 10 - 1) + "\n"
+        self.fp.seek(0)
+        self.fp.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1"))
+
+    def Append(self, a):
+        a = np.ascontiguousarray(a, dtype = self.dtype)
+        self.fp.write(a.tobytes())
+        self.rows = self.rows + len(a)
+
+    def Close(self):
+        self._WriteHeader()
+        self.fp.close()
+
+class DOSSS_DiskRayStore(DOSSS_RayStore):
+    """Ray store that spills all arrays to memory-mapped *.npy* files in a directory on local disk. During tracing, each chunk is appended to the files, so the memory consumption is independent of the length of the trace. :py:func:`Finish` builds the child index arrays on disk as well and opens all arrays as numpy.memmap.
+
+    :param str path: Name of the directory, which is created if necessary. Existing files are overwritten.
+    :param bool float32: Use single precision (default = False).
+    :param int blockSize: Number of rows processed at once when building the child index arrays (default = 2**20).
+    """
+    def __init__(self, path, float32 = False, blockSize = 2**20):
+        DOSSS_RayStore.__init__(self, float32)
+        self.path = path
+        self.blockSize = blockSize
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._files = {}
+        for f, dtype, rowshape in (("p0", self.dtype, (2,)), ("p1", self.dtype, (2,)), ("u", self.dtype, (2,)), ("power", self.dtype, ()), ("depth", np.int16, ()), ("parent", np.int32, ()), ("hit", np.int32, ())):
+            self._files[f] = _NpyAppender(self._filename(f), dtype, rowshape)
+
+    def _filename(self, f):
+        return os.path.join(self.path, f + ".npy")
+
+    def _AddArrays(self, p0, p1, u, power, depth, parent, hit):
+        for f, a in (("p0", p0), ("p1", p1), ("u", u), ("power", power), ("depth", depth), ("parent", parent), ("hit", hit)):
+            self._files[f].Append(a)
+
+    def Finish(self):
+        for f in self._files:
+            self._files[f].Close()
+        self._files = {}
+        for f in FIELDS[:7]:
+            setattr(self, f, np.load(self._filename(f), mmap_mode = "r"))
+        self._BuildChildren()
+
+    def _BuildChildren(self):
+        # same layout as in memory, but computed block by block with the arrays on disk
+        n = len(self.parent)
+        bs = self.blockSize
+        offsets = np.lib.format.open_memmap(self._filename("childOffset"), mode = "w+", dtype = np.int64, shape = (n + 1,))
+        offsets[:] = 0
+        # count the children of each segment
+        for i in range(0, n, bs):
+            p = np.asarray(self.parent[i:i + bs])
+            p = p[p >= 0]
+            np.add.at(offsets, p + 1, 1)
+        # running sum, continued from block to block
+        total = 0
+        for i in range(0, n + 1, bs):
+            block = np.cumsum(offsets[i:i + bs]) + total
+            offsets[i:i + bs] = block
+            total = block[-1]
+        # fill in the children, keeping them in the order of their indices
+        nchildren = int(offsets[n])
+        children = np.lib.format.open_memmap(self._filename("childIndex"), mode = "w+", dtype = np.int32, shape = (nchildren,))
+        cursor = np.lib.format.open_memmap(os.path.join(self.path, "cursor.tmp.npy"), mode = "w+", dtype = np.int64, shape = (n,))
+        for i in range(0, n, bs):
+            j = i + bs
+            if j > n:
+                j = n
+            cursor[i:j] = offsets[i:j]
+        for i in range(0, n, bs):
+            p = np.asarray(self.parent[i:i + bs])
+            idx = np.arange(i, i + len(p), dtype = np.int32)
+            mask = p >= 0
+            p = p[mask]
+            idx = idx[mask]
+            if len(p) == 0:
+                continue
+            # rank of each child among the children of the same parent within this block
+            order = np.argsort(p, kind = "stable")
+            p = p[order]
+            idx = idx[order]
+            first = np.r_[True, p[1:] != p[:-1]]
+            start = np.maximum.accumulate(np.where(first, np.arange(len(p)), 0))
+            rank = np.arange(len(p)) - start
+            children[cursor[p] + rank] = idx
+            np.add.at(cursor, p, 1)
+        del cursor
+        os.remove(os.path.join(self.path, "cursor.tmp.npy"))
+        offsets.flush()
+        children.flush()
+        del offsets, children
+        self.childOffset = np.load(self._filename("childOffset"), mmap_mode = "r")
+        self.childIndex = np.load(self._filename("childIndex"), mmap_mode = "r")
+
+class DOSSS_RayView(DOSSS_LightRay):
+    """Read-only view on a single segment of a :py:class:`DOSSS_RayStore`, which can be used in place of a DOSSS_LightRay for drawing and exporting. The vectors are created on access from the store's arrays.
+
+    :param DOSSS_RayStore store: The store.
+    :param int index: Index of the segment.
+    """
+    processed = 1
+    deferred = 0
+    vignetted = 0
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def p0(self):
+        p = self.store.p0[self.index]
+        return DOSSSVector(p[0], p[1])
+
+    @property
+    def p1(self):
+        p = self.store.p1[self.index]
+        if np.isnan(p[0]):
+            return None
+        return DOSSSVector(p[0], p[1])
+
+    @property
+    def u(self):
+        p = self.store.u[self.index]
+        return DOSSSVector(p[0], p[1])
+
+    @property
+    def power(self):
+        return float(self.store.power[self.index])
+
+    @property
+    def depth(self):
+        return int(self.store.depth[self.index])
+
+    @property
+    def parent(self):
+        """Parent segment as DOSSS_RayView or None.
+        """
+        i = self.store.parent[self.index]
+        if i == -1:
+            return None
+        return DOSSS_RayView(self.store, int(i))
+
+    @property
+    def children(self):
+        """List of child segments as DOSSS_RayView.
+        """
+        return [DOSSS_RayView(self.store, int(i)) for i in self.store.GetChildren(self.index)]
+
+def fromRays(rays, objects = None, float32 = False):
+    """Create a DOSSS_RayStore from a list of DOSSS_LightRay, e.g., the rays of a :py:class:`~core.opsim_engine.DOSSS_Tracer` after rendering. Parent and hit object are converted into indices.
+
+    :param list rays: List of DOSSS_LightRay.
+    :param list objects: List of scene objects used to convert the hit objects into indices. If None, all hit indices are -1.
+    :param bool float32: Use single precision (default = False).
+    :returns: DOSSS_RayStore.
+    """
+    store = DOSSS_RayStore(float32)
+    n = len(rays)
+    index = {}
+    for i in range(n):
+        index[id(rays[i])] = i
+    objIndex = {}
+    if objects is not None:
+        for i in range(len(objects)):
+            objIndex[id(objects[i])] = i
+
+    p0 = np.empty((n, 2), dtype = store.dtype)
+    p1 = np.empty((n, 2), dtype = store.dtype)
+    u = np.empty((n, 2), dtype = store.dtype)
+    power = np.empty(n, dtype = store.dtype)
+    depth = np.empty(n, dtype = np.int16)
+    parent = np.empty(n, dtype = np.int32)
+    hit = np.empty(n, dtype = np.int32)
+    for i in range(n):
+        r = rays[i]
+        p0[i] = r.p0.data
+        if r.p1 is None:
+            p1[i] = np.nan
+        else:
+            p1[i] = r.p1.data
+        u[i] = r.u.data
+        power[i] = r.power
+        depth[i] = r.depth
+        parent[i] = index.get(id(r.parent), -1)
+        hit[i] = objIndex.get(id(r.hitObject), -1)
+    store._AddArrays(p0, p1, u, power, depth, parent, hit)
+    store.Finish()
+    return store
+
+def loadRayStore(path, mmap = True):
+    """Open a ray store that was written by :py:class:`DOSSS_DiskRayStore` or :py:func:`DOSSS_RayStore.Save`.
+
+    :param str path: Name of the directory.
+    :param bool mmap: If True (default), the arrays are opened read-only as numpy.memmap, otherwise they are loaded into memory.
+    :returns: DOSSS_RayStore.
+    """
+    store = DOSSS_RayStore()
+    for f in FIELDS:
+        if mmap:
+            a = np.load(os.path.join(path, f + ".npy"), mmap_mode = "r")
+        else:
+            a = np.load(os.path.join(path, f + ".npy"))
+        setattr(store, f, a)
+    store.dtype = store.p0.dtype.type
+    return store
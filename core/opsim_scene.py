@@ -0,0 +1,202 @@
+"""
+.. module: opsim.opsim_scene
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Scripting interface for building and tracing scenes without the GUI.
+
+A :py:class:`DOSSS_Scene` holds the list of objects of an optical setup. Objects are created by the names that appear in the object menu, their parameters are set through the property declarations of the objects (see :py:class:`~core.opsim_objectbase.DOSSS_Property`) and the scene is traced with the headless engine. The result is a :py:class:`~core.opsim_raystore.DOSSS_RayStore`, which holds all ray segments as NumPy arrays::
+
+    from core.opsim_scene import DOSSS_Scene
+
+    scene = DOSSS_Scene()
+    scene.Create("Parallel Light", 0, 0, noRays = 21, width = 20)
+    lens = scene.Create("Plano-Convex Lens", 100, 0, focallength = 150)
+    screen = scene.Create("Beam Stop", 300, 0)
+    for f in [100, 150, 200]:
+        lens.SetProperties(focallength = f)
+        rays = scene.Trace()
+        print(f, scene.GetHits(rays, screen)[:, 1].std())
+
+Scenes are stored in the same *.dos* files as used by the GUI (see :py:func:`DOSSS_Scene.Save`, :py:func:`loadScene` and :py:mod:`core.opsim_sceneio`). :py:func:`DOSSS_Scene.ToDict` and :py:func:`sceneFromDict` convert a scene from and to a dictionary of plain Python types, which can be written as JSON, for example.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+import numpy as np
+from core.opsim_objects import getNewObject
+from core.opsim_sceneio import readScene, saveObjects, objectRecord, objectFromRecord
+from core.opsim_engine import DOSSS_Tracer
+from core.opsim_raystore import DOSSS_RayStore
+from core.opsim_cache import sceneHash
+
+class DOSSS_Scene:
+    """A list of objects together with the settings for tracing them.
+
+    :param list objects: Initial list of objects (default = empty scene).
+    :param int maxNumberOfIterations: Maximum number of segments of a ray (default = 20).
+    :param int sequential: If set, the objects are traced in the order of the list, see :py:attr:`~core.opsim_engine.DOSSS_Tracer.sequence` (default = 0).
+    """
+    def __init__(self, objects = None, maxNumberOfIterations = 20, sequential = 0):
+        if objects is None:
+            objects = []
+        self.objects = objects      #: list of objects
+        self.maxNumberOfIterations = maxNumberOfIterations
+        self.sequential = sequential
+
+    def Create(self, identifier, x = 0, y = 0, **properties):
+        """Create a new object and add it to the scene.
+
+        :param str identifier: Name of the object as it appears in the object menu, see :py:func:`~core.opsim_objects.objectList`.
+        :param float x: x-position of the object.
+        :param float y: y-position of the object.
+        :param properties: Values of further properties of the object, see :py:func:`~core.opsim_objectbase.DOSSSObject.SetProperties`.
+        :returns: The new object.
+        :raises ValueError: If there is no object with this name or a property is invalid.
+        """
+        obj = getNewObject(identifier, x, y)
+        if obj is None:
+            raise ValueError("Unknown object %s." % identifier)
+        obj.SetProperties(properties)
+        obj.ClearDirty()
+        return self.Add(obj)
+
+    def Add(self, obj):
+        """Add an existing object to the scene and return it.
+        """
+        self.objects.append(obj)
+        return obj
+
+    def Remove(self, obj):
+        """Remove an object from the scene.
+        """
+        self.objects.remove(obj)
+
+    def Find(self, identifier):
+        """Returns a list of all objects of a type, e.g., all "Plane Mirror" objects.
+
+        :param str identifier: Name of the object as it appears in the object menu.
+        """
+        return [o for o in self.objects if o.get_name() == identifier]
+
+    def GetTracer(self):
+        """Returns a :py:class:`~core.opsim_engine.DOSSS_Tracer` for the scene.
+        """
+        tracer = DOSSS_Tracer(self.objects, self.maxNumberOfIterations)
+        if self.sequential:
+            tracer.sequence = tracer.GetSequence()
+        return tracer
+
+    def GetHash(self):
+        """Returns the content hash of the objects and trace settings, see :py:func:`~core.opsim_cache.sceneHash`.
+        """
+        return sceneHash(self.objects, self.GetSettings())
+
+    def Trace(self, sinks = [], chunkSize = 10000, float32 = False, cache = None):
+        """Trace the scene and return all ray segments.
+
+        :param list sinks: Additional sinks that receive the segments during the trace, e.g., :py:class:`~core.opsim_sinks.DOSSS_DetectorSink` (default = none).
+        :param int chunkSize: Number of source rays traced at once, see :py:func:`~core.opsim_engine.DOSSS_Tracer.TraceChunked`.
+        :param bool float32: Store coordinates in single precision (default = False).
+        :param DOSSS_TraceCache cache: If given, the result is loaded from this :py:class:`~core.opsim_cache.DOSSS_TraceCache` when the scene was traced before and stored in it otherwise. Sinks need the individual segments, so the cache is not read if sinks are given (default = None).
+        :returns: DOSSS_RayStore with all segments.
+        """
+        if cache is not None:
+            key = self.GetHash()
+            if float32:
+                key = key + "-f32"
+            if len(sinks) == 0:
+                store = cache.Get(key)
+                if store is not None:
+                    return store
+        store = DOSSS_RayStore(float32)
+        self.GetTracer().TraceChunked([store] + list(sinks), chunkSize)
+        if cache is not None:
+            cache.Put(key, store)
+        return store
+
+    def GetHits(self, rays, obj):
+        """Returns the points where the rays hit an object as array of shape (N, 2).
+
+        :param DOSSS_RayStore rays: Result of :py:func:`Trace`.
+        :param obj: The object or its index in the scene.
+        """
+        if not isinstance(obj, int):
+            obj = self.objects.index(obj)
+        return np.asarray(rays.p1[rays.hit == obj])
+
+    def GetSettings(self):
+        """Returns the trace settings as dictionary with the entries *maxNumberOfIterations* and *sequential*.
+        """
+        return {"maxNumberOfIterations": self.maxNumberOfIterations, "sequential": self.sequential}
+
+    def Save(self, filename, compact = None):
+        """Save the objects and trace settings to a scene file (*.dos*), which can be opened with the GUI.
+
+        :param str filename: Name of the scene file.
+        :param bool compact: Write the compressed form, see :py:func:`~core.opsim_sceneio.saveObjects` (default = for files with extension *.dosz*).
+        """
+        saveObjects(self.objects, filename, self.GetSettings(), compact)
+
+    def SaveSVG(self, filename, rays = None):
+        """Export the objects and, if given, the rays to an SVG file, see :py:func:`svgDocument`.
+
+        :param str filename: Name of the SVG file.
+        :param DOSSS_RayStore rays: Result of :py:func:`Trace` or None.
+        """
+        items = list(self.objects)
+        if rays is not None:
+            items.append(rays)
+        with open(filename, "w") as fp:
+            fp.write(svgDocument(items))
+
+    def ToDict(self):
+        """Returns the scene as dictionary of plain Python types. Each object is described by its name and the values of its properties.
+        """
+        d = self.GetSettings()
+        d["objects"] = [objectRecord(o) for o in self.objects]
+        return d
+
+def svgDocument(items):
+    """Returns an SVG document containing the objects, rays or beams in the list items, which all provide a *svgstr* function.
+    """
+    svg = "<?xml version=\"1.0\"?>\n"
+    svg += "<svg>\n"
+    svg += "<g>\n"
+    for item in items:
+        svg += item.svgstr()
+    svg += "</g></svg>"
+    return svg
+
+def sceneFromDict(d):
+    """Create a scene from a dictionary returned by :py:func:`DOSSS_Scene.ToDict`.
+
+    :raises ValueError: If an object type is unknown or a property is invalid.
+    """
+    classes = {}
+    objects = [objectFromRecord(o, classes) for o in d["objects"]]
+    return DOSSS_Scene(objects, d.get("maxNumberOfIterations", 20), d.get("sequential", 0))
+
+def loadScene(filename, maxNumberOfIterations = None):
+    """Open a scene file (*.dos*) that was saved with the GUI or with :py:func:`DOSSS_Scene.Save`.
+
+    :param str filename: Name of the scene file; scene files of older versions are converted, see :py:mod:`core.opsim_sceneio`.
+    :param int maxNumberOfIterations: Maximum number of segments of a ray (default = as stored in the file or 20).
+    """
+    objects, settings = readScene(filename)
+    if maxNumberOfIterations is None:
+        maxNumberOfIterations = settings.get("maxNumberOfIterations", 20)
+    return DOSSS_Scene(objects, maxNumberOfIterations, settings.get("sequential", 0))
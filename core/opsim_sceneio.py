@@ -0,0 +1,285 @@
+"""
+.. module: opsim.opsim_sceneio
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Reading and writing scene files (*.dos*).
+
+Scenes are stored as JSON lines, which can be read and edited with any text editor. The first line is a header with the format version and the trace settings; each following line describes one object by its name and the values of its declared properties (see :py:class:`~core.opsim_objectbase.DOSSS_Property`)::
+
+    {"format": "DOSSS", "version": 1, "maxNumberOfIterations": 20, "sequential": 0}
+    {"type": "Parallel Light", "properties": {"x": 0, "y": 0, "alpha": 0, "noRays": 21, ...}}
+    {"type": "Plano-Convex Lens", "properties": {"x": 100, "y": 0, "focallength": 150, ...}}
+
+Runtime state like the bounding box or the selection is not stored. The compact form (*.dosz*) contains the same lines compressed with zlib behind a short magic string. Both forms are written and read line by line, so that large scenes can be streamed with :py:class:`DOSSS_SceneReader` without holding the file in memory.
+
+Scene files of older versions of DOSSS are pickled lists of objects. They are still opened by :py:func:`readScene`, but only through :py:class:`DOSSS_LegacyUnpickler`, which refuses to load anything but object classes and the NumPy types they contain; the objects are then recreated from their properties. :py:func:`convertScene` converts such files to the current format.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+import os
+import re
+import sys
+import json
+import zlib
+import pickle
+import numpy as np
+from core.opsim_objects import load_class, getObjectClass
+
+FORMAT_NAME = "DOSSS"
+FORMAT_VERSION = 1                  #: version of the scene format written by this module
+COMPACT_MAGIC = b"DOSSSZ\n"         #: first bytes of a compact scene file
+COMPACT_EXTENSION = ".dosz"         #: files with this extension are written in the compact form
+CHUNK_SIZE = 1 << 16                #: number of bytes read at once
+IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*\Z")    #: plain module name without path separators
+
+# classes that may appear in a legacy scene file besides the object classes: [module, name]
+LEGACY_CLASSES = [
+    ["copy_reg", "_reconstructor"], ["copyreg", "_reconstructor"],
+    ["__builtin__", "object"], ["builtins", "object"],
+    ["__builtin__", "list"], ["builtins", "list"],
+    ["numpy", "ndarray"], ["numpy", "dtype"],
+    ["numpy.core.multiarray", "_reconstruct"], ["numpy.core.multiarray", "scalar"],
+    ["numpy._core.multiarray", "_reconstruct"], ["numpy._core.multiarray", "scalar"],
+]
+
+def plainValue(value):
+    """Converts NumPy scalars and arrays in a property value to plain Python types for JSON.
+    """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("%r is not JSON serializable" % (value,))
+
+def objectRecord(obj):
+    """Returns the dictionary describing an object in a scene file.
+    """
+    return {"type": obj.get_name(), "properties": obj.GetProperties()}
+
+def objectFromRecord(record, classes = None):
+    """Create an object from its description in a scene file.
+
+    :param dict record: Dictionary with the entries *type* and *properties*.
+    :param dict classes: Cache mapping object names to classes, which avoids looking up the class for each object of a large scene (default = none).
+    :returns: New object.
+    :raises ValueError: If the object type is unknown or a property is invalid.
+    """
+    name = record["type"]
+    if classes is not None and name in classes:
+        cls = classes[name]
+    else:
+        cls = getObjectClass(name)
+        if cls is None:
+            raise ValueError("Unknown object %s." % name)
+        if classes is not None:
+            classes[name] = cls
+    obj = cls()
+    obj.SetProperties(record["properties"])
+    obj.ClearDirty()
+    return obj
+
+# ###########
+# legacy files
+def objectModules():
+    # module names of the registered object files mapped to their paths
+    from core.opsim_objects import objectList, _dict_of_objects, _dict_of_entry_points
+    objectList()
+    modules = {}
+    for name, filepath in _dict_of_objects.items():
+        if name not in _dict_of_entry_points:
+            modules[os.path.splitext(os.path.basename(filepath))[0]] = filepath
+    return modules
+
+def entryPointClasses():
+    # [module, name] of the classes provided by installed packages
+    from core.opsim_objects import objectList, _dict_of_entry_points
+    objectList()
+    classes = []
+    for ep in _dict_of_entry_points.values():
+        if hasattr(ep, "value"):
+            module, name = ep.value.split(":")
+        else:
+            module, name = ep.module_name, ".".join(ep.attrs)
+        classes.append([module.strip(), name.strip()])
+    return classes
+
+class DOSSS_LegacyUnpickler(pickle.Unpickler):
+    """Unpickler for scene files of older versions, which were pickled lists of objects. Only object classes from the object folder or from installed packages and the NumPy types used for their attributes can be loaded; any other class or function raises an UnpicklingError, so that opening a scene cannot execute arbitrary code.
+    """
+    def find_class(self, module, name):
+        # object classes are looked up among the registered modules by their plain name, never by a path taken from the file
+        if name == module and IDENTIFIER.match(module):
+            modules = objectModules()
+            if module in modules:
+                return load_class(modules[module])
+        if [module, name] in LEGACY_CLASSES or [module, name] in entryPointClasses():
+            return pickle.Unpickler.find_class(self, module, name)
+        raise pickle.UnpicklingError("%s.%s is not allowed in a scene file." % (module, name))
+
+# ###########
+# reading
+class DOSSS_SceneReader:
+    """Reads a scene file object by object. Iterating over the reader yields new objects::
+
+        reader = DOSSS_SceneReader("array.dos")
+        for obj in reader:
+            ...
+        reader.close()
+
+    :param str filename: Name and path of the scene file in JSON, compact or legacy format.
+    :raises ValueError: If the file is not a scene file or was written by a newer version.
+    """
+    def __init__(self, filename):
+        self.fp = open(filename, "rb")
+        start = self.fp.read(len(COMPACT_MAGIC))
+        if start == COMPACT_MAGIC:
+            self.kind = "compact"   #: "json", "compact" or "legacy"
+            self.lines = self._CompactLines()
+        elif start.lstrip()[:1] == b"{":
+            self.kind = "json"
+            self.fp.seek(0)
+            self.lines = iter(self.fp)
+        else:
+            self.kind = "legacy"
+            self.fp.seek(0)
+            try:
+                objects = DOSSS_LegacyUnpickler(self.fp).load()
+                self.lines = iter([json.dumps(objectRecord(o), default = plainValue).encode("utf-8") for o in objects])
+            except Exception as e:
+                self.close()
+                raise ValueError("%s is not a scene file: %s" % (filename, e))
+            self.header = {"format": FORMAT_NAME, "version": 0}     #: dictionary with format version and trace settings
+            return
+
+        try:
+            header = json.loads(next(self.lines).decode("utf-8"))
+        except (StopIteration, ValueError, zlib.error):
+            header = None
+        if not isinstance(header, dict) or header.get("format") != FORMAT_NAME:
+            self.close()
+            raise ValueError("%s is not a scene file." % filename)
+        if header.get("version", 0) > FORMAT_VERSION:
+            self.close()
+            raise ValueError("%s was written by a newer version of DOSSS (format version %s)." % (filename, header["version"]))
+        self.header = header
+
+    def _CompactLines(self):
+        # decompress the file chunk by chunk and yield its lines
+        z = zlib.decompressobj()
+        rest = b""
+        while True:
+            data = self.fp.read(CHUNK_SIZE)
+            if not data:
+                break
+            rest = rest + z.decompress(data)
+            lines = rest.split(b"\n")
+            rest = lines.pop()
+            for line in lines:
+                yield line
+        rest = rest + z.flush()
+        for line in rest.split(b"\n"):
+            yield line
+
+    def GetSettings(self):
+        """Returns the trace settings stored in the header, i.e., *maxNumberOfIterations* and *sequential* if present.
+        """
+        return dict([(k, v) for k, v in self.header.items() if k not in ("format", "version")])
+
+    def Records(self):
+        """Yields the descriptions of the objects as dictionaries with the entries *type* and *properties*.
+        """
+        for line in self.lines:
+            if line.strip() != b"":
+                yield json.loads(line.decode("utf-8"))
+
+    def Objects(self):
+        """Yields the objects of the scene.
+        """
+        classes = {}
+        for record in self.Records():
+            yield objectFromRecord(record, classes)
+
+    def __iter__(self):
+        return self.Objects()
+
+    def close(self):
+        self.fp.close()
+
+def readScene(filename):
+    """Returns the objects and the trace settings stored in a scene file.
+
+    :param str filename: Name and path of the scene file in JSON, compact or legacy format.
+    :returns: [list of objects, dictionary with trace settings].
+    """
+    reader = DOSSS_SceneReader(filename)
+    try:
+        return [list(reader), reader.GetSettings()]
+    finally:
+        reader.close()
+
+def loadObjects(filename):
+    """Returns the list of objects stored in a scene file.
+
+    :param str filename: Name and path of the scene file.
+    """
+    return readScene(filename)[0]
+
+# ###########
+# writing
+def saveObjects(objects, filename, settings = None, compact = None):
+    """Stores a list of objects in a scene file.
+
+    :param list objects: List or iterator of DOSSS objects.
+    :param str filename: Name and path of the scene file.
+    :param dict settings: Trace settings stored in the header, e.g., *maxNumberOfIterations* and *sequential* (default = none).
+    :param bool compact: Write the compact form; by default, the compact form is used for files with the extension *.dosz*.
+    """
+    if compact is None:
+        compact = os.path.splitext(filename)[1].lower() == COMPACT_EXTENSION
+    header = {"format": FORMAT_NAME, "version": FORMAT_VERSION}
+    if settings is not None:
+        header.update(settings)
+
+    with open(filename, "wb") as fp:
+        if compact:
+            fp.write(COMPACT_MAGIC)
+            z = zlib.compressobj(9)
+            write = lambda data: fp.write(z.compress(data))
+        else:
+            write = fp.write
+        write(json.dumps(header, default = plainValue).encode("utf-8") + b"\n")
+        for obj in objects:
+            write(json.dumps(objectRecord(obj), default = plainValue).encode("utf-8") + b"\n")
+        if compact:
+            fp.write(z.flush())
+
+def convertScene(source, destination, compact = None):
+    """Converts a scene file, e.g., a pickled scene of an older version, to the current format.
+
+    :param str source: Name and path of the scene file to convert.
+    :param str destination: Name and path of the new file; may be the same as source.
+    :param bool compact: Write the compact form, see :py:func:`saveObjects`.
+    """
+    objects, settings = readScene(source)
+    saveObjects(objects, destination, settings, compact)
+
+if __name__ == '__main__':
+    # python -m core.opsim_sceneio old.dos [new.dos]: convert a scene file
+    if len(sys.argv) not in (2, 3):
+        sys.exit("usage: python -m core.opsim_sceneio source [destination]")
+    convertScene(sys.argv[1], sys.argv[-1])
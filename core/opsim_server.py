@@ -0,0 +1,304 @@
+"""
+.. module: opsim.opsim_server
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Local trace service for tools that want to use DOSSS over a socket instead of importing it::
+
+    python opsim.py serve --port 8765 --workers 4
+
+The server speaks JSON-RPC 2.0 over TCP with one JSON document per line. Requests are dispatched to a pool of headless tracer processes, which import all object modules when they start and keep recently used scenes, so that repeated requests do not pay for imports and object creation. Responses are written as soon as their job has finished, i.e., a client can send many requests over one connection and match the responses by their *id*.
+
+Methods:
+
+    * *trace*: params *scene* (dictionary as returned by :py:func:`~core.opsim_scene.DOSSS_Scene.ToDict`), optional *rays* (number of rays of each light source), *detectors* (list of object indices) and *segments* (if true, the result contains the arrays *p0*, *p1* and *hit* of all segments). The result contains the number of segments, the trace time and, for each detector, the number of hits, power, centroid and RMS spot size.
+    * *metrics*: number of pending and queued jobs, completed and failed requests and the latency of the last requests.
+    * *objects*: list of the available object types.
+
+The server needs Python 3.7 or later. :py:func:`call` is a minimal blocking client.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import argparse
+from collections import deque, OrderedDict
+try:
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor
+    _ProtocolBase = asyncio.Protocol
+except ImportError:     # Python 2
+    asyncio = None
+    _ProtocolBase = object
+from core.opsim_objects import objectList, getObjectClass
+from core.opsim_scene import sceneFromDict
+from core.opsim_sinks import DOSSS_DetectorSink
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+TRACE_ERROR = -32000
+
+SCENE_CACHE_SIZE = 32       #: number of scenes kept by each worker process
+
+# ###########
+# worker processes
+_scenes = OrderedDict()     # scenes of the recent requests of this worker, keyed by their JSON text
+
+def warmWorker():
+    """Initializer of the worker processes: import all object modules.
+    """
+    for name in objectList():
+        getObjectClass(name)
+
+def ping():
+    """Returns the process id of the worker; used to start the workers before the first request.
+    """
+    return os.getpid()
+
+def getScene(params):
+    # create the scene of a request or reuse it from a previous request with the same scene and rays
+    key = json.dumps([params["scene"], params.get("rays")], sort_keys = True)
+    if key in _scenes:
+        return _scenes[key], True
+    scene = sceneFromDict(params["scene"])
+    if params.get("rays") is not None:
+        for o in scene.objects:
+            if o.lightsource and "noRays" in o.GetProperties():
+                o.SetProperties(noRays = params["rays"])
+    _scenes[key] = scene
+    if len(_scenes) > SCENE_CACHE_SIZE:
+        _scenes.popitem(last = False)
+    return scene, False
+
+def traceJob(params):
+    """Executes a *trace* request in a worker process and returns its result.
+    """
+    scene, warm = getScene(params)
+    detectors = [DOSSS_DetectorSink(int(i)) for i in params.get("detectors", [])]
+    t0 = time.time()
+    rays = scene.Trace(detectors)
+    result = {"segments": len(rays), "traceTime": time.time() - t0, "warm": warm, "detectors": []}
+    for d in detectors:
+        result["detectors"].append({"index": d.index, "hits": d.count, "power": d.power, "centroid": d.GetCentroid(), "spotSize": d.GetSpotSize()})
+    if params.get("segments"):
+        result["p0"] = rays.p0.tolist()
+        result["p1"] = [[None, None] if p[0] != p[0] else p for p in rays.p1.tolist()]
+        result["hit"] = rays.hit.tolist()
+    return result
+
+# ###########
+# server
+class _RPCProtocol(_ProtocolBase):
+    # one client connection: splits the input into lines and passes them to the server
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.buffer = b""
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+    def data_received(self, data):
+        self.buffer = self.buffer + data
+        while b"\n" in self.buffer:
+            line, self.buffer = self.buffer.split(b"\n", 1)
+            if line.strip() != b"":
+                self.server.Handle(line, self.Send)
+
+    def Send(self, response):
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.write(json.dumps(response).encode("utf-8") + b"\n")
+
+class DOSSS_TraceServer:
+    """JSON-RPC server dispatching trace requests to a pool of worker processes.
+
+    :param str host: Address to listen on (default = "127.0.0.1", i.e., local connections only).
+    :param int port: TCP port (default = 8765).
+    :param int workers: Number of worker processes (default = number of CPUs).
+    """
+    def __init__(self, host = "127.0.0.1", port = 8765, workers = None):
+        if asyncio is None:
+            raise RuntimeError("The trace server needs Python 3.7 or later.")
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.loop = None
+        self.server = None
+        self.executor = None
+        self.started = time.time()
+        self.pending = 0        #: number of submitted jobs that have not finished yet
+        self.completed = 0      #: number of successful requests
+        self.failed = 0         #: number of requests answered with an error
+        self.latency = deque(maxlen = 1000)     #: time between request and response of the last requests in s
+
+    def Start(self, loop = None):
+        """Start the worker processes and listen for connections; the server runs when the event loop runs.
+        """
+        # the workers are started before the server socket is opened, so that they do not inherit it
+        self.executor = ProcessPoolExecutor(self.workers, initializer = warmWorker)
+        for future in [self.executor.submit(ping) for i in range(self.workers)]:
+            future.result()
+        self.loop = loop or asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(self.loop.create_server(lambda: _RPCProtocol(self), self.host, self.port))
+        self.port = self.server.sockets[0].getsockname()[1]
+        # shut down the workers also when terminated by a signal; not available on Windows
+        try:
+            self.loop.add_signal_handler(signal.SIGTERM, self.loop.stop)
+        except (NotImplementedError, AttributeError):
+            pass
+
+    def Run(self):
+        """Start the server and serve until interrupted.
+        """
+        if self.server is None:
+            self.Start()
+        print("DOSSS trace server listening on %s:%d with %d workers" % (self.host, self.port, self.workers))
+        try:
+            self.loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.Stop()
+
+    def Stop(self):
+        """Close the server and shut down the worker processes.
+        """
+        if self.server is not None:
+            self.server.close()
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.server = None
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def GetMetrics(self):
+        """Returns a dictionary with the number of pending and queued jobs, completed and failed requests and latency statistics in s.
+        """
+        latency = sorted(self.latency)
+        stats = {"count": len(latency)}
+        if len(latency) > 0:
+            stats["mean"] = sum(latency) / len(latency)
+            stats["p50"] = latency[len(latency) // 2]
+            stats["p95"] = latency[min(len(latency) - 1, int(0.95 * len(latency)))]
+            stats["max"] = latency[-1]
+        return {"workers": self.workers, "pending": self.pending, "queued": max(0, self.pending - self.workers), "completed": self.completed, "failed": self.failed, "uptime": time.time() - self.started, "latency": stats}
+
+    def Handle(self, line, send):
+        """Handle a single request and pass the response to send once it is available.
+
+        :param bytes line: JSON-RPC request.
+        :param function send: Function receiving the response as dictionary.
+        """
+        t0 = time.time()
+        try:
+            request = json.loads(line.decode("utf-8"))
+        except ValueError as e:
+            self._Reply(send, t0, None, error = [PARSE_ERROR, "Parse error: %s" % e])
+            return
+        if not isinstance(request, dict) or "method" not in request:
+            self._Reply(send, t0, None, error = [INVALID_REQUEST, "Invalid request"])
+            return
+        rid = request.get("id")
+        method = request["method"]
+        params = request.get("params", {})
+
+        if method == "metrics":
+            self._Reply(send, t0, rid, self.GetMetrics())
+        elif method == "objects":
+            self._Reply(send, t0, rid, objectList())
+        elif method == "trace":
+            if not isinstance(params, dict) or not isinstance(params.get("scene"), dict):
+                self._Reply(send, t0, rid, error = [INVALID_PARAMS, "trace needs a scene"])
+                return
+            self.pending = self.pending + 1
+            future = self.loop.run_in_executor(self.executor, traceJob, params)
+            future.add_done_callback(lambda f: self._Done(f, send, t0, rid))
+        else:
+            self._Reply(send, t0, rid, error = [METHOD_NOT_FOUND, "Method not found: %s" % method])
+
+    def _Done(self, future, send, t0, rid):
+        # a trace job has finished
+        self.pending = self.pending - 1
+        if future.exception() is not None:
+            self._Reply(send, t0, rid, error = [TRACE_ERROR, str(future.exception())])
+        else:
+            self._Reply(send, t0, rid, future.result())
+
+    def _Reply(self, send, t0, rid, result = None, error = None):
+        # send a response and update the metrics; notifications (no id) are not answered
+        self.latency.append(time.time() - t0)
+        if error is not None:
+            self.failed = self.failed + 1
+        else:
+            self.completed = self.completed + 1
+        if rid is None and error is None:
+            return
+        response = {"jsonrpc": "2.0", "id": rid}
+        if error is not None:
+            response["error"] = {"code": error[0], "message": error[1]}
+        else:
+            response["result"] = result
+        send(response)
+
+def call(method, params = None, host = "127.0.0.1", port = 8765, timeout = None):
+    """Send a single request to a trace server and return its result.
+
+    :raises RuntimeError: If the server answers with an error.
+    """
+    s = socket.create_connection((host, port), timeout)
+    try:
+        request = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params or {}}
+        s.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = s.recv(65536)
+            if not chunk:
+                break
+            data = data + chunk
+    finally:
+        s.close()
+    response = json.loads(data.decode("utf-8"))
+    if "error" in response:
+        raise RuntimeError(response["error"]["message"])
+    return response["result"]
+
+def main(argv = None):
+    """Entry point of the *serve* command.
+
+    :param list argv: Command line arguments after *serve* (default = sys.argv[2:]).
+    :returns: Exit code.
+    """
+    if argv is None:
+        argv = sys.argv[2:]
+    p = argparse.ArgumentParser(prog = "opsim.py serve", description = "Serve DOSSS traces over JSON-RPC.")
+    p.add_argument("--host", default = "127.0.0.1", help = "address to listen on (default: 127.0.0.1)")
+    p.add_argument("--port", type = int, default = 8765, help = "TCP port (default: 8765)")
+    p.add_argument("--workers", type = int, default = None, help = "number of worker processes (default: number of CPUs)")
+    args = p.parse_args(argv)
+    DOSSS_TraceServer(args.host, args.port, args.workers).Run()
+    return 0
@@ -0,0 +1,133 @@
+"""
+.. module: opsim.opsim_sinks
+   :platform: Windows
+.. moduleauthor:: Daniel Dietze <daniel.dietze@berkeley.edu>
+
+Sinks for chunked raytracing with :py:func:`~core.opsim_engine.DOSSS_Tracer.TraceChunked`.
+
+A sink receives the finished segments of each chunk as a list of :py:class:`~core.opsim_engine.DOSSS_Segment` via *AddSegments* and is notified by *Finish* when the trace is complete. Sinks should only accumulate what they need, so that the memory consumption of a trace does not grow with the number of rays.
+
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2008 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+from math import *
+
+class DOSSS_Sink:
+    """Base class of all sinks. Derived classes overwrite :py:func:`AddSegments` and, if needed, :py:func:`Finish`.
+    """
+    def AddSegments(self, segments):
+        """Process the segments of one chunk.
+
+        :param list segments: List of DOSSS_Segment.
+        """
+        pass
+
+    def Finish(self):
+        """Called once after the last chunk has been traced.
+        """
+        pass
+
+class DOSSS_StatisticsSink(DOSSS_Sink):
+    """Accumulates global statistics of a trace: number of segments, total optical path, power absorbed or redirected by each object, power leaving the scene and power of the rays that were cut off at the maximum number of iterations.
+    """
+    def __init__(self):
+        self.segments = 0           #: total number of segments
+        self.sourceRays = 0         #: number of rays emitted by light sources
+        self.pathLength = 0.0       #: summed geometrical length of all finite segments
+        self.escapedPower = 0.0     #: power of rays that leave the scene without hitting anything
+        self.truncatedPower = 0.0   #: power of rays that were not traced further because they reached the maximum number of iterations
+        self.hitPower = {}          #: dictionary mapping object indices to the power of all rays hitting them
+
+    def AddSegments(self, segments):
+        for s in segments:
+            self.segments = self.segments + 1
+            if s.parent == -1:
+                self.sourceRays = self.sourceRays + 1
+            if s.truncated:
+                self.truncatedPower = self.truncatedPower + s.power
+            elif s.end is None:
+                self.escapedPower = self.escapedPower + s.power
+            else:
+                self.pathLength = self.pathLength + sqrt((s.end[0] - s.origin[0])**2 + (s.end[1] - s.origin[1])**2)
+                if s.hit != -1:
+                    self.hitPower[s.hit] = self.hitPower.get(s.hit, 0.0) + s.power
+
+class DOSSS_DetectorSink(DOSSS_Sink):
+    """Uses an object of the scene as a detector: records the power weighted centroid and RMS size of the spot formed by all rays ending on that object. Individual hits are only stored on request.
+
+    :param int index: Index of the detector object in the scene's object list.
+    :param bool keepHits: If True, store all hits as (x, y, power) tuples in :py:attr:`hits` (default = False).
+    """
+    def __init__(self, index, keepHits = False):
+        self.index = index
+        self.keepHits = keepHits
+        self.hits = []              #: list of (x, y, power) tuples, only filled if keepHits is True
+        self.count = 0              #: number of rays hitting the detector
+        self.power = 0.0            #: total power hitting the detector
+        self._sx = self._sy = self._sxx = self._syy = 0.0
+
+    def AddSegments(self, segments):
+        for s in segments:
+            if s.hit == self.index and s.end is not None:
+                x, y = s.end
+                self.count = self.count + 1
+                self.power = self.power + s.power
+                self._sx = self._sx + s.power * x
+                self._sy = self._sy + s.power * y
+                self._sxx = self._sxx + s.power * x * x
+                self._syy = self._syy + s.power * y * y
+                if self.keepHits:
+                    self.hits.append((x, y, s.power))
+
+    def GetCentroid(self):
+        """Returns the power weighted centroid (x, y) of the spot or None if nothing hit the detector.
+        """
+        if self.power == 0:
+            return None
+        return (self._sx / self.power, self._sy / self.power)
+
+    def GetSpotSize(self):
+        """Returns the power weighted RMS radius of the spot around its centroid or None if nothing hit the detector.
+        """
+        if self.power == 0:
+            return None
+        cx, cy = self.GetCentroid()
+        var = self._sxx / self.power - cx * cx + self._syy / self.power - cy * cy
+        if var < 0:     # numerical noise
+            var = 0.0
+        return sqrt(var)
+
+class DOSSS_WriterSink(DOSSS_Sink):
+    """Writes all segments to a text file with one line per segment and tab separated columns: id, parent, x0, y0, x1, y1, ux, uy, power, depth, hit. Rays without end point are written with nan coordinates.
+
+    :param str filename: Name of the output file.
+    """
+    def __init__(self, filename):
+        self.fp = open(filename, "w")
+        self.fp.write("# id\tparent\tx0\ty0\tx1\ty1\tux\tuy\tpower\tdepth\thit\n")
+
+    def AddSegments(self, segments):
+        lines = []
+        for s in segments:
+            if s.end is None:
+                end = (float("nan"), float("nan"))
+            else:
+                end = s.end
+            lines.append("%d\t%d\t%g\t%g\t%g\t%g\t%g\t%g\t%g\t%d\t%d\n" % (s.id, s.parent, s.origin[0], s.origin[1], end[0], end[1], s.direction[0], s.direction[1], s.power, s.depth, s.hit))
+        self.fp.write("".join(lines))
+
+    def Finish(self):
+        self.fp.close()
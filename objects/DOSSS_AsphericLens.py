@@ -0,0 +1,98 @@
+"""
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2015 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+from core.opsim_objectbase import *
+
+class DOSSS_AsphericLens(DOSSSObject):
+    # object specific properties
+    properties = DOSSSObject.properties + [DOSSS_Property("aperture", "Aperture", minimum = 1, units = "mm"),
+                                           DOSSS_Property("radius", "Radius of Curvature", minimum = 1, units = "mm"),
+                                           DOSSS_Property("conic", "Conic Constant"),
+                                           DOSSS_Property("A4", "A4", units = "1/mm^3"),
+                                           DOSSS_Property("A6", "A6", units = "1/mm^5"),
+                                           DOSSS_Property("refractiveIndex", "Refractive Index", minimum = 1),
+                                           DOSSS_Property("thickness", "Thickness", minimum = 1, units = "mm")]
+
+    def __init__(self, xpos = 0, ypos = 0, aperture = 50, radius = 50, conic = -1, ior = 1.5, thickness = 15, A4 = 0, A6 = 0):
+        DOSSSObject.__init__(self, xpos, ypos)
+        self.aperture = aperture    # diameter
+        self.radius = radius        # radius of curvature at the vertex
+        self.conic = conic          # conic constant
+        self.A4 = A4                # 4th order aspheric coefficient
+        self.A6 = A6                # 6th order aspheric coefficient
+        self.thickness = thickness  # maximal thickness
+        self.refractiveIndex = ior  # material ior
+        self.CheckParameters()
+        self.name = "Aspheric Lens"
+
+    # check for minimal thickness such that the lens has at least the given aperture
+    def CheckParameters(self):
+        # for ellipses, the aperture is limited by the size of the conic
+        if 1 + self.conic > 0 and self.aperture > 2 * self.radius / sqrt(1 + self.conic):
+            self.aperture = 2 * self.radius / sqrt(1 + self.conic)
+        dmin = self.GetAsphere().Sag(self.aperture / 2.0)
+        if self.thickness < dmin:
+            self.thickness = dmin
+
+    # the aspheric surface with its vertex on the optical axis, curving towards the flat side
+    def GetAsphere(self):
+        glass = DOSSS_Material(REFRACT, self.refractiveIndex)
+        return DOSSS_ConicSurface((self.thickness, 0), (-1, 0), 1.0 / self.radius, self.conic, -self.aperture / 2.0, self.aperture / 2.0, glass, [self.A4, self.A6])
+
+    # create object shape for displaying
+    def GetDisplayPoints(self):
+        asphere = self.GetAsphere()
+
+        p = []
+        p.append([0, -self.aperture / 2])
+
+        a = self.aperture / 2.0
+        for i in range(21):
+            p.append([self.thickness - asphere.Sag(a), -a])
+            a = a - self.aperture / 20.0
+
+        p.append([0, +self.aperture / 2])
+
+        return p
+
+    # surface description
+    def GetSurfaces(self):
+        asphere = self.GetAsphere()
+        dmin = asphere.Sag(self.aperture / 2.0)
+
+        tl = (0, -self.aperture/2.0)
+        tr = (self.thickness - dmin, -self.aperture/2.0)
+        br = (self.thickness - dmin, +self.aperture/2.0)
+        bl = (0, +self.aperture/2.0)
+
+        glass = asphere.material
+        s = []
+        if tr[0] != tl[0]:
+            s.append(DOSSS_LineSurface(tl, tr, glass))      # upper side
+        s.append(asphere)                                   # aspheric side
+        if br[0] != bl[0]:
+            s.append(DOSSS_LineSurface(br, bl, glass))      # lower side
+        s.append(DOSSS_LineSurface(bl, tl, glass))          # flat side
+        return s
+
+    # paraxial model: flat side at x = 0, vertex of the asphere at x = thickness
+    def GetRayTransferMatrix(self, direction, length):
+        n = self.refractiveIndex
+        M = RTMProduct([RTMRefraction(1, n), RTMTranslation(self.thickness), RTMRefraction(n, 1, -self.radius)])
+        if direction[0] < 0:
+            return RTMReverse(M)
+        return M
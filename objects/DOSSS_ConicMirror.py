@@ -0,0 +1,79 @@
+"""
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2015 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+from core.opsim_objectbase import *
+
+# concave mirror with the shape of a conic section:
+# conic constant k = 0 gives a spherical, k = -1 a parabolic, -1 < k < 0 an ellipsoidal and k < -1 a hyperbolic mirror
+# for ellipsoidal and hyperbolic mirrors, the foci lie at R / (1 + sqrt(-k)) and R / (1 - sqrt(-k)) from the vertex
+class DOSSS_ConicMirror(DOSSSObject):
+    # object specific properties
+    properties = DOSSSObject.properties + [DOSSS_Property("aperture", "Aperture", minimum = 1, units = "mm"),
+                                           DOSSS_Property("radius", "Radius of Curvature", minimum = 1, units = "mm"),
+                                           DOSSS_Property("conic", "Conic Constant"),
+                                           DOSSS_Property("thickness", "Thickness", minimum = 1, units = "mm")]
+
+    def __init__(self, xpos = 0, ypos = 0, aperture = 50, radius = 100, conic = -1, thickness = 5):
+        DOSSSObject.__init__(self, xpos, ypos)
+        self.aperture = aperture    # diameter
+        self.radius = radius        # radius of curvature at the vertex
+        self.conic = conic          # conic constant
+        self.thickness = thickness  # thickness of the mirror substrate at the center
+        self.CheckParameters()
+        self.name = "Conic Mirror"
+
+    # for ellipses, the aperture is limited by the size of the conic
+    def CheckParameters(self):
+        if 1 + self.conic > 0 and self.aperture > 2 * self.radius / sqrt(1 + self.conic):
+            self.aperture = 2 * self.radius / sqrt(1 + self.conic)
+
+    # the mirror surface with its vertex at the origin, concave towards the left
+    def GetMirror(self):
+        return DOSSS_ConicSurface((0, 0), (1, 0), -1.0 / self.radius, self.conic, -self.aperture / 2.0, self.aperture / 2.0, DOSSS_Material(MIRROR))
+
+    # create object shape for displaying
+    def GetDisplayPoints(self):
+        mirror = self.GetMirror()
+
+        p = []
+        a = -self.aperture / 2.0
+        for i in range(21):
+            p.append([mirror.Sag(a), a])
+            a = a + self.aperture / 20.0
+        p.append([self.thickness, self.aperture / 2.0])
+        p.append([self.thickness, -self.aperture / 2.0])
+
+        return p
+
+    # surface description
+    def GetSurfaces(self):
+        mirror = self.GetMirror()
+        xe = mirror.Sag(self.aperture / 2.0)
+        xb = self.thickness
+
+        tl = (xe, -self.aperture/2.0)
+        tr = (xb, -self.aperture/2.0)
+        br = (xb, +self.aperture/2.0)
+        bl = (xe, +self.aperture/2.0)
+
+        # only the conic side is reflecting, the substrate is absorbing
+        back = DOSSS_Material(ABSORB)
+        return [mirror, DOSSS_LineSurface(tl, tr, back), DOSSS_LineSurface(tr, br, back), DOSSS_LineSurface(br, bl, back)]
+
+    # paraxial model: tangential focal length for light incident at an angle to the axis
+    def GetRayTransferMatrix(self, direction, length):
+        return RTMThinLens(self.radius / 2.0 * abs(direction[0]))
@@ -15,10 +15,14 @@
 
    Copyright 2015 Daniel Dietze <daniel.dietze@berkeley.edu>.   
 """ 
-import wx
 from core.opsim_objectbase import *
 
 class DOSSS_HemisphericLens(DOSSSObject):
+    # object specific properties
+    properties = DOSSSObject.properties + [DOSSS_Property("radius", "Radius", minimum = 1, units = "mm"),
+                                           DOSSS_Property("height", "Height", minimum = 1, units = "mm"),
+                                           DOSSS_Property("refractiveIndex", "Refractive Index", minimum = 1)]
+
     def __init__(self, xpos = 0, ypos = 0, radius = 10, height = 15, ior = 1.5):
         DOSSSObject.__init__(self, xpos, ypos)       
         self.radius = radius
@@ -45,88 +49,25 @@ class DOSSS_HemisphericLens(DOSSSObject):
         p.append([0, -self.radius])
         return p
 
-    # intersection functions
-    def Intersection(self, line):  
-        # transform ray into object coordinate system
-        l = self.ProjectIntoObjectCosy(line) 
-                
-        # now test for intersection
-        # this is done by checking every segment of the object for intersection
-        # if a point is found, it is stored together with the distance to the rays origin
-        # and a list of emerging rays (transmitted or reflected)
-        # at the end, the point with the shortest distance is picked and returned  
+    # surface description
+    def GetSurfaces(self):
         x = sqrt(2 * self.height * self.radius - self.height**2)      
         y = self.height - self.radius
-        bl = DOSSSVector(-x, y)
-        br = DOSSSVector(+x, y)
-        
-        # return values
-        p0 = None
-        d0 = d = -1
-        er = []
-        
-        # lower side
-        if bl.x() != br.x():
-            lb = getLineThroughPoints(bl, br)
-            p = lb.bounded_intersection(l, bl, br)
-            if(p != None):                      
-                d = (l.a - p).length()           
-                if(d > 1e-7 and (d0 == -1 or d < d0)): 
-                    d0 = d
-                    p0 = p                           
-                    er = [DOSSSLine(p0, Snell(l.u, DOSSSVector(0, 1), self.refractiveIndex))]
- 
-        # spherical side
-        ps = IntersectionWithSphere(l, 0, self.radius)
-        for p in ps:
-            if(p != None and p.y() < y):
-                d = (l.a - p).length()
-                if(d > 1e-7 and (d0 == -1 or d < d0)):                
-                    d0 = d
-                    p0 = p                
-                    # the normal vector on the sphere is given by the vector through the intersection and the center of the sphere
-                    er = [DOSSSLine(p0, Snell(l.u, DOSSSVector(p.x(), p.y()), self.refractiveIndex))]
-                    
-        # now that we have the intersection point, we have to transform it back
-        if(p0 != None):
-            p0 = self.ProjectIntoObjectCosy(p0, 1)
-            # do the same for all emerging beams
-            for i in range(len(er)):
-                er[i] = self.ProjectIntoObjectCosy(er[i], 1)                
+        bl = (-x, y)
+        br = (+x, y)
         
-        # return values are: [intersection point, distance of travel, [emerging rays]]
-        return [p0, d0, er]
+        glass = DOSSS_Material(REFRACT, self.refractiveIndex)
+        s = [DOSSS_ArcSurface((0, 0), self.radius, bl, br, glass)]   # spherical side
+        if bl[0] != br[0]:
+            s.append(DOSSS_LineSurface(br, bl, glass))              # lower side
+        return s
 
-    # property dialog
-    def ShowPropertyDialog(self):
-        # create options list
-        options = []
-        options.append(["Position X", self.position[0]])
-        options.append(["Position Y", self.position[1]])
-        options.append(["Rotate", self.alpha])
-        options.append(["FlipH", self.flip_h])
-        options.append(["FlipV", self.flip_v])
-        # object specific properties               
-        options.append(["Radius", self.radius, 1])
-        options.append(["Height", self.height, 1])
-        options.append(["Refractive Index", self.refractiveIndex, 1])        
-        
-        # open dialog
-        dlg = DOSSS_PropertyDialog(options)
-        if (dlg.ShowModal() == wx.ID_OK):
-            # read out new values
-            options = dlg.getOptions()
-            self.position[0] = options[0]
-            self.position[1] = options[1]
-            self.alpha = options[2]
-            self.flip_h = options[3]
-            self.flip_v = options[4]
-            # object specific properties
-            self.radius = options[5]
-            self.height = options[6]
-            self.refractiveIndex = options[7]             
-            self.CheckParameters()
-        
-        # destroy dialog object
-        dlg.Destroy()
-        
\ No newline at end of file
+    # paraxial model: the optical axis is the y-axis with the flat side at the bottom
+    def GetRayTransferMatrix(self, direction, length):
+        if abs(direction[0]) > abs(direction[1]):
+            return None
+        n = self.refractiveIndex
+        M = RTMProduct([RTMRefraction(1, n), RTMTranslation(self.height), RTMRefraction(n, 1, -self.radius)])
+        if direction[1] > 0:
+            return RTMReverse(M)
+        return M
@@ -0,0 +1,75 @@
+"""
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2015 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+from core.opsim_objectbase import *
+
+# ideal thin lens, defined only by its focal length (negative for diverging lenses) and aperture
+# rays are deflected analytically in a single step, which makes it a cheap placeholder for a real lens in first-order layouts
+class DOSSS_IdealLens(DOSSSObject):
+    # object specific properties
+    properties = DOSSSObject.properties + [DOSSS_Property("aperture", "Aperture", minimum = 1, units = "mm"),
+                                           DOSSS_Property("focalLength", "Focal Length", units = "mm")]
+
+    def __init__(self, xpos = 0, ypos = 0, aperture = 50, focalLength = 100):
+        DOSSSObject.__init__(self, xpos, ypos)
+        self.aperture = aperture        # diameter
+        self.focalLength = focalLength  # focal length
+        self.name = "Ideal Lens"
+
+    # create object shape for displaying
+    # the lens is drawn as a line with arrow heads pointing outwards for converging and inwards for diverging lenses
+    def GetDisplayPoints(self):
+        h = self.aperture / 2.0
+        w = min(3.0, h / 4.0)
+        s = 0.5
+        p = []
+        if self.focalLength >= 0:
+            p.append([0, -h])
+            p.append([w, -h + w])
+            p.append([s, -h + w])
+            p.append([s, h - w])
+            p.append([w, h - w])
+            p.append([0, h])
+            p.append([-w, h - w])
+            p.append([-s, h - w])
+            p.append([-s, -h + w])
+            p.append([-w, -h + w])
+        else:
+            p.append([-w, -h])
+            p.append([w, -h])
+            p.append([s, -h + w])
+            p.append([s, h - w])
+            p.append([w, h])
+            p.append([-w, h])
+            p.append([-s, h - w])
+            p.append([-s, -h + w])
+        return p
+
+    # surface description
+    def GetSurfaces(self):
+        if self.focalLength == 0:
+            power = 0
+        else:
+            power = 1.0 / self.focalLength
+        lens = DOSSS_Material(IDEAL_LENS, power = power)
+        return [DOSSS_LineSurface((0, self.aperture / 2.0), (0, -self.aperture / 2.0), lens)]
+
+    # paraxial model: for light incident at an angle to the axis, the focal length is divided by the cosine of the angle
+    def GetRayTransferMatrix(self, direction, length):
+        if self.focalLength == 0:
+            return np.identity(2)
+        return RTMThinLens(self.focalLength / abs(direction[0]))
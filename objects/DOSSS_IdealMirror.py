@@ -0,0 +1,78 @@
+"""
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2015 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+from core.opsim_objectbase import *
+
+# ideal curved mirror, defined only by its focal length (positive for concave, negative for convex mirrors) and aperture
+# the reflecting side faces to the left; rays are deflected analytically without tracing the actual curved surface
+class DOSSS_IdealMirror(DOSSSObject):
+    # object specific properties
+    properties = DOSSSObject.properties + [DOSSS_Property("aperture", "Aperture", minimum = 1, units = "mm"),
+                                           DOSSS_Property("focalLength", "Focal Length", units = "mm"),
+                                           DOSSS_Property("thickness", "Thickness", minimum = 0, units = "mm")]
+
+    def __init__(self, xpos = 0, ypos = 0, aperture = 50, focalLength = 50, thickness = 2):
+        DOSSSObject.__init__(self, xpos, ypos)
+        self.aperture = aperture        # diameter
+        self.focalLength = focalLength  # focal length
+        self.thickness = thickness      # thickness of the mirror substrate
+        self.name = "Ideal Mirror"
+
+    # create object shape for displaying
+    # the ends of the mirror are bent to indicate concave or convex mirrors
+    def GetDisplayPoints(self):
+        h = self.aperture / 2.0
+        w = min(3.0, h / 4.0)
+        p = []
+        if self.focalLength >= 0:
+            p.append([-w, -h])
+            p.append([self.thickness, -h])
+            p.append([self.thickness, h])
+            p.append([-w, h])
+            p.append([0, h - w])
+            p.append([0, -h + w])
+        else:
+            p.append([w, -h])
+            p.append([w + self.thickness, -h])
+            p.append([w + self.thickness, h])
+            p.append([w, h])
+            p.append([0, h - w])
+            p.append([0, -h + w])
+        return p
+
+    # surface description
+    def GetSurfaces(self):
+        if self.focalLength == 0:
+            power = 0
+        else:
+            power = 1.0 / self.focalLength
+
+        tl = (0, -self.aperture/2.0)
+        tr = (self.thickness, -self.aperture/2.0)
+        br = (self.thickness, +self.aperture/2.0)
+        bl = (0, +self.aperture/2.0)
+
+        # only the front side is reflecting, the substrate is absorbing
+        mirror = DOSSS_Material(IDEAL_MIRROR, power = power)
+        back = DOSSS_Material(ABSORB)
+        return [DOSSS_LineSurface(bl, tl, mirror), DOSSS_LineSurface(tl, tr, back), DOSSS_LineSurface(tr, br, back), DOSSS_LineSurface(br, bl, back)]
+
+    # paraxial model: for light incident at an angle to the axis, the focal length is divided by the cosine of the angle
+    def GetRayTransferMatrix(self, direction, length):
+        if self.focalLength == 0:
+            return np.identity(2)
+        return RTMThinLens(self.focalLength / abs(direction[0]))
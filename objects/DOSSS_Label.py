@@ -15,14 +15,18 @@
 
    Copyright 2015 Daniel Dietze <daniel.dietze@berkeley.edu>.   
 """ 
-import wx
 from core.opsim_objectbase import *
 
 class DOSSS_Label(DOSSSObject):
+    # object specific properties
+    properties = DOSSSObject.properties + [DOSSS_Property("text", "Text", str, optical = 0)]
+
     def __init__(self, xpos = 0, ypos = 0, label = "Label"):  
         DOSSSObject.__init__(self, xpos, ypos)      
         self.color = "Grey"
         self.text = label                
+        self.width = 0          # text extent, updated in Draw
+        self.height = 0
         self.name = "Label"
     
     ##############################
@@ -62,28 +66,6 @@ class DOSSS_Label(DOSSSObject):
         p.append([0, self.height + 4])
         return p        
     
-    def Intersection(self, line):
+    def GetSurfaces(self):
         # labels do not interfere
-        return [None, 0, []]
-    
-    # property dialog
-    def ShowPropertyDialog(self):
-        options = []
-        options.append(["Position X", self.position[0]])
-        options.append(["Position Y", self.position[1]])
-        options.append(["Rotate", self.alpha])
-        options.append(["FlipH", self.flip_h])
-        options.append(["FlipV", self.flip_v])
-        options.append(["Text", self.text, "str"])
-        dlg = DOSSS_PropertyDialog(options)
-        if (dlg.ShowModal() == wx.ID_OK):
-            options = dlg.getOptions() 
-            self.position[0] = options[0]
-            self.position[1] = options[1]
-            self.alpha = options[2]
-            self.flip_h = options[3]
-            self.flip_v = options[4]
-            self.text = options[5]           
-            
-        dlg.Destroy()        
-    
\ No newline at end of file
+        return []
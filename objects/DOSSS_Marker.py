@@ -15,10 +15,13 @@
 
    Copyright 2015 Daniel Dietze <daniel.dietze@berkeley.edu>.   
 """ 
-import wx
 from core.opsim_objectbase import *
 
 class DOSSS_Marker(DOSSSObject):
+    # object specific properties
+    properties = DOSSSObject.properties + [DOSSS_Property("width", "Width", units = "mm", optical = 0),
+                                           DOSSS_Property("height", "Height", units = "mm", optical = 0)]
+
     def __init__(self, xpos = 0, ypos = 0, width = 30, height = 30):  
         DOSSSObject.__init__(self, xpos, ypos)      
         self.color = "Grey"
@@ -38,30 +41,6 @@ class DOSSS_Marker(DOSSSObject):
         p.append([0, self.height])
         return p        
     
-    def Intersection(self, line):
-        # labels do not interfere
-        return [None, 0, []]
-    
-    # property dialog
-    def ShowPropertyDialog(self):
-        options = []
-        options.append(["Position X", self.position[0]])
-        options.append(["Position Y", self.position[1]])
-        options.append(["Rotate", self.alpha])
-        options.append(["FlipH", self.flip_h])
-        options.append(["FlipV", self.flip_v])
-        options.append(["Width", self.width])
-        options.append(["Height", self.height])
-        dlg = DOSSS_PropertyDialog(options)
-        if (dlg.ShowModal() == wx.ID_OK):
-            options = dlg.getOptions() 
-            self.position[0] = options[0]
-            self.position[1] = options[1]
-            self.alpha = options[2]
-            self.flip_h = options[3]
-            self.flip_v = options[4]
-            self.width = options[5]           
-            self.height = options[6] 
-            
-        dlg.Destroy()        
-    
\ No newline at end of file
+    def GetSurfaces(self):
+        # markers do not interfere
+        return []
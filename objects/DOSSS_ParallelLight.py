@@ -15,18 +15,33 @@
 
    Copyright 2015 Daniel Dietze <daniel.dietze@berkeley.edu>.   
 """ 
-import wx
 from core.opsim_objectbase import *
 from core.opsim_lightray import *    # this applies for light sources only
 
+# in Gaussian beam mode, only the central ray is traced and the 1/e^2 envelope of a Gaussian beam with a waist of diameter width is drawn
 class DOSSS_ParallelLight(DOSSSObject):
-    def __init__(self, xpos = 0, ypos = 0, width = 10, norays = 5):
+    # object specific properties
+    properties = DOSSSObject.properties + [DOSSS_Property("width", "Width", minimum = 1, units = "mm"),
+                                           DOSSS_Property("noRays", "# of Rays", int, minimum = 1),
+                                           DOSSS_Property("gaussian", "Gaussian Beam", int, 0, 1),
+                                           DOSSS_Property("wavelength", "Wavelength", minimum = 0, units = "mm"),
+                                           DOSSS_Property("waistPosition", "Waist Position", units = "mm")]
+
+    # defaults for scenes saved without Gaussian beam mode
+    gaussian = 0
+    wavelength = 0.000633
+    waistPosition = 0
+
+    def __init__(self, xpos = 0, ypos = 0, width = 10, norays = 5, gaussian = 0, wavelength = 0.000633, waistPosition = 0):
         DOSSSObject.__init__(self, xpos, ypos)
         self.color = "Blue"
         self.width = width
         self.noRays = norays        
         if self.noRays < 1:
             self.noRays = 1
+        self.gaussian = gaussian            # Gaussian beam mode
+        self.wavelength = wavelength        # wavelength of the Gaussian beam in units of the scene
+        self.waistPosition = waistPosition  # distance of the waist from the light source
         self.lightsource = 1 
         self.name = "Parallel Light"
       
@@ -42,57 +57,43 @@ class DOSSS_ParallelLight(DOSSSObject):
         p.append([-self.width, self.width / 2])                   
         return p
     
-    def Intersection(self, line):
-        # a light source does not interact with rays
-        return [None, 0, []]
-    
-    # property dialog
-    def ShowPropertyDialog(self):
-        options = []
-        options.append(["Position X", self.position[0]])
-        options.append(["Position Y", self.position[1]])
-        options.append(["Rotate", self.alpha])
-        options.append(["FlipH", self.flip_h])
-        options.append(["FlipV", self.flip_v])
-        # object specific properties
-        options.append(["Width", self.width, 1])
-        options.append(["# of Rays", self.noRays, 1])
-        
-        # open dialog
-        dlg = DOSSS_PropertyDialog(options)
-        if (dlg.ShowModal() == wx.ID_OK):
-            # read out new values
-            options = dlg.getOptions()
-            self.position[0] = options[0]
-            self.position[1] = options[1]
-            self.alpha = options[2]
-            self.flip_h = options[3]
-            self.flip_v = options[4]
-            # object specific properties
-            self.width = options[5]     
-            self.noRays = options[6]
-           
-        dlg.Destroy()
-        
+    def GetSurfaces(self):
+        # light sources do not interfere
+        return []
+
     # this function applies only for light sources
     # returns a list of DOSSS_LightRay - objects
     # for an object to be a light source, the 'lightsource' flag has to be set
     def GetLight(self):      
-        rays = []
+        return list(self.IterLight())
+
+    # generator version of GetLight, creates the rays one at a time
+    def IterLight(self):
+        if self.gaussian:
+            # the central ray
+            av = self.project(DOSSSVector(0, 0), 0, 1)
+            uv = self.project(DOSSSVector(1, 0), 1, 1)
+            yield DOSSS_LightRay(av.x(), av.y(), uv.x(), uv.y())
+            return
         if self.noRays > 1:
             a0 = -self.width / 2
             da = self.width / (float(self.noRays) - 1.0)
-            print a0, da
         else:
             a0 = 0
             da = 0
+        # project direction vector in LabSpace
+        uv = self.project(DOSSSVector(1, 0), 1, 1)
         for i in range(int(self.noRays)):                                    
             av = DOSSSVector(0, a0)
-            uv = DOSSSVector(1, 0)
             a0 = -self.width / 2 + (i + 1) * da
             # project vectors in LabSpace
-            uv = self.project(uv, 1, 1)
             av = self.project(av, 0, 1)                
-            rays.append(DOSSS_LightRay(av.x(), av.y(), uv.x(), uv.y()))
-            
-        return rays
\ No newline at end of file
+            yield DOSSS_LightRay(av.x(), av.y(), uv.x(), uv.y())
+
+    # Gaussian beam along the central ray
+    def GetBeam(self, objects, maxNumberOfIterations = 20):
+        if not self.gaussian or self.wavelength <= 0:
+            return None
+        origin, direction = self.GetOpticalAxis()
+        system = DOSSS_ParaxialSystem(objects, origin, direction, maxNumberOfIterations)
+        return DOSSS_GaussianBeam(system, self.wavelength, self.width / 2.0, self.waistPosition)
@@ -15,11 +15,14 @@
 
    Copyright 2015 Daniel Dietze <daniel.dietze@berkeley.edu>.   
 """ 
-import wx
 from core.opsim_objectbase import *
 from core.opsim_lightray import *    # this applies for light sources only
 
 class DOSSS_PointLight(DOSSSObject):
+    # object specific properties
+    properties = DOSSSObject.properties + [DOSSS_Property("fullDivAngle", "Full Div. Angle", minimum = 1, maximum = 360, units = "deg"),
+                                           DOSSS_Property("noRays", "# of Rays", int, minimum = 3)]
+
     def __init__(self, xpos = 0, ypos = 0, divangle = 30, norays = 5):
         DOSSSObject.__init__(self, xpos, ypos)
         self.color = "Blue"
@@ -52,43 +55,22 @@ class DOSSS_PointLight(DOSSSObject):
             p.append([x, y])            
         return p
     
-    def Intersection(self, line):
-        # a light source does not interact with rays
-        return [None, 0, []]
-    
-    # property dialog
-    def ShowPropertyDialog(self):
-        options = []
-        options.append(["Position X", self.position[0]])
-        options.append(["Position Y", self.position[1]])
-        options.append(["Rotate", self.alpha])
-        options.append(["FlipH", self.flip_h])
-        options.append(["FlipV", self.flip_v])
-        # object specific properties
-        options.append(["Full Div. Angle", self.fullDivAngle, 1, 360])
-        options.append(["# of Rays", self.noRays, 3])
-        
-        # open dialog
-        dlg = DOSSS_PropertyDialog(options)
-        if (dlg.ShowModal() == wx.ID_OK):
-            # read out new values
-            options = dlg.getOptions()
-            self.position[0] = options[0]
-            self.position[1] = options[1]
-            self.alpha = options[2]
-            self.flip_h = options[3]
-            self.flip_v = options[4]
-            # object specific properties
-            self.fullDivAngle = options[5]     
-            self.noRays = options[6]
-           
-        dlg.Destroy()
-        
+    def GetSurfaces(self):
+        # light sources do not interfere
+        return []
+
     # this function applies only for light sources
     # returns a list of DOSSS_LightRay - objects
     # for an object to be a light source, the 'lightsource' flag has to be set
     def GetLight(self):      
-        rays = []
+        return list(self.IterLight())
+
+    # the central ray points upwards
+    def GetOpticalAxis(self):
+        return [self.TransformPoints([[0, 0]])[0], self.TransformDirections([[0, -1]])[0]]
+
+    # generator version of GetLight, creates the rays one at a time
+    def IterLight(self):
         av = DOSSSVector(0, 0)   
         av = self.project(av, 0, 1)     
         
@@ -97,13 +79,10 @@ class DOSSS_PointLight(DOSSSObject):
         
         for i in range(int(self.noRays)):
             a = alpha0 + float(i) * dalpha
-            print a
             a = a * pi / 180.0
             x = sin(a)
             y = -cos(a)
             uv = DOSSSVector(x, y)
             uv = self.project(uv, 1, 1)
 
-            rays.append(DOSSS_LightRay(av.x(), av.y(), uv.x(), uv.y()))
-            
-        return rays
\ No newline at end of file
+            yield DOSSS_LightRay(av.x(), av.y(), uv.x(), uv.y())
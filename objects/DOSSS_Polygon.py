@@ -0,0 +1,168 @@
+"""
+..
+   This program is free software: you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation, either version 3 of the License, or
+   (at your option) any later version.
+
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+   Copyright 2015 Daniel Dietze <daniel.dietze@berkeley.edu>.
+"""
+from core.opsim_objectbase import *
+
+# one letter per edge: Absorbing, Refracting, Mirror or beam Splitter
+EDGE_KINDS = {"A": ABSORB, "R": REFRACT, "M": MIRROR, "S": SPLIT}
+
+# predefined shapes as (vertices, edges) for a size of 1
+def GetShape(name):
+    if name == "Dove Prism":
+        # trapezoid with 45deg end faces, length 4 x height 1
+        return [[-1, -0.5], [1, -0.5], [2, 0.5], [-2, 0.5]], "RRRR"
+    if name == "Pentaprism":
+        # entrance and exit face of length 1 at right angles, all other angles 112.5deg; the two silvered faces deviate the beam by 90deg
+        a = 22.5 * pi / 180
+        c = (1 - (cos(a) - sin(a))) * sqrt(2)
+        p = [[0, 0], [0, -1]]
+        p.append([p[1][0] + cos(a), p[1][1] - sin(a)])
+        p.append([p[2][0] + c / sqrt(2), p[2][1] + c / sqrt(2)])
+        p.append([1, 0])
+        return [[x - 0.5, y + 0.5] for x, y in p], "RMAMR"
+    # right angle prism
+    return [[-0.5, 0.5], [-0.5, -0.5], [0.5, 0.5]], "RRR"
+
+# vertices are edited as "x1, y1; x2, y2; ..."
+def FormatVertices(vertices):
+    return "; ".join(["%g, %g" % (p[0], p[1]) for p in vertices])
+
+# vertices are given as text or, e.g., from a script, as list of [x, y]
+def ParseVertices(s):
+    if isinstance(s, basestring):
+        s = [p.split(",") for p in s.split(";") if p.strip() != ""]
+    vertices = []
+    for p in s:
+        try:
+            if isinstance(p, basestring):
+                raise ValueError()
+            x, y = p
+            vertices.append([float(x), float(y)])
+        except (TypeError, ValueError):
+            raise ValueError("Each vertex needs two coordinates x, y.")
+    if len(vertices) < 2:
+        raise ValueError("A polygon needs at least two vertices.")
+    return vertices
+
+# edges are edited as a string of letters from EDGE_KINDS
+def ParseEdges(s):
+    s = str(s).strip().upper()
+    if s == "":
+        raise ValueError("At least one edge type is needed.")
+    for c in s:
+        if c not in EDGE_KINDS:
+            raise ValueError("Unknown edge type %s; use one of A, R, M, S." % c)
+    return s
+
+class DOSSS_Polygon(DOSSSObject):
+    # object specific properties
+    properties = DOSSSObject.properties + [DOSSS_Property("vertices", "Vertices (x, y; ...)", list, parse = ParseVertices, format = FormatVertices),
+                                           DOSSS_Property("edges", "Edges (A/R/M/S)", str, parse = ParseEdges),
+                                           DOSSS_Property("refractiveIndex", "Refractive Index", minimum = 1),
+                                           DOSSS_Property("closed", "Closed", int, 0, 1)]
+
+    def __init__(self, xpos = 0, ypos = 0, vertices = None, edges = None, ior = 1.5, closed = 1, shape = "Right-Angle Prism", size = 40):
+        DOSSSObject.__init__(self, xpos, ypos)
+        if vertices is None:
+            vertices, e = GetShape(shape)
+            vertices = [[size * x, size * y] for x, y in vertices]
+            if edges is None:
+                edges = e
+        if edges is None:
+            edges = "R"
+        self.vertices = vertices    # list of corners [x, y] in object coordinates
+        self.edges = edges          # one letter per edge, see EDGE_KINDS; the last letter is used for all remaining edges
+        self.refractiveIndex = ior  # material ior
+        self.closed = closed        # polygon (1) or polyline (0)
+        self.name = "Polygon"
+
+    # vertices, edges and closed have to fit together
+    # open polylines ignore the letter of the closing edge, so that closed can be switched without editing the edges
+    def CheckValues(self, values):
+        n = len(values["vertices"])
+        if values["closed"] and n < 3:
+            raise ValueError("A closed polygon needs at least three vertices.")
+        if len(values["edges"]) > n:
+            raise ValueError("%d edge types given for a polygon with %d vertices." % (len(values["edges"]), n))
+
+    # returns the letter for the i-th edge
+    def GetEdgeKind(self, i):
+        if i < len(self.edges):
+            return self.edges[i].upper()
+        return self.edges[-1].upper()
+
+    # create object shape for displaying
+    def GetDisplayPoints(self):
+        return [list(p) for p in self.vertices]
+
+    # open polylines are drawn as lines
+    def Draw(self, dc, zoom, x0, y0):
+        if self.closed:
+            DOSSSObject.Draw(self, dc, zoom, x0, y0)
+            return
+        if self.active:
+            dc.SetPen(wx.Pen("Red", 2))
+        else:
+            dc.SetPen(wx.Pen(self.color, 1))
+        p = self.ProjectDisplayPoints(self.GetDisplayPoints(), x0, y0, zoom)
+        dc.DrawLines(p)
+        # origin cross
+        dc.SetPen(wx.Pen("Green", 1))
+        ox = (self.position[0] - x0) * zoom
+        oy = (self.position[1] - y0) * zoom
+        of = 4 * zoom
+        dc.DrawLine(ox-of, oy, ox+of, oy)
+        dc.DrawLine(ox, oy-of, ox, oy+of)
+        self.CalculateBoundingBox(p)
+
+    def svgstr(self):
+        if self.closed:
+            return DOSSSObject.svgstr(self)
+        svg = "<g style=\"stroke-width:0.3mm; stroke:black; fill:none;\">\n"
+        svg += " <polyline points=\""
+        for point in self.TransformPoints(self.GetDisplayPoints()):
+            svg += "%f,%f " % (point[0], point[1])
+        svg += "\" />\n"
+        svg += "</g>\n"
+        return svg
+
+    # surface description
+    def GetSurfaces(self):
+        p = self.vertices
+        n = len(p)
+        if n < 2:
+            return []
+
+        # the normals of the edges point to the outside if the outline runs clockwise on screen
+        area = 0
+        for i in range(n):
+            j = (i + 1) % n
+            area = area + p[i][0] * p[j][1] - p[j][0] * p[i][1]
+
+        s = []
+        if self.closed:
+            nedges = n
+        else:
+            nedges = n - 1
+        for i in range(nedges):
+            j = (i + 1) % n
+            material = DOSSS_Material(EDGE_KINDS.get(self.GetEdgeKind(i), ABSORB), self.refractiveIndex)
+            if area >= 0:
+                s.append(DOSSS_LineSurface(p[i], p[j], material))
+            else:
+                s.append(DOSSS_LineSurface(p[j], p[i], material))
+        return s
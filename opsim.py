@@ -5,6 +5,8 @@
 
 Simple 2D simulation of optical components and more complicated optical assemblies using raytracing.
 
+Without arguments, the GUI is started. With *trace* as first argument, scenes are traced from the command line without a display, see :py:mod:`core.opsim_cli`. With *serve*, a local trace service is started, see :py:mod:`core.opsim_server`.
+
 ..
    This program is free software: you can redistribute it and/or modify 
    it under the terms of the GNU General Public License as published by
@@ -23,6 +25,18 @@ Simple 2D simulation of optical components and more complicated optical assembli
 """ 
 
 # includes
+import sys
+
+# command line mode, e.g. "opsim.py trace scene.dos --out result.npz"; see core.opsim_cli
+if __name__ == '__main__' and len(sys.argv) > 1 and sys.argv[1] == "trace":
+    import core.opsim_cli
+    sys.exit(core.opsim_cli.main(sys.argv[2:]))
+
+# local trace service, see core.opsim_server
+if __name__ == '__main__' and len(sys.argv) > 1 and sys.argv[1] == "serve":
+    import core.opsim_server
+    sys.exit(core.opsim_server.main(sys.argv[2:]))
+
 import wx
 import core.opsim_mainframe
 